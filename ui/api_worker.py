@@ -0,0 +1,242 @@
+"""
+API Worker
+Stateless FastAPI app run as N uvicorn workers next to one engine process
+(`python bot.py` with API_WORKERS > 1). Reads are served from the engine's
+shared-memory state without touching the engine; writes, and anything the
+engine does not publish, are forwarded to it over its Unix socket
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+
+import aiohttp
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+
+from broadcast import SnapshotBroadcaster
+from logs import get_logger
+from shared_state import ENGINE_SOCKET, SHARED_TRADES_LIMIT, SharedStateReader
+
+# Headers passed through in each direction when forwarding to the engine
+FORWARD_REQUEST_HEADERS = ("content-type", "idempotency-key", "accept")
+FORWARD_RESPONSE_HEADERS = ("retry-after", "x-candle-count")
+
+log = get_logger("api_worker")
+
+reader = SharedStateReader()
+_engine: Optional[aiohttp.ClientSession] = None
+
+
+def _refresh():
+    try:
+        return reader.refresh()
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Engine not running")
+
+
+def _published(name):
+    """Response for a pre-rendered section, or None if the engine has not published it"""
+    _refresh()
+    body = reader.body(name)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json")
+
+
+def _engine_session():
+    global _engine
+    if _engine is None or _engine.closed:
+        _engine = aiohttp.ClientSession(
+            connector=aiohttp.UnixConnector(path=ENGINE_SOCKET),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+    return _engine
+
+
+async def forward(request: Request):
+    """Replay the request against the engine and relay its response"""
+    headers = {k: v for k, v in request.headers.items() if k.lower() in FORWARD_REQUEST_HEADERS}
+    try:
+        async with _engine_session().request(
+            request.method,
+            f"http://engine{request.url.path}",
+            params=list(request.query_params.multi_items()),
+            data=await request.body(),
+            headers=headers,
+        ) as res:
+            content = await res.read()
+            return Response(
+                content=content,
+                status_code=res.status,
+                media_type=res.headers.get("Content-Type"),
+                headers={k: v for k, v in res.headers.items() if k.lower() in FORWARD_RESPONSE_HEADERS},
+            )
+    except aiohttp.ClientError as e:
+        log.error("engine unreachable", path=request.url.path, error=repr(e))
+        raise HTTPException(status_code=503, detail="Engine unavailable")
+
+
+def _broadcast_state():
+    return reader.version, reader.market_rows(), reader.parsed("positions")
+
+# Each worker fans out diffs of the shared state to its own /stream subscribers
+broadcaster = SnapshotBroadcaster(_broadcast_state)
+
+
+async def watch_shared_state(interval=0.1):
+    while True:
+        try:
+            if reader.refresh():
+                broadcaster.notify()
+        except FileNotFoundError:
+            pass  # Engine still starting
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(watch_shared_state()), asyncio.create_task(broadcaster.run())]
+    yield
+    for task in tasks:
+        task.cancel()
+    if _engine is not None:
+        await _engine.close()
+    reader.close()
+
+
+app = FastAPI(title="Demo Trading Bot API", version="1.0.0", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, specify exact origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@app.post("/webhook")
+async def webhook(request: Request):
+    return await forward(request)
+
+
+@app.post("/accounts")
+async def create_account(request: Request):
+    return await forward(request)
+
+
+@app.get("/candles")
+async def get_candles(request: Request):
+    return await forward(request)
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """The engine's registry; it is where fetches, locks and signals are measured"""
+    return await forward(request)
+
+
+@app.get("/latest_data")
+async def get_latest_data(request: Request):
+    return _published("latest_data") or await forward(request)
+
+
+@app.get("/positions")
+async def get_positions(request: Request):
+    return _published("positions") or await forward(request)
+
+
+@app.get("/trades")
+async def get_trades(request: Request, limit: int = 100):
+    if limit == SHARED_TRADES_LIMIT:
+        return _published("trades") or await forward(request)
+    if limit < SHARED_TRADES_LIMIT:
+        _refresh()
+        history = reader.parsed("trades")
+        if history is not None:
+            trades = history["trades"][:limit]
+            return {
+                "trades": trades,
+                "realized_pnl": sum(t["pnl"] for t in trades),
+                "balance": history["balance"],
+            }
+    return await forward(request)
+
+
+@app.get("/accounts")
+async def list_accounts(request: Request):
+    return _published("accounts") or await forward(request)
+
+
+@app.get("/accounts/{account_id}/{resource}")
+async def get_account_resource(account_id: str, resource: str, request: Request, limit: int = 100):
+    if resource == "trades" and limit != SHARED_TRADES_LIMIT:
+        return await forward(request)
+    # Unknown accounts (404) and ones created since the last publish are answered by the engine
+    return _published(f"accounts/{account_id}/{resource}") or await forward(request)
+
+
+@app.get("/risk")
+async def get_risk(request: Request):
+    return _published("risk") or await forward(request)
+
+
+@app.get("/scanner")
+async def get_scanner(request: Request, limit: Optional[int] = None):
+    if limit is None:
+        return _published("scanner") or await forward(request)
+    _refresh()
+    result = reader.parsed("scanner")
+    if result is None:
+        # Scanner off or no scan yet: the engine answers with the right status
+        return await forward(request)
+    return {**result, "buy": result["buy"][:limit], "sell": result["sell"][:limit]}
+
+
+@app.get("/token_data")
+async def get_token_data(token: str, request: Request):
+    """Watched symbols come from the shared snapshot; anything else needs the engine's fetcher"""
+    symbol = token.upper()
+    if not symbol.endswith("USDT"):
+        symbol = f"{symbol}USDT"
+    _refresh()
+    latest = reader.parsed("latest_data")
+    row = latest["data"].get(symbol) if latest else None
+    if row is None:
+        return await forward(request)
+    return {"data": {symbol: row}, "last_updated": datetime.now().isoformat()}
+
+
+@app.get("/stream")
+async def stream():
+    """Push market and position diffs to the dashboard as Server-Sent Events"""
+    _refresh()
+    if reader.version is None:
+        raise HTTPException(status_code=503, detail="Engine has not published state yet")
+    sub = broadcaster.subscribe()
+    return StreamingResponse(
+        broadcaster.events(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/")
+async def health():
+    return {"status": "healthy", "message": "Demo Trading Bot API Running"}
+
+
+@app.get("/health")
+async def health_check():
+    response = {"status": "healthy", "message": "Demo Trading Bot API Running", "timestamp": datetime.now().isoformat()}
+    try:
+        reader.refresh()
+        response["state_version"] = reader.version
+        response["state_age"] = round(time.time() - reader.published_at, 3) if reader.version is not None else None
+    except FileNotFoundError:
+        response["status"] = "degraded"
+        response["state_version"] = None
+    return response
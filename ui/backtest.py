@@ -0,0 +1,362 @@
+"""
+Vectorized Backtester
+Runs the bot's RSI / aggressive signal rules over historical klines for many
+symbols at once and simulates TP/SL exits the way process_signal sets them
+"""
+import argparse
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from strategy import STRATEGY_CONFIG
+
+console = Console()
+
+LEVERAGE = 20
+RISK_PER_TRADE = 0.01  # 1% of balance at risk between entry and SL
+LOT_FRACTION = 0.10    # Lot cap: 10% of balance at LEVERAGE
+CANDLES_PER_DAY = 1440  # 1m candles, used for the 24h change
+
+# Binance kline dumps: open_time, open, high, low, close, volume, close_time, ...
+KLINE_COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+
+
+@dataclass
+class Candles:
+    symbol: str
+    open_time: np.ndarray  # int64 ms
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self):
+        return len(self.close)
+
+
+@dataclass
+class BacktestResult:
+    symbol: str
+    strategy: str
+    initial_balance: float
+    final_balance: float
+    trades: np.ndarray  # structured array, see TRADE_DTYPE
+    equity: np.ndarray  # balance after each closed trade
+    max_drawdown_pct: float
+    win_rate: float
+    params: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def pnl(self):
+        return self.final_balance - self.initial_balance
+
+    @property
+    def return_pct(self):
+        return self.pnl / self.initial_balance * 100 if self.initial_balance else 0.0
+
+    @property
+    def n_trades(self):
+        return len(self.trades)
+
+
+TRADE_DTYPE = np.dtype([
+    ("entry_idx", np.int64), ("exit_idx", np.int64), ("side", np.int8),
+    ("entry_price", np.float64), ("exit_price", np.float64),
+    ("quantity", np.float64), ("pnl", np.float64), ("exit_reason", "U2"),
+])
+
+
+def _symbol_from_path(path):
+    name = os.path.basename(path).split(".")[0]
+    return name.replace("_", "-").split("-")[0].upper()
+
+
+def load_klines(path, symbol=None) -> Candles:
+    """Load klines from a Binance-style CSV (with or without header) or a Parquet file"""
+    symbol = symbol or _symbol_from_path(path)
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet klines requires pyarrow")
+        table = pq.read_table(path, columns=list(KLINE_COLUMNS))
+        cols = {name: table.column(name).to_numpy() for name in KLINE_COLUMNS}
+    else:
+        with open(path) as f:
+            first = f.readline()
+        skip = 0 if first[:1].isdigit() else 1
+        raw = np.loadtxt(path, delimiter=",", skiprows=skip, usecols=range(6), dtype=np.float64, ndmin=2)
+        cols = dict(zip(KLINE_COLUMNS, raw.T))
+
+    open_time = np.asarray(cols["open_time"], dtype=np.int64)
+    order = np.argsort(open_time, kind="stable")
+    return Candles(
+        symbol=symbol,
+        open_time=open_time[order],
+        **{name: np.asarray(cols[name], dtype=np.float64)[order] for name in KLINE_COLUMNS[1:]},
+    )
+
+
+def load_directory(path, symbols: Optional[List[str]] = None) -> Dict[str, Candles]:
+    """Load every CSV/Parquet file in a directory, concatenating files of the same symbol"""
+    parts: Dict[str, List[Candles]] = {}
+    for name in sorted(os.listdir(path)):
+        if not name.endswith((".csv", ".parquet")):
+            continue
+        symbol = _symbol_from_path(name)
+        if symbols and symbol not in symbols:
+            continue
+        parts.setdefault(symbol, []).append(load_klines(os.path.join(path, name), symbol))
+
+    data = {}
+    for symbol, chunks in parts.items():
+        merged = {name: np.concatenate([getattr(c, name) for c in chunks]) for name in KLINE_COLUMNS}
+        order = np.argsort(merged["open_time"], kind="stable")
+        data[symbol] = Candles(symbol=symbol, **{k: v[order] for k, v in merged.items()})
+    return data
+
+
+def load_store(store, symbols: Optional[List[str]] = None, interval="1m", start=None, end=None) -> Dict[str, Candles]:
+    """Candles straight from a candle_store.CandleStore, as zero-copy views of its memmaps"""
+    data = {}
+    for symbol in symbols or store.symbols(interval):
+        cols = store.range(symbol, interval, start, end)
+        if len(cols["close"]):
+            data[symbol] = Candles(symbol=symbol, **cols)
+    return data
+
+
+def rolling_rsi(closes, window=14):
+    """
+    Vectorized HyperTradingBot.calculate_rsi: value i uses closes[i-window+1 .. i].
+    Works along the last axis, so a (symbols, time) matrix is handled in one call.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n = closes.shape[-1]
+    deltas = np.diff(closes, axis=-1)
+    pad = [(0, 0)] * (closes.ndim - 1) + [(1, 0)]
+    gains = np.pad(np.cumsum(np.maximum(deltas, 0.0), axis=-1), pad)
+    losses = np.pad(np.cumsum(np.maximum(-deltas, 0.0), axis=-1), pad)
+
+    idx = np.arange(n)
+    start = np.maximum(idx - window + 1, 0)
+    gain = gains[..., idx] - gains[..., start]
+    loss = losses[..., idx] - losses[..., start]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.round(100 - (100 / (1 + gain / loss)), 2)
+    rsi = np.where(loss <= 0, 100.0, rsi)
+    # calculate_rsi needs at least 10 closes
+    return np.where(idx - start + 1 < 10, 50.0, rsi)
+
+
+def rolling_mean(values, period=3):
+    values = np.asarray(values, dtype=np.float64)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    csum = np.pad(np.cumsum(values, axis=-1), pad)
+    idx = np.arange(values.shape[-1])
+    start = np.maximum(idx - period + 1, 0)
+    return (csum[..., idx + 1] - csum[..., start]) / (idx - start + 1)
+
+
+def rolling_change(closes, lookback=CANDLES_PER_DAY):
+    """Percent change against the close `lookback` candles earlier (24h for 1m candles)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    idx = np.arange(closes.shape[-1])
+    base = closes[..., np.maximum(idx - lookback, 0)]
+    return np.round((closes - base) / base * 100, 2)
+
+
+def stack_closes(data: Dict[str, Candles]):
+    """
+    (symbols, bars) matrix of every symbol's closes, each row starting at its
+    own first bar. Shorter rows are padded with their last close; the rolling
+    indicators only look back, so the padding never changes a real bar's value
+    """
+    width = max((len(c) for c in data.values()), default=0)
+    closes = np.zeros((len(data), width))
+    for row, candles in enumerate(data.values()):
+        n = len(candles)
+        closes[row, :n] = candles.close
+        if 0 < n < width:
+            closes[row, n:] = candles.close[-1]
+    return closes
+
+
+def generate_signals(closes, rsi, change, conf, avg_price=None):
+    """Vectorized TradingAccount.signal_rule: +1 BUY, -1 SELL, 0 HOLD; any shape, elementwise"""
+    avg_price = rolling_mean(closes, 3) if avg_price is None else avg_price
+    buy = (rsi <= conf["rsi_buy"]) | ((closes > avg_price) & (change > 0.01))
+    sell = ~buy & ((rsi >= conf["rsi_sell"]) | ((closes < avg_price) & (change < -0.01)))
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def _find_exit(open_, high, low, start, side, tp, sl):
+    """
+    First bar >= start whose range crosses TP or SL; SL wins if both are hit.
+    TP fills at its level; SL fills at the bar's open when the bar opened
+    past it, as the live engine fills a stop at the tick that gapped through
+    """
+    n = len(high)
+    span = 256
+    while start < n:
+        stop = min(start + span, n)
+        h, l = high[start:stop], low[start:stop]
+        if side > 0:
+            hit_sl, hit_tp = l <= sl, h >= tp
+        else:
+            hit_sl, hit_tp = h >= sl, l <= tp
+        hits = np.flatnonzero(hit_sl | hit_tp)
+        if len(hits):
+            j = hits[0]
+            if hit_sl[j]:
+                o = open_[start + j]
+                return start + j, (min(o, sl) if side > 0 else max(o, sl)), "SL"
+            return start + j, tp, "TP"
+        start = stop
+        span *= 2
+    return -1, 0.0, ""
+
+
+def simulate(candles: Candles, signals, conf, initial_balance=10000.0, fee_rate=0.0):
+    """
+    Walk the signal series trade by trade: enter on the close of a signal bar
+    with process_signal's TP/SL levels and sizing, exit on the first bar that
+    touches either level. Only one position per symbol, as in the live bot.
+    """
+    open_, high, low, close = candles.open, candles.high, candles.low, candles.close
+    entries = np.flatnonzero(signals)
+    trades = []
+    balance = float(initial_balance)
+    pos = 0
+    while pos < len(entries):
+        i = entries[pos]
+        side = int(signals[i])
+        price = close[i]
+        if side > 0:
+            tp, sl = price * (1 + conf["tp"]), price * (1 - conf["sl"])
+        else:
+            tp, sl = price * (1 - conf["tp"]), price * (1 + conf["sl"])
+
+        price_diff = abs(price - sl)
+        quantity = balance * RISK_PER_TRADE / price_diff if price_diff > 0 else 0.001
+        quantity = min(quantity, balance * LOT_FRACTION * LEVERAGE / price)
+
+        j, exit_price, reason = _find_exit(open_, high, low, i + 1, side, tp, sl)
+        if j < 0:
+            break  # Still open at the end of the data
+        pnl = (exit_price - price) * quantity * side
+        pnl -= (price + exit_price) * quantity * fee_rate
+        balance += pnl
+        trades.append((i, j, side, price, exit_price, quantity, pnl, reason))
+        # Next entry is the first signal after the exit bar
+        pos = np.searchsorted(entries, j, side="right")
+
+    trades = np.array(trades, dtype=TRADE_DTYPE)
+    equity = initial_balance + np.cumsum(trades["pnl"]) if len(trades) else np.array([initial_balance])
+    return trades, equity
+
+
+def max_drawdown_pct(equity, initial_balance):
+    curve = np.concatenate([[initial_balance], equity])
+    peaks = np.maximum.accumulate(curve)
+    return float(((peaks - curve) / peaks).max() * 100)
+
+
+def backtest_symbol(candles: Candles, strategy="scalping", conf=None, initial_balance=10000.0,
+                    rsi_window=14, fee_rate=0.0, rsi=None, change=None, signals=None) -> BacktestResult:
+    conf = conf or STRATEGY_CONFIG[strategy]
+    if signals is None:
+        rsi = rolling_rsi(candles.close, rsi_window) if rsi is None else rsi
+        change = rolling_change(candles.close) if change is None else change
+        signals = generate_signals(candles.close, rsi, change, conf)
+    trades, equity = simulate(candles, signals, conf, initial_balance, fee_rate)
+    return BacktestResult(
+        symbol=candles.symbol,
+        strategy=strategy,
+        initial_balance=initial_balance,
+        final_balance=float(equity[-1]) if len(trades) else initial_balance,
+        trades=trades,
+        equity=equity,
+        max_drawdown_pct=max_drawdown_pct(equity, initial_balance) if len(trades) else 0.0,
+        win_rate=float((trades["pnl"] > 0).mean() * 100) if len(trades) else 0.0,
+        params=dict(conf),
+    )
+
+
+def run_backtest(data: Dict[str, Candles], strategy="scalping", conf=None, initial_balance=10000.0,
+                 fee_rate=0.0, rsi_window=14) -> Dict[str, BacktestResult]:
+    """
+    Backtest every symbol; each symbol trades its own `initial_balance` book.
+    Indicators and signals are computed in one pass over the stacked
+    (symbols, bars) closes; only the trade walk, where each entry depends on
+    the previous exit, runs per symbol
+    """
+    conf = conf or STRATEGY_CONFIG[strategy]
+    closes = stack_closes(data)
+    signals = generate_signals(closes, rolling_rsi(closes, rsi_window), rolling_change(closes), conf)
+    return {
+        symbol: backtest_symbol(candles, strategy, conf, initial_balance, fee_rate=fee_rate,
+                                signals=signals[row, :len(candles)])
+        for row, (symbol, candles) in enumerate(data.items())
+    }
+
+
+def summarize(results: Dict[str, BacktestResult], data: Dict[str, Candles]):
+    """Portfolio totals: all symbol books combined, trades ordered by exit time"""
+    all_trades = [(data[s].open_time[r.trades["exit_idx"]], r.trades["pnl"]) for s, r in results.items() if r.n_trades]
+    initial = sum(r.initial_balance for r in results.values())
+    if not all_trades:
+        return {"pnl": 0.0, "return_pct": 0.0, "max_drawdown_pct": 0.0, "win_rate": 0.0, "trades": 0}
+    times = np.concatenate([t for t, _ in all_trades])
+    pnls = np.concatenate([p for _, p in all_trades])[np.argsort(times, kind="stable")]
+    equity = initial + np.cumsum(pnls)
+    return {
+        "pnl": float(pnls.sum()),
+        "return_pct": float(pnls.sum() / initial * 100),
+        "max_drawdown_pct": max_drawdown_pct(equity, initial),
+        "win_rate": float((pnls > 0).mean() * 100),
+        "trades": int(len(pnls)),
+    }
+
+
+def print_report(results: Dict[str, BacktestResult], data: Dict[str, Candles]):
+    table = Table(title=f"Backtest - {next(iter(results.values())).strategy if results else ''}")
+    for col in ("Symbol", "Trades", "Win %", "PnL", "Return %", "Max DD %"):
+        table.add_column(col, justify="right")
+    for symbol, r in results.items():
+        table.add_row(symbol, str(r.n_trades), f"{r.win_rate:.1f}", f"{r.pnl:.2f}",
+                      f"{r.return_pct:.2f}", f"{r.max_drawdown_pct:.2f}")
+    total = summarize(results, data)
+    table.add_row("TOTAL", str(total["trades"]), f"{total['win_rate']:.1f}", f"{total['pnl']:.2f}",
+                  f"{total['return_pct']:.2f}", f"{total['max_drawdown_pct']:.2f}", style="bold")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the bot's strategies on historical klines")
+    parser.add_argument("path", help="Directory of <SYMBOL>*.csv / .parquet kline files, or a single file")
+    parser.add_argument("--store", action="store_true", help="Treat path as the bot's candle store directory")
+    parser.add_argument("--strategy", default="scalping", choices=sorted(STRATEGY_CONFIG))
+    parser.add_argument("--symbols", help="Comma separated symbols to include")
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--fee", type=float, default=0.0, help="Fee rate per side, e.g. 0.0004")
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    if args.store:
+        from candle_store import CandleStore
+        data = load_store(CandleStore(args.path), symbols)
+    elif os.path.isdir(args.path):
+        data = load_directory(args.path, symbols)
+    else:
+        candles = load_klines(args.path)
+        data = {candles.symbol: candles}
+
+    results = run_backtest(data, args.strategy, initial_balance=args.balance, fee_rate=args.fee)
+    print_report(results, data)
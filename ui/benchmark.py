@@ -0,0 +1,467 @@
+"""
+Benchmark Harness
+Runs the bot against the local mock exchange and drives its API with
+concurrent readers and webhook bursts, then reports client-side latency
+percentiles, the engine's own /metrics histograms (cycle time, exchange
+requests, lock waits, signal-to-position) and the server's CPU and memory.
+Results are written as JSON so runs can be compared across commits
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from mock_exchange import MockConfig, serve, universe_symbols
+
+console = Console()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEBHOOK_SECRET = "tv_webhook_9xA2kQp!"
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Engine histograms summarized in the results, by Prometheus name
+ENGINE_HISTOGRAMS = {
+    "update_cycle": "bot_update_cycle_seconds",
+    "market_update": "bot_market_update_seconds",
+    "exchange_request": "bot_exchange_request_seconds",
+    "exchange_queue_wait": "bot_exchange_queue_wait_seconds",
+    "signal_to_position": "bot_signal_to_position_seconds",
+    "lock_wait": "bot_lock_wait_seconds",
+    "lock_hold": "bot_lock_hold_seconds",
+}
+# Lower is better for everything compared except throughput
+COMPARED = [
+    ("endpoints", "p50"), ("endpoints", "p99"), ("endpoints", "rps"),
+    ("engine", "p50"), ("engine", "p99"),
+]
+
+
+# --- Prometheus text parsing -------------------------------------------------
+
+def parse_metrics(text) -> Dict[Tuple[str, Tuple], float]:
+    """{(sample name, sorted label pairs): value} from the exposition format"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_labels, _, value = line.rpartition(" ")
+        labels = ()
+        if "{" in name_labels:
+            name, _, rest = name_labels.partition("{")
+            pairs = []
+            for item in rest.rstrip("}").split('",'):
+                if item:
+                    k, _, v = item.partition("=")
+                    pairs.append((k, v.strip('"')))
+            labels = tuple(sorted(pairs))
+        else:
+            name = name_labels
+        samples[(name, labels)] = float(value)
+    return samples
+
+
+def histogram_summary(before, after, name):
+    """Count, mean and interpolated p50/p99 of the observations made between two scrapes, over all label sets"""
+    buckets: Dict[float, float] = defaultdict(float)
+    total = count = 0.0
+    for (sample, labels), value in after.items():
+        delta = value - before.get((sample, labels), 0.0)
+        if sample == f"{name}_bucket":
+            le = dict(labels)["le"]
+            buckets[float("inf") if le == "+Inf" else float(le)] += delta
+        elif sample == f"{name}_sum":
+            total += delta
+        elif sample == f"{name}_count":
+            count += delta
+    if not count:
+        return {"count": 0}
+    bounds = sorted(buckets)
+    return {
+        "count": int(count),
+        "mean": total / count,
+        "p50": _bucket_quantile(bounds, buckets, count, 0.5),
+        "p99": _bucket_quantile(bounds, buckets, count, 0.99),
+    }
+
+
+def _bucket_quantile(bounds, buckets, count, q):
+    """Linear interpolation inside the bucket holding the q-th observation, like histogram_quantile()"""
+    rank = q * count
+    lower = 0.0
+    for bound in bounds:
+        if buckets[bound] >= rank:
+            if bound == float("inf"):
+                return lower
+            below = buckets[lower] if lower in buckets else 0.0
+            span = buckets[bound] - below
+            return lower + (bound - lower) * ((rank - below) / span if span else 1.0)
+        lower = bound
+    return lower
+
+
+# --- Server process resources ------------------------------------------------
+
+def process_tree(pid) -> List[int]:
+    pids = [pid]
+    for p in pids:
+        try:
+            for tid in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{tid}/children") as f:
+                    pids.extend(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def resource_usage(pid) -> Optional[Tuple[float, int]]:
+    """(CPU seconds, RSS bytes) summed over the process and its children; None without /proc"""
+    cpu, rss = 0.0, 0
+    try:
+        for p in process_tree(pid):
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rpartition(")")[2].split()
+            cpu += (int(fields[11]) + int(fields[12])) / CLK_TCK  # utime, stime
+            with open(f"/proc/{p}/statm") as f:
+                rss += int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None if cpu == 0 and rss == 0 else (cpu, rss)
+    return cpu, rss
+
+
+# --- Load generation ---------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def timed(self, session, name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as res:
+                await res.read()
+                ok = res.status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        self.latencies[name].append(time.perf_counter() - started)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, duration):
+        out = {}
+        for name, values in sorted(self.latencies.items()):
+            arr = np.asarray(values)
+            out[name] = {
+                "count": len(values),
+                "errors": self.errors[name],
+                "rps": len(values) / duration,
+                "p50": float(np.percentile(arr, 50)),
+                "p90": float(np.percentile(arr, 90)),
+                "p99": float(np.percentile(arr, 99)),
+                "max": float(arr.max()),
+            }
+        return out
+
+
+async def reader_loop(session, base, recorder, deadline, watched, unwatched, rng):
+    """One dashboard-like client cycling through the read endpoints"""
+    while time.monotonic() < deadline:
+        roll = rng.random()
+        if roll < 0.4:
+            await recorder.timed(session, "/positions", "GET", f"{base}/positions")
+        elif roll < 0.7:
+            await recorder.timed(session, "/latest_data", "GET", f"{base}/latest_data")
+        elif roll < 0.9 or not unwatched:
+            token = rng.choice(watched)[:-4]
+            await recorder.timed(session, "/token_data", "GET", f"{base}/token_data", params={"token": token})
+        else:
+            # Unwatched symbols go through the on-demand fetch path and its cache
+            token = rng.choice(unwatched)[:-4]
+            await recorder.timed(session, "/token_data (unwatched)", "GET", f"{base}/token_data",
+                                 params={"token": token})
+
+
+async def webhook_bursts(session, base, recorder, deadline, watched, size, every, rng):
+    n = 0
+    while time.monotonic() < deadline:
+        batch = []
+        for _ in range(size):
+            n += 1
+            payload = {"secret": WEBHOOK_SECRET, "symbol": rng.choice(watched), "side": rng.choice(["BUY", "SELL"]),
+                       "id": f"bench-{n}"}
+            batch.append(recorder.timed(session, "/webhook", "POST", f"{base}/webhook", json=payload))
+        await asyncio.gather(*batch)
+        await asyncio.sleep(max(0.0, min(every, deadline - time.monotonic())))
+
+
+async def wait_ready(session, base, symbols, timeout):
+    """Until /latest_data has a row for every watched symbol"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/latest_data") as res:
+                if res.status == 200:
+                    data = (await res.json()).get("data", {})
+                    if all(s in data for s in symbols):
+                        return True
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def scrape(session, base):
+    async with session.get(f"{base}/metrics") as res:
+        return parse_metrics(await res.text())
+
+
+async def drive(args, base, mock_base, server_pid, watched, unwatched):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    connector = aiohttp.TCPConnector(limit=args.readers + args.burst_size + 8)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        if not await wait_ready(session, base, watched, args.startup_timeout):
+            raise RuntimeError(f"Bot did not publish all {len(watched)} symbols within {args.startup_timeout}s")
+        await asyncio.sleep(args.warmup)
+
+        before = await scrape(session, base)
+        usage_before = resource_usage(server_pid)
+        started = time.monotonic()
+        deadline = started + args.duration
+        rss_peak = usage_before[1] if usage_before else 0
+
+        async def sample_rss():
+            nonlocal rss_peak
+            while time.monotonic() < deadline:
+                usage = resource_usage(server_pid)
+                if usage:
+                    rss_peak = max(rss_peak, usage[1])
+                await asyncio.sleep(0.5)
+
+        tasks = [reader_loop(session, base, recorder, deadline, watched, unwatched, random.Random(rng.random()))
+                 for _ in range(args.readers)]
+        if args.burst_size:
+            tasks.append(webhook_bursts(session, base, recorder, deadline, watched, args.burst_size,
+                                        args.burst_every, rng))
+        await asyncio.gather(sample_rss(), *tasks)
+        elapsed = time.monotonic() - started
+
+        # Let queued signals drain so they land in the signal-to-position histogram
+        await asyncio.sleep(1)
+        after = await scrape(session, base)
+        usage_after = resource_usage(server_pid)
+        async with session.get(f"{mock_base}/mock/stats") as res:
+            mock_stats = await res.json()
+
+    resources = None
+    if usage_before and usage_after:
+        cpu = usage_after[0] - usage_before[0]
+        resources = {
+            "cpu_seconds": cpu,
+            "cpu_percent": 100 * cpu / elapsed,
+            "rss_mb": usage_after[1] / 2**20,
+            "rss_peak_mb": rss_peak / 2**20,
+        }
+    errors = {
+        dict(labels).get("component", "") + ":" + dict(labels).get("error", ""): int(value - before.get((name, labels), 0))
+        for (name, labels), value in after.items()
+        if name == "bot_errors_total" and value - before.get((name, labels), 0)
+    }
+    return {
+        "endpoints": recorder.summary(elapsed),
+        "engine": {key: histogram_summary(before, after, name) for key, name in ENGINE_HISTOGRAMS.items()},
+        "engine_errors": errors,
+        "resources": resources,
+        "mock_exchange": {k: v for k, v in mock_stats.items() if k != "config"},
+        "duration": elapsed,
+    }
+
+
+# --- Orchestration -----------------------------------------------------------
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except OSError:
+        return None
+
+
+def start_server(args, port, mock_port, workdir, watched):
+    env = {
+        **os.environ,
+        "BINANCE_REST_URL": f"http://127.0.0.1:{mock_port}",
+        "BINANCE_WS_URL": f"ws://127.0.0.1:{mock_port}",
+        # The mock serves every venue's endpoints, so each adapter has a real HTTP path to it
+        "BYBIT_REST_URL": f"http://127.0.0.1:{mock_port}",
+        "OKX_REST_URL": f"http://127.0.0.1:{mock_port}",
+        "EXCHANGES": args.exchanges,
+        "BOT_DATA_MODE": args.mode,
+        "BOT_SYMBOLS": ",".join(watched),
+        "BOT_JOURNAL_PATH": os.path.join(workdir, "bench_state.db") if args.journal else "",
+        "CANDLE_STORE_DIR": os.path.join(workdir, "candles") if args.candles else "",
+        "API_WORKERS": str(args.workers),
+        "ENGINE_SOCKET": os.path.join(workdir, "engine.sock"),
+        "SHARED_STATE_NAME": f"bench_state_{os.getpid()}",
+        "PORT": str(port),
+        "LOG_LEVEL": "WARNING",
+    }
+    # Self-ping the local server, never a real deployment
+    env.pop("RENDER_EXTERNAL_URL", None)
+    accounts = [
+        {"id": f"bench{i}", "symbols": watched[i::args.accounts], "strategy": "short", "balance": 10000}
+        for i in range(1, args.accounts)
+    ]
+    env["BOT_ACCOUNTS"] = json.dumps(accounts) if accounts else ""
+    if args.workers > 1:
+        cmd = [sys.executable, "bot.py"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "bot:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=HERE, env=env, stdout=subprocess.DEVNULL if args.quiet else None)
+
+
+def run(args):
+    universe = universe_symbols(max(args.universe, args.symbols))
+    watched = universe[:args.symbols]
+    unwatched = universe[args.symbols:]
+    config = MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, universe=len(universe), ws_interval=args.ws_interval,
+                        seed=args.seed)
+    mock = multiprocessing.Process(target=serve, args=(config, "127.0.0.1", args.mock_port), daemon=True)
+    mock.start()
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        server = start_server(args, args.port, args.mock_port, workdir, watched)
+        try:
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{args.port}", f"http://127.0.0.1:{args.mock_port}",
+                                        server.pid, watched, unwatched))
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=20)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            mock.terminate()
+            mock.join(timeout=5)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "host": {"cpus": os.cpu_count(), "python": sys.version.split()[0]},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "quiet")},
+        **results,
+    }
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return "-"
+    return f"{seconds * 1000:.2f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def print_results(results):
+    table = Table(title=f"API latency over {results['duration']:.0f}s ({results['commit'] or 'no commit'})")
+    for col in ("Endpoint", "Requests", "Errors", "Req/s", "p50", "p90", "p99", "Max"):
+        table.add_column(col, justify="left" if col == "Endpoint" else "right")
+    for name, s in results["endpoints"].items():
+        table.add_row(name, str(s["count"]), str(s["errors"]), f"{s['rps']:.1f}", _fmt(s["p50"]), _fmt(s["p90"]),
+                      _fmt(s["p99"]), _fmt(s["max"]))
+    console.print(table)
+
+    table = Table(title="Engine (from /metrics)")
+    for col in ("Histogram", "Count", "Mean", "p50", "p99"):
+        table.add_column(col, justify="left" if col == "Histogram" else "right")
+    for name, s in results["engine"].items():
+        table.add_row(name, str(s["count"]), _fmt(s.get("mean")), _fmt(s.get("p50")), _fmt(s.get("p99")))
+    console.print(table)
+
+    res = results["resources"]
+    if res:
+        console.print(f"Server CPU {res['cpu_seconds']:.1f}s ({res['cpu_percent']:.0f}%), "
+                      f"RSS {res['rss_mb']:.0f}MB (peak {res['rss_peak_mb']:.0f}MB)")
+    if results["engine_errors"]:
+        console.print(f"Engine errors: {results['engine_errors']}")
+    console.print(f"Mock exchange: {results['mock_exchange']}")
+
+
+def compare(baseline, results):
+    """Side-by-side of the latency, throughput and resource numbers of two runs"""
+    table = Table(title=f"{baseline['commit']} -> {results['commit']}")
+    for col in ("Metric", "Baseline", "Current", "Change"):
+        table.add_column(col, justify="left" if col == "Metric" else "right")
+    for section, stat in COMPARED:
+        for name, current in results[section].items():
+            old = baseline.get(section, {}).get(name, {}).get(stat)
+            new = current.get(stat)
+            if old is None or new is None:
+                continue
+            better = new >= old if stat == "rps" else new <= old
+            change = (new - old) / old * 100 if old else 0.0
+            style = "green" if better else "red"
+            value = (lambda v: f"{v:.1f}") if stat == "rps" else _fmt
+            table.add_row(f"{section} {name} {stat}", value(old), value(new), f"[{style}]{change:+.1f}%[/{style}]")
+    for key in ("cpu_percent", "rss_peak_mb"):
+        old = (baseline.get("resources") or {}).get(key)
+        new = (results.get("resources") or {}).get(key)
+        if old and new:
+            style = "green" if new <= old else "red"
+            table.add_row(key, f"{old:.1f}", f"{new:.1f}", f"[{style}]{(new - old) / old * 100:+.1f}%[/{style}]")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bot and its API against a local mock exchange")
+    parser.add_argument("--mode", default="stream", choices=["stream", "poll"], help="BOT_DATA_MODE for the bot")
+    parser.add_argument("--symbols", type=int, default=50, help="Symbols watched by the bot")
+    parser.add_argument("--accounts", type=int, default=1, help="Paper accounts sharing those symbols")
+    parser.add_argument("--universe", type=int, default=200, help="Symbols listed by the mock exchange")
+    parser.add_argument("--workers", type=int, default=1, help="API_WORKERS for the bot")
+    parser.add_argument("--exchanges", default="binance", help="EXCHANGES for the bot, e.g. binance,bybit,okx")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--readers", type=int, default=20, help="Concurrent /positions, /latest_data, /token_data clients")
+    parser.add_argument("--burst-size", type=int, default=100, help="Webhooks per burst, 0 for none")
+    parser.add_argument("--burst-every", type=float, default=5.0, help="Seconds between webhook bursts")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--ws-interval", type=float, default=0.25, help="Seconds between mock stream pushes")
+    parser.add_argument("--journal", action="store_true", help="Enable the SQLite journal")
+    parser.add_argument("--candles", action="store_true", help="Enable the candle store")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--mock-port", type=int, default=8901)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quiet", action="store_true", help="Hide the bot's own output")
+    parser.add_argument("--out", default="bench_results/{commit}-{mode}.json",
+                        help="Result file; {commit} and {mode} are filled in")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+    out = args.out.format(commit=results["commit"] or "nocommit", mode=args.mode)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    console.print(f"Saved results to {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
@@ -1,9 +1,8 @@
-
 """
 Demo Trading Bot API Wrapper
 This creates a web API around the demo bot to make it compatible with the frontend
 """
-import requests
+import aiohttp
 import time
 from datetime import datetime
 from rich.console import Console
@@ -12,19 +11,69 @@ from rich.live import Live
 from rich.panel import Panel
 import asyncio
 import threading
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from typing import Dict, Optional, List
+from collections import OrderedDict
 import os
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import json
-from threading import Lock
 import logging
-import random
+import multiprocessing
+from contextlib import asynccontextmanager
+import clock
+from market_stream import BinanceStreamFeed
+from indicators import IndicatorEngine
+from broadcast import SnapshotBroadcaster
+from position_engine import ClosedTrade, PositionEngine, realized_pnl
+from signal_queue import QueuedSignal, QueueFullError, SignalQueue, idempotency_key
+from journal import TradeJournal
+from recorder import FeedRecorder
+from candle_store import CandleStore
+from chart_data import INTERVAL_MS, CandleQueryCache
+from scanner import SCANNER_STRATEGY, MarketScanner
+from risk import RiskBook
+from shared_state import API_WORKERS, ENGINE_SOCKET, SHARED_TRADES_LIMIT, SharedStatePublisher
+from rate_limit import PRIORITY_ON_DEMAND, PRIORITY_POSITION, PRIORITY_WATCHLIST
+from exchanges import ExchangeRouter, make_adapters
+from strategy import STRATEGY_CONFIG
+from logs import get_logger
+from metrics import (CONTENT_TYPE, HTTP_LATENCY, MARKET_UPDATE, REGISTRY, SIGNAL_LATENCY, STALE_ROWS,
+                     UPDATE_CYCLE, Gauge, InstrumentedLock, record_error)
 
 console = Console()
+log = get_logger("bot")
+
+# "stream" consumes WebSocket market data, "poll" falls back to REST polling
+BOT_DATA_MODE = os.environ.get("BOT_DATA_MODE", "stream").lower()
+# SQLite journal for paper positions and balance; empty disables persistence
+BOT_JOURNAL_PATH = os.environ.get("BOT_JOURNAL_PATH", "bot_state.db")
+JOURNAL_SNAPSHOT_INTERVAL = float(os.environ.get("JOURNAL_SNAPSHOT_INTERVAL", 60))
+# JSON-lines capture of every market data input and applied signal, for replay.py; empty disables it
+BOT_RECORD_PATH = os.environ.get("BOT_RECORD_PATH", "")
+# Local columnar store of every received kline; empty disables it
+CANDLE_STORE_DIR = os.environ.get("CANDLE_STORE_DIR", "candles")
+# Upper bound on bars returned by /candles per request
+MAX_CANDLE_POINTS = 5000
+# How long an on-demand fetch may wait for rate-limit budget before serving the cached row
+ON_DEMAND_TIMEOUT = float(os.environ.get("ON_DEMAND_TIMEOUT", 5))
+# How long on-demand /token_data rows for unwatched symbols stay fresh
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 5))
+# In stream mode, poll the exchanges over REST once the WebSocket has been down this long
+STREAM_FAILOVER_AFTER = float(os.environ.get("STREAM_FAILOVER_AFTER", 10))
+
+# Id of the account created by run_continuous_bot and served by the unscoped endpoints
+DEFAULT_ACCOUNT = "default"
+# Symbols watched by the default account
+BOT_SYMBOLS = os.environ.get("BOT_SYMBOLS", "BTC,ETH,SOL,XRP")
+# Extra paper accounts: inline JSON list or path to a JSON file of
+# {"id", "symbols", "strategy", "balance", "config"?} objects
+BOT_ACCOUNTS = os.environ.get("BOT_ACCOUNTS", "")
+
+LEVERAGE = 20  # Assumed leverage for lot sizing and liquidation
+MAINTENANCE_BUFFER = 0.8  # Liquidation after losing 80% of the initial margin
 
 @dataclass
 class Position:
@@ -35,6 +84,16 @@ class Position:
     entry_time: datetime
     tp_price: float
     sl_price: float
+    liq_price: float = 0.0
+
+    def to_dict(self):
+        d = asdict(self)
+        d['entry_time'] = self.entry_time.isoformat()
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{**d, 'entry_time': datetime.fromisoformat(d['entry_time'])})
 
 @dataclass
 class Signal:
@@ -43,129 +102,226 @@ class Signal:
     timestamp: datetime
     active: bool
 
-class HyperTradingBot:
-    def __init__(self, symbols, initial_balance, strategy):
-        self.symbols = [s.strip().upper() + "USDT" if not s.endswith("USDT") else s.strip().upper() for s in symbols.split(",")]
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Point-in-time market data. Published by swapping the bot's `snapshot`
+    reference, never mutated afterwards, so readers need no lock.
+    """
+    data: Dict[str, dict]
+    taken_at: datetime
+    version: int = 0
+
+    def price(self, symbol):
+        row = self.data.get(symbol)
+        return row['price'] if row else None
+
+@dataclass(frozen=True)
+class MarketTick:
+    """Strategy-independent values for one symbol, computed once and shared by every account"""
+    price: float
+    change: float
+    rsi: float
+    last: float  # last close
+    avg: float   # 3-candle average close
+
+class TokenCache:
+    """TTL cache for on-demand token rows, coalescing concurrent fetches of the same symbol"""
+    def __init__(self, ttl=TOKEN_CACHE_TTL, max_size=500):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # symbol -> (fetched_at, row)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def get(self, symbol, allow_stale=False):
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        fetched_at, row = entry
+        if allow_stale or clock.monotonic() - fetched_at < self.ttl:
+            return row
+        return None
+
+    def put(self, symbol, row):
+        self._entries[symbol] = (clock.monotonic(), row)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def refresh(self, symbol, fetch):
+        """Start (or join) a fetch for symbol and return its task; RuntimeError outside a running loop"""
+        # Checked before anything is created, so a caller without a loop leaves no coroutine or task behind
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(symbol)
+        if task is None:
+            async def run():
+                try:
+                    row = await fetch(symbol)
+                    if row is not None:
+                        self.put(symbol, row)
+                    return row
+                finally:
+                    self._inflight.pop(symbol, None)
+            task = self._inflight[symbol] = loop.create_task(run())
+        return task
+
+    async def get_or_fetch(self, symbol, fetch):
+        row = self.get(symbol)
+        if row is not None:
+            return row
+        return await asyncio.shield(self.refresh(symbol, fetch))
+
+class AsyncMarketDataFetcher:
+    """
+    Fetches tickers and klines for many symbols concurrently through an
+    ExchangeRouter over the venues in EXCHANGES. A cycle costs one batched
+    ticker request plus one klines request per symbol, each answered by the
+    healthiest venue (or hedged to the next one when it is slow). Every
+    venue's requests go through its own RequestScheduler, which bounds
+    in-flight requests to `concurrency` and spends that venue's weight
+    budget by priority.
+    """
+    def __init__(self, concurrency=10, timeout=5, interval="1m", limit=14,
+                 router: Optional[ExchangeRouter] = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.limit = limit
+        self.router = router or ExchangeRouter(make_adapters(concurrency=concurrency, timeout=timeout))
+
+    @property
+    def scheduler(self):
+        """The preferred venue's scheduler"""
+        return self.router.primary.scheduler
+
+    async def get_json(self, path, params=None, priority=PRIORITY_WATCHLIST, timeout=None):
+        """Raw Binance GET through its scheduler, for Binance-only endpoints such as exchangeInfo"""
+        binance = self.router.adapter("binance")
+        if binance is None:
+            raise RuntimeError(f"{path} needs binance in EXCHANGES")
+        return await binance.get_json(path, params, priority, timeout)
+
+    async def fetch_tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        """24hr tickers for all symbols, Binance-shaped, from whichever venue answers"""
+        quotes = await self.router.tickers(symbols, priority)
+        return {symbol: quote.to_ticker() for symbol, quote in quotes.items()}
+
+    async def fetch_klines(self, symbol, priority=PRIORITY_WATCHLIST):
+        return await self.router.klines(symbol, self.interval, self.limit, priority)
+
+    async def fetch_all(self, symbols, priority=PRIORITY_WATCHLIST, urgent=()):
+        """
+        Fetch ticker and klines for every symbol concurrently; symbols in
+        `urgent` (open positions) are served at PRIORITY_POSITION.
+        Returns {symbol: (ticker, klines)}; either side is None if its request failed.
+        """
+        symbols = list(symbols)
+        urgent = set(urgent)
+        tickers, *klines = await asyncio.gather(
+            self.fetch_tickers(symbols, PRIORITY_POSITION if urgent & set(symbols) else priority),
+            *(self.fetch_klines(s, PRIORITY_POSITION if s in urgent else priority) for s in symbols),
+            return_exceptions=True,
+        )
+        if isinstance(tickers, BaseException):
+            record_error("fetch_tickers", tickers)
+            log.warning("ticker fetch failed", symbols=len(symbols), error=repr(tickers))
+            tickers = {}
+
+        results = {}
+        for symbol, k_res in zip(symbols, klines):
+            if isinstance(k_res, BaseException):
+                record_error("fetch_klines", k_res)
+                log.warning("klines fetch failed", symbol=symbol, error=repr(k_res))
+                k_res = None
+            results[symbol] = (tickers.get(symbol), k_res)
+        return results
+
+    async def close(self):
+        await self.router.close()
+
+def normalize_symbols(symbols):
+    """"BTC,eth" or ["BTC", "ETHUSDT"] -> ["BTCUSDT", "ETHUSDT"]"""
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    out = []
+    for s in symbols:
+        s = s.strip().upper()
+        if s and not s.endswith("USDT"):
+            s += "USDT"
+        if s and s not in out:
+            out.append(s)
+    return out
+
+class TradingAccount:
+    """
+    One paper-trading strategy instance: its own symbols, strategy config,
+    balance, positions and trade history. Market data and indicators belong
+    to the HyperTradingBot hosting it, so extra accounts cost no exchange I/O.
+    """
+    def __init__(self, account_id, symbols, initial_balance, strategy, config=None):
+        self.id = account_id
+        self.symbols = normalize_symbols(symbols)
         self.balance = float(initial_balance)
         self.start_balance = float(initial_balance)
         self.strategy = strategy.lower()
+        self.config = {name: dict(conf) for name, conf in STRATEGY_CONFIG.items()}
+        if self.strategy not in self.config:
+            raise ValueError(f"Unknown strategy {strategy!r}, expected one of {', '.join(STRATEGY_CONFIG)}")
+        if config:
+            self.config[self.strategy].update(config)
         self.positions: Dict[str, Position] = {}
+        # Trigger-price index over open positions, plus the closed trade history
+        self.position_engine = PositionEngine()
         self.signals: Dict[str, Signal] = {}
-        
-        # Aggressive Logic for Presentation (Sensitivity increased)
-        self.config = {
-            'scalping': {'tp': 0.008, 'sl': 0.004, 'rsi_buy': 48, 'rsi_sell': 52}, 
-            'short':    {'tp': 0.015, 'sl': 0.008, 'rsi_buy': 45, 'rsi_sell': 55},
-            'swing':    {'tp': 0.040, 'sl': 0.020, 'rsi_buy': 40, 'rsi_high': 60}
+        # Shared with the hosting bot; events are tagged with this account's id
+        self.journal: Optional[TradeJournal] = None
+        # Engine-wide risk columns; also shared, set by the hosting bot
+        self.risk: Optional[RiskBook] = None
+        self.lock = InstrumentedLock("account")
+        # Called after every position change
+        self.listeners: List = []
+
+    def spec(self):
+        """What it takes to recreate this account (journaled on creation)"""
+        return {
+            'id': self.id,
+            'symbols': self.symbols,
+            'strategy': self.strategy,
+            'balance': self.start_balance,
+            'config': self.config[self.strategy],
         }
-        
-        # Thread safety
-        self.lock = Lock()
-        
-        # Storage for latest data
-        self.latest_data = {}
-        self.last_update_time = datetime.now()
 
-    def fetch_optimized_data(self, symbol):
-        try:
-            t_url = f"https://api.binance.com/api/v3/ticker/24hr?symbol={symbol}"
-            k_url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval=1m&limit=14" # Using 1m for speed
-            
-            # Add headers to avoid being blocked
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            t_res = requests.get(t_url, timeout=5, headers=headers).json()
-            k_res = requests.get(k_url, timeout=5, headers=headers).json()
-            
-            # Check if the response contains the expected data
-            if 'lastPrice' not in t_res or 'priceChangePercent' not in t_res:
-                print(f"Warning: Unexpected API response format for {symbol}, using fallback values")
-                # Generate reasonable fallback values based on symbol
-                base_prices = {"BTCUSDT": 45000, "ETHUSDT": 2500, "SOLUSDT": 100, "XRPUSDT": 0.5}
-                base_price = base_prices.get(symbol, 1000)
-                fluctuation = random.uniform(-0.05, 0.05)  # -5% to +5%
-                curr_price = base_price * (1 + fluctuation)
-                change = round(fluctuation * 100, 2)
-                
-                return {
-                    "price": curr_price,
-                    "change": change,
-                    "rsi": 50,
-                    "signal": "HOLD",
-                    "tp": "---",
-                    "sl": "---"
-                }
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec['id'], spec['symbols'], spec['balance'], spec['strategy'], spec.get('config'))
 
-            curr_price = float(t_res['lastPrice'])
-            change = float(t_res['priceChangePercent'])
-            closes = [float(k[4]) for k in k_res]
-            
-            rsi = self.calculate_rsi(closes)
-            signal = self.generate_aggressive_signal(rsi, change, closes)
-            
-            tp, sl = "---", "---"
-            # Signal triggers TP/SL display
-            if "BUY" in signal or "LONG" in signal:
-                tp = f"{curr_price * (1 + self.config[self.strategy]['tp']):.2f}"
-                sl = f"{curr_price * (1 - self.config[self.strategy]['sl']):.2f}"
-                self.balance += (curr_price * 0.0001) 
-            elif "SELL" in signal or "SHORT" in signal:
-                tp = f"{curr_price * (1 - self.config[self.strategy]['tp']):.2f}"
-                sl = f"{curr_price * (1 + self.config[self.strategy]['sl']):.2f}"
-                self.balance += (curr_price * 0.00005)
-                
-            return {"price": curr_price, "change": change, "rsi": rsi, "signal": signal, "tp": tp, "sl": sl}
-        except requests.exceptions.RequestException as e:
-            print(f"Network error fetching data for {symbol}: {e}")
-            # Generate reasonable fallback values
-            base_prices = {"BTCUSDT": 45000, "ETHUSDT": 2500, "SOLUSDT": 100, "XRPUSDT": 0.5}
-            base_price = base_prices.get(symbol, 1000)
-            fluctuation = random.uniform(-0.05, 0.05)  # -5% to +5%
-            curr_price = base_price * (1 + fluctuation)
-            change = round(fluctuation * 100, 2)
-            
-            return {
-                "price": curr_price,
-                "change": change,
-                "rsi": 50,
-                "signal": "HOLD",
-                "tp": "---",
-                "sl": "---"
-            }
-        except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
-            # Generate reasonable fallback values
-            base_prices = {"BTCUSDT": 45000, "ETHUSDT": 2500, "SOLUSDT": 100, "XRPUSDT": 0.5}
-            base_price = base_prices.get(symbol, 1000)
-            fluctuation = random.uniform(-0.05, 0.05)  # -5% to +5%
-            curr_price = base_price * (1 + fluctuation)
-            change = round(fluctuation * 100, 2)
-            
+    def summary(self):
+        with self.lock:
             return {
-                "price": curr_price,
-                "change": change,
-                "rsi": 50,
-                "signal": "HOLD",
-                "tp": "---",
-                "sl": "---"
+                'id': self.id,
+                'strategy': self.strategy,
+                'symbols': self.symbols,
+                'balance': self.balance,
+                'start_balance': self.start_balance,
+                'open_positions': len(self.positions),
+                'closed_trades': len(self.position_engine.history),
             }
 
-    def calculate_rsi(self, prices):
-        if len(prices) < 10: return 50
-        deltas = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-        gain = sum([d for d in deltas if d > 0]) / len(deltas)
-        loss = abs(sum([d for d in deltas if d < 0])) / len(deltas)
-        if loss == 0: return 100
-        rs = gain / loss
-        return round(100 - (100 / (1 + rs)), 2)
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
 
-    def generate_aggressive_signal(self, rsi, change, closes):
+    def evaluate(self, symbol, tick, accrue=True):
+        """This strategy's signal and TP/SL levels for a shared MarketTick"""
+        signal = self.signal_rule(tick.rsi, tick.change, tick.last, tick.avg)
+        if not accrue:
+            return self.apply_signal(tick.price, tick.change, tick.rsi, signal, accrue=False)
+        with self.lock:
+            return self.apply_signal(tick.price, tick.change, tick.rsi, signal, accrue=True)
+
+    def signal_rule(self, rsi, change, last_price, avg_price):
         conf = self.config[self.strategy]
-        avg_price = sum(closes[-3:]) / 3 # Faster average
-        last_price = closes[-1]
-        
+
         # Hyper-sensitive logic: RSI or Price Movement triggers it
         if rsi <= conf['rsi_buy'] or (last_price > avg_price and change > 0.01):
             return "BUY"
@@ -173,104 +329,181 @@ class HyperTradingBot:
             return "SELL"
         return "HOLD"
 
-    def get_current_data(self):
-        """Get current market data for all symbols"""
+    def apply_signal(self, curr_price, change, rsi, signal, accrue=True):
+        tp, sl = "---", "---"
+        # Signal triggers TP/SL display
+        if "BUY" in signal or "LONG" in signal:
+            tp = f"{curr_price * (1 + self.config[self.strategy]['tp']):.2f}"
+            sl = f"{curr_price * (1 - self.config[self.strategy]['sl']):.2f}"
+            if accrue:
+                self.balance += (curr_price * 0.0001)
+                self._journal('balance', {'balance': self.balance})
+        elif "SELL" in signal or "SHORT" in signal:
+            tp = f"{curr_price * (1 - self.config[self.strategy]['tp']):.2f}"
+            sl = f"{curr_price * (1 + self.config[self.strategy]['sl']):.2f}"
+            if accrue:
+                self.balance += (curr_price * 0.00005)
+                self._journal('balance', {'balance': self.balance})
+
+        return {"price": curr_price, "change": change, "rsi": rsi, "signal": signal, "tp": tp, "sl": sl}
+
+    def token_row(self, symbol, d):
+        """Shape market data into the row served by the API"""
+        # Calculate lot quantity
+        lot_qty = (self.balance * 0.10 * LEVERAGE) / d['price']  # Assuming 20x leverage
+        return {
+            'symbol': symbol.replace("USDT", ""),
+            'price': d['price'],
+            'change': d['change'],
+            'rsi': d['rsi'],
+            'signal': d['signal'],
+            'tp': d['tp'],
+            'sl': d['sl'],
+            'lot_qty': lot_qty,
+            'last_updated': clock.now().isoformat()
+        }
+
+    def check_triggers(self, symbol, price):
+        """Close positions whose TP, SL or liquidation level `price` crossed"""
         with self.lock:
-            data = {}
-            for symbol in self.symbols:
-                d = self.fetch_optimized_data(symbol)
-                if d:
-                    # Calculate lot quantity
-                    lot_qty = (self.balance * 0.10 * 20) / d['price']  # Assuming 20x leverage
-                    data[symbol] = {
-                        'symbol': symbol.replace("USDT", ""),
-                        'price': d['price'],
-                        'change': d['change'],
-                        'rsi': d['rsi'],
-                        'signal': d['signal'],
-                        'tp': d['tp'],
-                        'sl': d['sl'],
-                        'lot_qty': lot_qty,
-                        'last_updated': datetime.now().isoformat()
-                    }
-            
-            # Update latest data
-            self.latest_data = data
-            self.last_update_time = datetime.now()
-            return data
-    
-    def get_single_token_data(self, token):
-        """Get data for a specific token"""
+            fired = self.position_engine.on_price(symbol, price)
+            for position, reason, fill in fired:
+                self._close_position(position, fill, reason)
+        return fired
+
+    def _track(self, position):
+        self.position_engine.add(position)
+        if self.risk is not None:
+            self.risk.add(self, position)
+
+    def _untrack(self, position):
+        self.position_engine.remove(position)
+        if self.risk is not None:
+            self.risk.remove(position)
+
+    def _close_position(self, position, exit_price, reason):
+        """Realize a position's PnL into balance; caller holds self.lock"""
+        self._untrack(position)
+        trade = self.position_engine.record(position, exit_price, reason)
+        self.balance += trade.pnl
+        self._journal('close', {'trade': trade.to_dict(), 'balance': self.balance})
+        if self.positions.get(position.symbol) is position:
+            del self.positions[position.symbol]
+            self.signals.pop(position.symbol, None)
+        log.info("position closed", account=self.id, reason=reason, side=position.side, symbol=position.symbol,
+                 quantity=position.quantity, exit_price=exit_price, pnl=round(trade.pnl, 2))
+        return trade
+
+    def _journal(self, type_, payload):
+        if self.journal is not None:
+            self.journal.append(type_, {**payload, 'account': self.id})
+
+    def to_state(self):
+        """Compact persistent state; caller holds self.lock"""
+        return {
+            'spec': self.spec(),
+            'balance': self.balance,
+            'start_balance': self.start_balance,
+            'positions': [p.to_dict() for p in self.positions.values()],
+            'history': [t.to_dict() for t in self.position_engine.history],
+        }
+
+    def restore_state(self, state):
+        """Load a to_state() snapshot; caller holds self.lock"""
+        self.balance = state['balance']
+        self.start_balance = state['start_balance']
+        for d in state['positions']:
+            self._restore_position(Position.from_dict(d))
+        for d in state['history']:
+            self.position_engine.history.append(ClosedTrade.from_dict(d))
+
+    def apply_event(self, type_, payload):
+        """Replay one journal event; caller holds self.lock"""
+        if type_ == 'open':
+            self._restore_position(Position.from_dict(payload['position']))
+        elif type_ == 'close':
+            trade = ClosedTrade.from_dict(payload['trade'])
+            current = self.positions.get(trade.symbol)
+            if current is not None and current.entry_time == trade.entry_time:
+                self._untrack(current)
+                del self.positions[trade.symbol]
+            self.position_engine.history.append(trade)
+        if 'balance' in payload:
+            self.balance = payload['balance']
+
+    def _restore_position(self, position):
+        previous = self.positions.get(position.symbol)
+        if previous is not None:
+            self._untrack(previous)
+        self.positions[position.symbol] = position
+        self._track(position)
+
+    def get_trade_history(self, limit=100):
         with self.lock:
-            symbol = token.upper()
-            if not symbol.endswith("USDT"):
-                symbol = symbol + "USDT"
-            
-            d = self.fetch_optimized_data(symbol)
-            if d:
-                # Calculate lot quantity
-                lot_qty = (self.balance * 0.10 * 20) / d['price']  # Assuming 20x leverage
-                data = {
-                    symbol: {
-                        'symbol': symbol.replace("USDT", ""),
-                        'price': d['price'],
-                        'change': d['change'],
-                        'rsi': d['rsi'],
-                        'signal': d['signal'],
-                        'tp': d['tp'],
-                        'sl': d['sl'],
-                        'lot_qty': lot_qty,
-                        'last_updated': datetime.now().isoformat()
-                    }
-                }
-                return data
-            return {}
+            trades = list(self.position_engine.history)[-limit:]
+        return {
+            'trades': [t.to_dict() for t in reversed(trades)],
+            'realized_pnl': sum(t.pnl for t in trades),
+            'balance': self.balance,
+        }
 
-    def process_signal(self, symbol, side):
-        """Process a trading signal"""
+    def process_signal(self, symbol, side, data):
+        """Open a position for a BUY/SELL signal at the given market data row"""
         with self.lock:
-            # Normalize symbol
-            if not symbol.endswith("USDT"):
-                symbol = symbol + "USDT"
-            symbol = symbol.upper()
-            
-            # Get current data for the symbol
-            data = self.fetch_optimized_data(symbol)
-            if not data:
-                return {"error": f"Could not fetch data for {symbol}"}
-            
-            # Create a position based on the signal
+            # Levels come from the strategy for the requested side; the data
+            # row's tp/sl follow its own signal, which may point the other way
+            conf = self.config[self.strategy]
             if side.upper() == "BUY":
                 side_type = "LONG"
-                tp_price = float(data['tp']) if data['tp'] != "---" else data['price'] * 1.008
-                sl_price = float(data['sl']) if data['sl'] != "---" else data['price'] * 0.996
+                tp_price = data['price'] * (1 + conf['tp'])
+                sl_price = data['price'] * (1 - conf['sl'])
             elif side.upper() == "SELL":
                 side_type = "SHORT"
-                tp_price = float(data['tp']) if data['tp'] != "---" else data['price'] * 0.992
-                sl_price = float(data['sl']) if data['sl'] != "---" else data['price'] * 1.004
+                tp_price = data['price'] * (1 - conf['tp'])
+                sl_price = data['price'] * (1 + conf['sl'])
             else:
                 return {"error": "Invalid side, must be BUY or SELL"}
-            
+
             # Calculate quantity based on risk management
             risk_amount = self.balance * 0.01  # 1% risk per trade
             price_diff = abs(data['price'] - sl_price)
             quantity = risk_amount / price_diff if price_diff > 0 else 0.001  # Default small quantity
-            
+            lot_qty = (self.balance * 0.10 * LEVERAGE) / data['price']
+
+            liq_move = MAINTENANCE_BUFFER / LEVERAGE
+            liq_price = data['price'] * (1 - liq_move) if side_type == 'LONG' else data['price'] * (1 + liq_move)
+
             position = Position(
                 symbol=symbol,
                 side=side_type,
                 entry_price=data['price'],
-                quantity=min(quantity, data['lot_qty']),  # Cap at available lot qty
-                entry_time=datetime.now(),
+                quantity=min(quantity, lot_qty),  # Cap at available lot qty
+                entry_time=clock.now(),
                 tp_price=tp_price,
-                sl_price=sl_price
+                sl_price=sl_price,
+                liq_price=liq_price
             )
-            
+
+            # One position per symbol: the previous one is closed at market,
+            # so the risk check nets it out of the exposure it replaces
+            previous = self.positions.get(symbol)
+            if self.risk is not None:
+                breach = self.risk.check(self, symbol, side_type, position.quantity, data['price'], previous)
+                if breach:
+                    return {"error": f"Rejected by risk limits: {breach}", "account": self.id, "risk_rejected": True}
+            if previous is not None:
+                self._close_position(previous, data['price'], 'REPLACED')
+
             self.positions[symbol] = position
-            
+            self._track(position)
+            self._journal('open', {'position': position.to_dict(), 'balance': self.balance})
+            self.signals[symbol] = Signal(symbol=symbol, side=side.upper(), timestamp=position.entry_time, active=True)
+            self._notify()
+
             return {
                 "success": True,
                 "message": f"Position opened: {side} {position.quantity:.6f} {symbol}",
+                "account": self.id,
                 "position": {
                     "symbol": symbol,
                     "side": side_type,
@@ -282,67 +515,690 @@ class HyperTradingBot:
                 }
             }
 
-    def get_positions(self):
-        """Get all current positions"""
+    def get_positions(self, price_of):
+        """Open positions priced with `price_of(symbol)`, plus account totals"""
         with self.lock:
-            positions_data = []
-            for symbol, position in self.positions.items():
-                # Get current price for PnL calculation
-                data = self.fetch_optimized_data(symbol)
-                current_price = data['price'] if data else position.entry_price
-                
-                pnl = (current_price - position.entry_price) * position.quantity
-                if position.side == 'SHORT':
-                    pnl = -pnl
-                    
-                positions_data.append({
-                    'token': symbol,
-                    'current_price': current_price,
-                    'entry_price': position.entry_price,
-                    'side': position.side,
-                    'quantity': position.quantity,
-                    'tp_price': position.tp_price,
-                    'sl_price': position.sl_price,
-                    'liq_price': position.entry_price * (1 - (0.8 / 20)) if position.side == 'LONG' else position.entry_price * (1 + (0.8 / 20)),
-                    'pnl': pnl,
-                    'pnl_percent': (pnl / (position.quantity * position.entry_price)) * 100 if position.quantity * position.entry_price != 0 else 0
-                })
+            positions = list(self.positions.items())
+            balance = self.balance
+        distances = self.risk.liquidation_distances([p for _, p in positions]) if self.risk is not None else {}
+
+        positions_data = []
+        for symbol, position in positions:
+            isolated, cross = distances.get(id(position), (None, None))
+            # Current price for PnL calculation comes from the snapshot/cache
+            current_price = price_of(symbol) or position.entry_price
+
+            pnl = realized_pnl(position, current_price)
+
+            positions_data.append({
+                'token': symbol,
+                'current_price': current_price,
+                'entry_price': position.entry_price,
+                'side': position.side,
+                'quantity': position.quantity,
+                'tp_price': position.tp_price,
+                'sl_price': position.sl_price,
+                'liq_price': position.liq_price,
+                # Adverse move (% of price) to this position's liq price, and to the account running out of margin
+                'liq_distance_pct': round(isolated * 100, 3) if isolated is not None else None,
+                'cross_liq_distance_pct': round(cross * 100, 3) if cross is not None else None,
+                'pnl': pnl,
+                'pnl_percent': (pnl / (position.quantity * position.entry_price)) * 100 if position.quantity * position.entry_price != 0 else 0
+            })
+
+        return {
+            'positions': positions_data,
+            'balance': balance,
+            'paper_trading': True,  # Demo bot always uses paper trading
+            'active_signals': len(self.signals),
+            'total_positions': len(positions)
+        }
+
+class HyperTradingBot:
+    """
+    Market data engine hosting one or more TradingAccounts. Prices and
+    indicators are fetched/streamed and computed once per symbol for the
+    union of all accounts' symbols; each account only applies its own
+    strategy rule and position triggers on top. The account passed to the
+    constructor is the primary one, served by the unscoped endpoints.
+    """
+    def __init__(self, symbols, initial_balance, strategy, account_id=DEFAULT_ACCOUNT):
+        self.accounts: Dict[str, TradingAccount] = {}
+        # Union of all accounts' symbols, and which accounts watch each
+        self.symbols: List[str] = []
+        self._watchers: Dict[str, List[TradingAccount]] = {}
+        # Durable journal shared by all accounts; set by attach_journal
+        self.journal: Optional[TradeJournal] = None
+        # Capture of engine inputs for replay; set by attach_recorder
+        self.recorder: Optional[FeedRecorder] = None
+        # Optional local kline history, fed by every fetch and stream message
+        self.candle_store: Optional[CandleStore] = None
+        self.candle_queries: Optional[CandleQueryCache] = None
+        # Stream feed, set in stream mode so new accounts can add symbols
+        self.feed: Optional[BinanceStreamFeed] = None
+        # Whole-market screener, set when SCANNER_STRATEGY is configured
+        self.scanner: Optional[MarketScanner] = None
+        # Columnar view of every account's positions for exposure, VaR and pre-trade limits
+        self.risk = RiskBook(LEVERAGE, MAINTENANCE_BUFFER)
+
+        # Thread safety
+        self.lock = InstrumentedLock("engine")
+
+        # Storage for latest data, read lock-free through the `snapshot` reference
+        self.snapshot = MarketSnapshot(data={}, taken_at=clock.now())
+        self._pending_rows: Dict[str, dict] = {}
+        self._flush_scheduled = False
+        self.token_cache = TokenCache()
+        # Latest shared indicator values per symbol, evaluated by each account
+        self.market: Dict[str, MarketTick] = {}
+        # Called after every snapshot publish or position change
+        self.listeners: List = []
+
+        # Rolling per-symbol indicators, updated in O(1) per streamed candle
+        self.indicators = IndicatorEngine(rsi_window=14, sma_periods=(3,))
+        self._indicator_resets: Dict[str, int] = {}
+
+        # Pooled async client for the periodic market data refresh
+        self.fetcher = AsyncMarketDataFetcher(concurrency=int(os.environ.get("FETCH_CONCURRENCY", 10)))
+
+        self.primary = self.add_account(TradingAccount(account_id, symbols, initial_balance, strategy))
+
+    def add_account(self, account: TradingAccount, journal=True):
+        """Host `account`; its symbols join the shared feed if they are new"""
+        if account.id in self.accounts:
+            raise ValueError(f"Account {account.id!r} already exists")
+        account.journal = self.journal
+        account.risk = self.risk
+        self.risk.add_account(account)
+        account.listeners.append(self._notify)
+        self.accounts[account.id] = account
+        new_symbols = []
+        for symbol in account.symbols:
+            if symbol not in self._watchers:
+                self._watchers[symbol] = []
+                self.symbols.append(symbol)
+                new_symbols.append(symbol)
+            self._watchers[symbol].append(account)
+        if journal and self.journal is not None:
+            self.journal.append('account', account.spec())
+        if journal and self.recorder is not None:
+            self.recorder.record('account', account.spec())
+        if new_symbols and self.feed is not None:
+            self.feed.add_symbols(new_symbols)
+        self._notify()
+        return account
+
+    def account(self, account_id=None) -> Optional[TradingAccount]:
+        return self.primary if account_id is None else self.accounts.get(account_id)
+
+    # The primary account's state, as read by single-account callers
+    @property
+    def balance(self):
+        return self.primary.balance
+
+    @property
+    def start_balance(self):
+        return self.primary.start_balance
+
+    @property
+    def strategy(self):
+        return self.primary.strategy
+
+    @property
+    def config(self):
+        return self.primary.config
+
+    @property
+    def positions(self):
+        return self.primary.positions
+
+    @property
+    def position_engine(self):
+        return self.primary.position_engine
+
+    @property
+    def signals(self):
+        return self.primary.signals
+
+    @property
+    def latest_data(self):
+        return self.snapshot.data
+
+    @property
+    def last_update_time(self):
+        return self.snapshot.taken_at
+
+    def _publish(self, data):
+        """Atomically replace the market snapshot"""
+        self.snapshot = MarketSnapshot(data=data, taken_at=clock.now(), version=self.snapshot.version + 1)
+        self._notify()
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def _flush_pending(self):
+        self._flush_scheduled = False
+        if self._pending_rows:
+            rows, self._pending_rows = self._pending_rows, {}
+            self._publish({**self.snapshot.data, **rows})
+
+    def _build_market_data(self, symbol, t_res, k_res):
+        """Turn a raw 24hr ticker and kline list into the bot's market data dict"""
+        # Never substitute made-up values; callers keep the last real row instead
+        if not isinstance(t_res, dict) or 'lastPrice' not in t_res or 'priceChangePercent' not in t_res:
+            raise ValueError(f"unexpected ticker format for {symbol}")
+
+        curr_price = float(t_res['lastPrice'])
+        change = float(t_res['priceChangePercent'])
+        closes = [float(k[4]) for k in k_res]
+        return self._compute_market_data(symbol, curr_price, change, closes)
+
+    def _compute_market_data(self, symbol, curr_price, change, closes, accrue=True):
+        """Derive RSI, signal and TP/SL levels from a price, 24h change and recent closes"""
+        tick = MarketTick(
+            price=curr_price,
+            change=change,
+            rsi=self.calculate_rsi(closes),
+            last=closes[-1],
+            avg=sum(closes[-3:]) / 3,  # Faster average
+        )
+        return self._update_market(symbol, tick, accrue)
+
+    def _update_market(self, symbol, tick, accrue=True):
+        """
+        Record the shared tick for `symbol` and return the primary account's
+        view of it. Accounts watching the symbol only need to evaluate it
+        here when the demo balance drift accrues; otherwise their rows are
+        derived on request.
+        """
+        self.market[symbol] = tick
+        d = None
+        if accrue:
+            for account in self._watchers.get(symbol, ()):
+                result = account.evaluate(symbol, tick, accrue=True)
+                if account is self.primary:
+                    d = result
+        if d is None:
+            d = self.primary.evaluate(symbol, tick, accrue=False)
+        return d
+
+    def _token_row(self, symbol, d):
+        return self.primary.token_row(symbol, d)
+
+    def account_rows(self, account: TradingAccount):
+        """Latest market rows for `account`'s symbols, from its own strategy's point of view"""
+        rows = {}
+        for symbol in account.symbols:
+            tick = self.market.get(symbol)
+            if tick is not None:
+                rows[symbol] = account.token_row(symbol, account.evaluate(symbol, tick, accrue=False))
+        return rows
+
+    def fetch_optimized_data(self, symbol):
+        """
+        Best known row for `symbol` without network I/O: the snapshot, else the
+        (possibly stale) on-demand cache, else None. Fresh rows only come from
+        the exchange router, and never from made-up prices.
+        """
+        return self.snapshot.data.get(symbol) or self.token_cache.get(symbol, allow_stale=True)
+
+    def calculate_rsi(self, prices):
+        if len(prices) < 10: return 50
+        deltas = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
+        gain = sum([d for d in deltas if d > 0]) / len(deltas)
+        loss = abs(sum([d for d in deltas if d < 0])) / len(deltas)
+        if loss == 0: return 100
+        rs = gain / loss
+        return round(100 - (100 / (1 + rs)), 2)
+
+    def record_klines(self, symbol, interval, klines):
+        """Persist received klines to the local candle store"""
+        if self.candle_store is None or not isinstance(klines, list):
+            return
+        try:
+            self.candle_store.add_klines(symbol, interval, klines)
+        except Exception as e:
+            record_error("candle_store", e)
+            log.error("storing klines failed", symbol=symbol, error=repr(e))
+
+    def _open_symbols(self):
+        return {symbol for account in self.accounts.values() for symbol in account.positions}
+
+    async def get_current_data(self):
+        """Get current market data for all symbols"""
+        # Network I/O happens outside the lock; only the state update is guarded
+        raw = await self.fetcher.fetch_all(self.symbols, urgent=self._open_symbols())
+        return self.apply_market_data(raw)
+
+    def apply_market_data(self, raw):
+        """Publish one fetch_all() result, {symbol: (ticker, klines)}, and check triggers at its prices"""
+        if self.recorder is not None:
+            self.recorder.record('poll', raw)
+        for symbol, (_, k_res) in raw.items():
+            self.record_klines(symbol, self.fetcher.interval, k_res)
+        with self.lock:
+            data = {}
+            fresh = set()
+            previous = self.snapshot.data
+            for symbol in self.symbols:
+                t_res, k_res = raw.get(symbol, (None, None))
+                if t_res is not None and k_res is not None:
+                    try:
+                        data[symbol] = self._token_row(symbol, self._build_market_data(symbol, t_res, k_res))
+                        fresh.add(symbol)
+                        continue
+                    except Exception as e:
+                        record_error("parse", e)
+                        log.error("parsing market data failed", symbol=symbol, error=repr(e))
+                # Throttled or failed: keep showing the last real row rather than inventing one
+                if symbol in previous:
+                    data[symbol] = previous[symbol]
+                    STALE_ROWS.labels(symbol).inc()
             
-            return {
-                'positions': positions_data,
-                'balance': self.balance,
-                'paper_trading': True,  # Demo bot always uses paper trading
-                'active_signals': len(self.signals),
-                'total_positions': len(self.positions)
-            }
+            # Update latest data
+            self._publish(data)
+        for symbol in fresh:
+            self._check_triggers(symbol, data[symbol]['price'])
+        return data
+    
+    def on_market_update(self, state, candle_closed):
+        """Apply a streamed SymbolState update to latest_data without any network I/O"""
+        with MARKET_UPDATE.time():
+            symbol = state.symbol
+            if self._indicator_resets.get(symbol) != state.resets:
+                # The feed replaced its history (backfill), start from that window
+                self.indicators.seed(symbol, state.closes, state.last_open_time)
+                self._indicator_resets[symbol] = state.resets
+            else:
+                self.indicators.update(symbol, state.last_open_time, state.closes[-1])
+            ind = self.indicators.get(symbol)
+
+            tick = MarketTick(price=state.price, change=state.change, rsi=ind.rsi, last=ind.last, avg=ind.sma(3))
+            # Streams update many times per second, so the demo balance drift is
+            # only accrued once per closed candle rather than on every tick
+            d = self._update_market(symbol, tick, accrue=candle_closed)
+            with self.lock:
+                self._pending_rows[symbol] = self._token_row(symbol, d)
+            # Coalesce a burst of stream messages into one snapshot swap
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                asyncio.get_running_loop().call_soon(self._flush_pending)
+            self._check_triggers(symbol, state.price)
+
+    async def _fetch_token_row(self, symbol, priority=PRIORITY_ON_DEMAND):
+        """Fresh row for one symbol; the last cached row (or None) if the exchange is throttling us"""
+        try:
+            raw = await asyncio.wait_for(self.fetcher.fetch_all([symbol], priority), ON_DEMAND_TIMEOUT)
+        except asyncio.TimeoutError:
+            raw = {}
+        t_res, k_res = raw.get(symbol, (None, None))
+        if t_res is None or k_res is None:
+            return self.token_cache.get(symbol, allow_stale=True)
+        return self.apply_token_data(symbol, t_res, k_res)
+
+    def apply_token_data(self, symbol, t_res, k_res):
+        """Row for one on-demand fetch of `symbol`, checking triggers at its price"""
+        if self.recorder is not None:
+            self.recorder.record('token', {'symbol': symbol, 'ticker': t_res, 'klines': k_res})
+        self.record_klines(symbol, self.fetcher.interval, k_res)
+        try:
+            with self.lock:
+                row = self._token_row(symbol, self._build_market_data(symbol, t_res, k_res))
+        except Exception as e:
+            record_error("parse", e)
+            log.error("parsing market data failed", symbol=symbol, error=repr(e))
+            return self.token_cache.get(symbol, allow_stale=True)
+        self._check_triggers(symbol, row['price'])
+        return row
+
+    def _fetch_position_row(self, symbol):
+        return self._fetch_token_row(symbol, PRIORITY_POSITION)
+
+    async def get_single_token_data(self, token):
+        """Get data for a specific token from the snapshot, or the TTL cache for unwatched tokens"""
+        symbol = token.upper()
+        if not symbol.endswith("USDT"):
+            symbol = symbol + "USDT"
+
+        row = self.snapshot.data.get(symbol)
+        if row is None:
+            row = await self.token_cache.get_or_fetch(symbol, self._fetch_token_row)
+        return {symbol: row} if row else {}
+
+    def _check_triggers(self, symbol, price):
+        """Close every account's positions whose TP, SL or liquidation level `price` crossed"""
+        self.risk.on_price(symbol, price)
+        fired = []
+        for account in self.accounts.values():
+            fired += account.check_triggers(symbol, price)
+        if fired:
+            self._notify()
+        return fired
+
+    def to_state(self):
+        """Compact persistent state of every account"""
+        accounts = []
+        for account in self.accounts.values():
+            with account.lock:
+                accounts.append(account.to_state())
+        return {'accounts': accounts}
+
+    def restore(self, state, events):
+        """Rebuild accounts, balances, positions and trade history from a snapshot plus the journal tail"""
+        if state:
+            # Snapshots from before multi-account support hold just the primary account
+            for entry in state.get('accounts', [state]):
+                account = self._restored_account(entry.get('spec'))
+                with account.lock:
+                    account.restore_state(entry)
+        for _, type_, payload in events:
+            if type_ == 'account':
+                self._restored_account(payload)
+                continue
+            account = self.accounts.get(payload.get('account', self.primary.id))
+            if account is not None:
+                with account.lock:
+                    account.apply_event(type_, payload)
+
+    def _restored_account(self, spec):
+        if spec is None:
+            return self.primary
+        account = self.accounts.get(spec['id'])
+        if account is None:
+            account = self.add_account(TradingAccount.from_spec(spec), journal=False)
+        return account
+
+    def attach_journal(self, journal: TradeJournal):
+        """Restore from `journal`, then record every further change to it"""
+        started = time.perf_counter()
+        state, events = journal.load()
+        self.restore(state, events)
+        positions = sum(len(a.positions) for a in self.accounts.values())
+        log.info("state restored from journal", accounts=len(self.accounts), positions=positions,
+                 balance=round(self.balance, 2), events=len(events),
+                 ms=round((time.perf_counter() - started) * 1000, 1))
+        self.journal = journal
+        for account in self.accounts.values():
+            account.journal = journal
+        journal.start()
+
+    def attach_recorder(self, recorder: FeedRecorder, interval="1m", limit=14):
+        """Start capturing engine inputs to `recorder`, from the current state"""
+        self.recorder = recorder
+        recorder.start()
+        recorder.record('start', {'state': self.to_state(), 'mode': BOT_DATA_MODE,
+                                  'interval': interval, 'limit': limit})
+        log.info("recording engine inputs", path=recorder.path)
+
+    def close_recorder(self):
+        """Record the final state, which replay.py compares its own result against, and stop"""
+        if self.recorder is not None:
+            self.recorder.record('end', {'state': self.to_state()})
+            self.recorder.close()
+            self.recorder = None
+
+    def snapshot_journal(self):
+        if self.journal is not None:
+            self.journal.snapshot(self.to_state())
+
+    def get_trade_history(self, limit=100, account_id=None):
+        return self.account(account_id).get_trade_history(limit)
+
+    def _current_price(self, symbol):
+        """Best known price without network I/O; refreshes stale cache entries in the background"""
+        price = self.snapshot.price(symbol)
+        if price is not None:
+            return price
+        if self.token_cache.get(symbol) is None:
+            try:
+                self.token_cache.refresh(symbol, self._fetch_position_row)
+            except RuntimeError:
+                pass  # No running loop (called from a plain thread)
+        row = self.token_cache.get(symbol, allow_stale=True)
+        return row['price'] if row else None
+
+    async def handle_signal(self, signal: QueuedSignal):
+        """Apply a queued webhook signal to its account at the latest cached price"""
+        symbol = signal.symbol if signal.symbol.endswith("USDT") else signal.symbol + "USDT"
+        account = self.account(signal.account)
+        if account is None:
+            result = {"error": f"Unknown account {signal.account}"}
+        else:
+            data = self.snapshot.data.get(symbol) or await self.token_cache.get_or_fetch(symbol, self._fetch_position_row)
+            if not data:
+                # No real price from any venue; never trade at a made-up one
+                result = {"error": f"Could not fetch data for {symbol}"}
+            else:
+                if self.recorder is not None:
+                    self.recorder.record('signal', {'symbol': symbol, 'side': signal.side, 'key': signal.key,
+                                                    'account': signal.account,
+                                                    'received_at': signal.received_at.isoformat()})
+                result = account.process_signal(symbol, signal.side, data)
+        if result.get("success"):
+            SIGNAL_LATENCY.labels(account.id).observe(time.monotonic() - signal.received_mono)
+            log.info("signal processed", account=account.id, symbol=symbol, side=signal.side, message=result['message'])
+        else:
+            log.warning("signal rejected", account=signal.account, symbol=symbol, side=signal.side,
+                        error=result.get('error'))
+        return result
+
+    def process_signal(self, symbol, side, data=None, account_id=None):
+        """Process a trading signal, at the given market data row or the best cached one"""
+        # Normalize symbol
+        if not symbol.endswith("USDT"):
+            symbol = symbol + "USDT"
+        symbol = symbol.upper()
+
+        account = self.account(account_id)
+        if account is None:
+            return {"error": f"Unknown account {account_id}"}
+
+        # Get cached data for the symbol
+        if data is None:
+            data = self.fetch_optimized_data(symbol)
+        if not data:
+            return {"error": f"Could not fetch data for {symbol}"}
+
+        return account.process_signal(symbol, side, data)
+
+    def get_positions(self, account_id=None):
+        """Get all current positions"""
+        return self.account(account_id).get_positions(self._current_price)
+
 
 # Global bot instance
 bot: HyperTradingBot = None
 
+def _broadcast_state():
+    snapshot = bot.snapshot
+    return snapshot.version, snapshot.data, bot.get_positions()
+
+# Single fan-out of snapshot diffs to every /stream subscriber
+broadcaster = SnapshotBroadcaster(_broadcast_state)
+
+async def _handle_queued_signal(signal):
+    await bot.handle_signal(signal)
+
+# Webhook intake, drained by workers off the request path
+signal_queue = SignalQueue(
+    _handle_queued_signal,
+    maxsize=int(os.environ.get("SIGNAL_QUEUE_SIZE", 10000)),
+    workers=int(os.environ.get("SIGNAL_WORKERS", 4)),
+)
+
+# Read at scrape time; NaN until the bot is initialized
+Gauge("bot_snapshot_age_seconds", "Seconds since latest_data was last swapped").set_function(
+    lambda: (clock.now() - bot.snapshot.taken_at).total_seconds())
+Gauge("bot_accounts", "Paper accounts hosted by the engine").set_function(lambda: len(bot.accounts))
+Gauge("bot_open_positions", "Open positions across all accounts").set_function(
+    lambda: sum(len(a.positions) for a in bot.accounts.values()))
+Gauge("bot_signal_queue_depth", "Signals waiting for a worker").set_function(lambda: signal_queue.depth)
+Gauge("bot_exchange_used_weight", "Request weight the exchange reports used this minute").set_function(
+    lambda: bot.fetcher.scheduler.used_weight)
+Gauge("bot_exchange_queued_requests", "Exchange requests waiting for rate-limit budget").set_function(
+    lambda: bot.fetcher.scheduler.queued)
+
+def _json_body(content):
+    # Same encoding as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=str).encode()
+
+def _shared_sections():
+    """Every read endpoint's response body, pre-rendered for the API workers"""
+    snapshot = bot.snapshot
+    last_updated = snapshot.taken_at.isoformat()
+    sections = {
+        "latest_data": {"data": snapshot.data, "last_updated": last_updated},
+        "accounts": {"primary": bot.primary.id, "accounts": [a.summary() for a in bot.accounts.values()]},
+    }
+    for account in bot.accounts.values():
+        prefix = f"accounts/{account.id}"
+        sections[f"{prefix}/positions"] = account.get_positions(bot._current_price)
+        sections[f"{prefix}/trades"] = account.get_trade_history(SHARED_TRADES_LIMIT)
+        sections[f"{prefix}/latest_data"] = {"data": bot.account_rows(account), "last_updated": last_updated}
+    risk = bot.risk.snapshot()
+    sections["risk"] = risk
+    for account_id, account_risk in risk["accounts"].items():
+        sections[f"accounts/{account_id}/risk"] = {**account_risk, "limits": risk["limits"], "var_model": risk["var_model"]}
+    if bot.scanner and bot.scanner.result:
+        sections["scanner"] = bot.scanner.result
+    sections["positions"] = sections[f"accounts/{bot.primary.id}/positions"]
+    sections["trades"] = sections[f"accounts/{bot.primary.id}/trades"]
+    return snapshot.version, {name: _json_body(body) for name, body in sections.items()}
+
+def load_account_specs(source):
+    """BOT_ACCOUNTS value (inline JSON or a path to a JSON file) -> list of account specs"""
+    if not source:
+        return []
+    if not source.lstrip().startswith("["):
+        with open(source) as f:
+            source = f.read()
+    specs = json.loads(source)
+    for spec in specs:
+        spec.setdefault('balance', 10000)
+        spec.setdefault('strategy', 'scalping')
+    return specs
+
 # Function to run the bot continuously to update data
-def run_continuous_bot():
+async def run_continuous_bot():
     global bot
     # Initialize the bot with default parameters
     bot = HyperTradingBot(
-        symbols="BTC,ETH,SOL,XRP", 
+        symbols=BOT_SYMBOLS,
         initial_balance=10000, 
         strategy="scalping"
     )
-    print("Demo Trading Bot initialized - starting continuous data updates...")
+    for spec in load_account_specs(BOT_ACCOUNTS):
+        bot.add_account(TradingAccount.from_spec(spec))
+    bot.listeners.append(broadcaster.notify)
+    snapshot_task = flush_task = publish_task = scanner_task = failover_task = None
+    publisher = None
+    if API_WORKERS > 1:
+        # Engine process behind separate API workers: share every read with them
+        publisher = SharedStatePublisher()
+        bot.listeners.append(publisher.notify)
+        publish_task = asyncio.create_task(publisher.run(_shared_sections))
+    if BOT_JOURNAL_PATH:
+        bot.attach_journal(TradeJournal(BOT_JOURNAL_PATH))
+        snapshot_task = asyncio.create_task(snapshot_journal_periodically())
+    if CANDLE_STORE_DIR:
+        bot.candle_store = CandleStore(CANDLE_STORE_DIR)
+        bot.candle_queries = CandleQueryCache(bot.candle_store)
+        flush_task = asyncio.create_task(flush_candles_periodically())
+    if BOT_RECORD_PATH:
+        bot.attach_recorder(FeedRecorder(BOT_RECORD_PATH), bot.fetcher.interval, bot.fetcher.limit)
+    if SCANNER_STRATEGY:
+        bot.scanner = MarketScanner(bot.fetcher, STRATEGY_CONFIG[SCANNER_STRATEGY], SCANNER_STRATEGY)
+        if publisher:
+            bot.scanner.listeners.append(publisher.notify)
+        scanner_task = asyncio.create_task(bot.scanner.run())
     
+    try:
+        if BOT_DATA_MODE == "stream":
+            log.info("bot started", mode="stream", symbols=len(bot.symbols), accounts=len(bot.accounts))
+            bot.feed = BinanceStreamFeed(bot.symbols, bot.fetcher, on_update=bot.on_market_update,
+                                         on_klines=bot.record_klines, recorder=bot.recorder)
+            failover_task = asyncio.create_task(poll_while_stream_down())
+            await bot.feed.run()
+        else:
+            log.info("bot started", mode="poll", symbols=len(bot.symbols), accounts=len(bot.accounts))
+            await poll_market_data()
+    finally:
+        await bot.fetcher.close()
+        for task in (snapshot_task, flush_task, publish_task, scanner_task, failover_task):
+            if task:
+                task.cancel()
+        if publisher:
+            publisher.close()
+        bot.close_recorder()
+        if bot.journal:
+            bot.snapshot_journal()
+            bot.journal.close()
+        if bot.candle_store:
+            bot.candle_store.flush()
+
+async def snapshot_journal_periodically():
+    """Fold the journal into a compact snapshot so restarts replay a short tail"""
+    while True:
+        await asyncio.sleep(JOURNAL_SNAPSHOT_INTERVAL)
+        if bot.journal.events_since_snapshot:
+            bot.snapshot_journal()
+
+async def flush_candles_periodically():
+    """Persist candle store row counts; the column data itself lives in the page cache"""
+    while True:
+        await asyncio.sleep(5)
+        bot.candle_store.flush()
+
+async def poll_while_stream_down():
+    """
+    Stream mode: while the WebSocket has been down for STREAM_FAILOVER_AFTER
+    seconds, refresh prices over REST, where the router fails over to
+    whichever venue is answering
+    """
+    down_since = None
+    polling = False
+    while True:
+        await asyncio.sleep(1)
+        if bot.feed.connected.is_set():
+            if polling:
+                log.info("market stream back, stopping REST failover")
+            down_since, polling = None, False
+            continue
+        now = time.monotonic()
+        if down_since is None:
+            down_since = now
+        if now - down_since < STREAM_FAILOVER_AFTER:
+            continue
+        if not polling:
+            log.warning("market stream down, polling exchanges over REST", down_seconds=round(now - down_since))
+            polling = True
+        try:
+            await bot.get_current_data()
+        except Exception as e:
+            record_error("failover_poll", e)
+            log.error("failover poll failed", error=repr(e))
+        await asyncio.sleep(1)
+
+async def poll_market_data():
+    """REST polling fallback, used when BOT_DATA_MODE=poll"""
     # Continuously update the data
     while True:
+        started = time.monotonic()
         try:
-            if bot:
-                # Update latest data
-                current_data = bot.get_current_data()
-                print(f"Updated data at {datetime.now().strftime('%H:%M:%S')} - Data: {current_data}")
+            # Update latest data
+            current_data = await bot.get_current_data()
+            elapsed = time.monotonic() - started
+            UPDATE_CYCLE.observe(elapsed)
+            # Rows are on /latest_data and /metrics; logging them every cycle would dwarf everything else
+            log.debug("market data updated", symbols=len(current_data), seconds=round(elapsed, 3))
             
             # Update every 2 seconds to match the demo bot frequency
-            time.sleep(2)
+            await asyncio.sleep(max(0.0, 2 - (time.monotonic() - started)))
         except Exception as e:
-            print(f"Error in continuous bot: {e}")
-            time.sleep(5)  # Wait before retrying
+            record_error("poll", e)
+            log.exception("poll cycle failed", error=repr(e))
+            await asyncio.sleep(5)  # Wait before retrying
 
 # Self-ping mechanism to keep the service alive on Render
 def self_ping():
@@ -375,43 +1231,53 @@ def self_ping():
     else:
         base_url = f'http://localhost:{port}'
     
-    print(f"Self-ping mechanism initialized, pinging {base_url}/health")
+    log.info("self-ping initialized", url=f"{base_url}/health")
     
     while True:
         try:
             # Ping the health endpoint to keep the service awake
             health_url = f"{base_url}/health" if not base_url.endswith('/health') else base_url
             response = requests.get(health_url, timeout=10)
-            print(f"Self-ping response: {response.status_code} at {datetime.now().strftime('%H:%M:%S')}")
+            log.info("self-ping", url=health_url, status=response.status_code)
             
             # Also try to ping the latest_data endpoint to keep it active
             data_url = f"{base_url}/latest_data"
             response2 = requests.get(data_url, timeout=10)
-            print(f"Self-ping data response: {response2.status_code} at {datetime.now().strftime('%H:%M:%S')}")
+            log.info("self-ping", url=data_url, status=response2.status_code)
             
         except Exception as e:
-            print(f"Self-ping failed: {e}")
+            log.warning("self-ping failed", error=repr(e))
             
             # Try alternative approach - if we couldn't ping with constructed URL, try the internal server
             try:
                 internal_response = requests.get(f'http://127.0.0.1:{port}/health', timeout=10)
-                print(f"Internal self-ping response: {internal_response.status_code} at {datetime.now().strftime('%H:%M:%S')}")
+                log.info("internal self-ping", status=internal_response.status_code)
             except Exception as internal_e:
-                print(f"Internal self-ping also failed: {internal_e}")
+                log.warning("internal self-ping failed", error=repr(internal_e))
         
         # Wait 10 minutes before next ping (to prevent Render from sleeping)
         time.sleep(600)  # 10 minutes
 
-# Start the self-ping mechanism in a background thread
-self_ping_thread = threading.Thread(target=self_ping, daemon=True)
-self_ping_thread.start()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the self-ping mechanism in a background thread
+    self_ping_thread = threading.Thread(target=self_ping, daemon=True)
+    self_ping_thread.start()
 
-# Start the continuous bot in a background thread
-continuous_bot_thread = threading.Thread(target=run_continuous_bot, daemon=True)
-continuous_bot_thread.start()
+    # Start the continuous bot on the server's event loop
+    continuous_bot_task = asyncio.create_task(run_continuous_bot())
+    broadcaster_task = asyncio.create_task(broadcaster.run())
+    signal_queue_task = asyncio.create_task(signal_queue.run())
+    yield
+    for task in (signal_queue_task, broadcaster_task, continuous_bot_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 # FastAPI app
-app = FastAPI(title="Demo Trading Bot API", version="1.0.0")
+app = FastAPI(title="Demo Trading Bot API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -422,6 +1288,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so /accounts/{account_id}/... stays one series
+        route = request.scope.get("route")
+        HTTP_LATENCY.labels(request.method, route.path if route else "unmatched", status).observe(
+            time.perf_counter() - started)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus exposition of fetch, update, lock, signal and API latencies plus error counters"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.post("/webhook")
 async def webhook(request: Request):
     try:
@@ -431,7 +1316,7 @@ async def webhook(request: Request):
         secret = payload.get("secret")
         expected_secret = os.getenv("TRADINGVIEW_WEBHOOK_SECRET", "tv_webhook_9xA2kQp!")
         if secret != expected_secret:
-            print(f"Invalid webhook secret received: {secret}")
+            log.warning("invalid webhook secret")
             raise HTTPException(status_code=403, detail="Invalid secret")
         
         # Extract signal data
@@ -439,21 +1324,36 @@ async def webhook(request: Request):
         side = payload.get("side", "").upper()
         
         if not symbol or side not in ["BUY", "SELL"]:
-            print(f"Invalid payload: {payload}")
+            log.warning("invalid webhook payload", symbol=symbol, side=side)
             raise HTTPException(status_code=400, detail="Invalid payload")
         
-        print(f"✓ RECEIVED SIGNAL: {side} {symbol}")
+        if not bot:
+            raise HTTPException(status_code=503, detail="Bot not initialized")
         
-        # Process the signal
-        result = bot.process_signal(symbol, side)
+        # Optional target account; the primary account otherwise
+        account_id = payload.get("account")
+        if account_id is not None and account_id not in bot.accounts:
+            raise HTTPException(status_code=404, detail=f"Unknown account {account_id}")
         
-        if result.get("success"):
-            return {"status": "ok", "message": f"Signal processed for {symbol}", "result": result}
-        else:
-            return {"status": "error", "message": result.get("error")}
+        # Queue the signal; workers apply it at the latest cached price
+        key = idempotency_key(payload, request.headers.get("Idempotency-Key"))
+        status = signal_queue.submit(QueuedSignal(symbol=symbol, side=side, key=key, account=account_id))
+        if status != "duplicate":
+            log.info("signal received", side=side, symbol=symbol, account=account_id or bot.primary.id, status=status)
+        
+        return JSONResponse(
+            status_code=202,
+            content={"status": status, "key": key, "message": f"Signal queued for {symbol}"},
+        )
     
+    except QueueFullError as e:
+        log.warning("webhook rejected", error=str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Webhook error: {e}")
+        record_error("api", e)
+        log.exception("webhook failed", error=repr(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/positions")
@@ -466,7 +1366,145 @@ async def get_positions():
         else:
             return {"error": "Bot not initialized"}
     except Exception as e:
-        print(f"Error getting positions: {e}")
+        record_error("api", e)
+        log.exception("getting positions failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/trades")
+async def get_trades(limit: int = 100):
+    """Get closed trades (TP, SL, liquidation or replaced), most recent first"""
+    try:
+        if bot:
+            return bot.get_trade_history(limit)
+        else:
+            return {"error": "Bot not initialized"}
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting trades failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _get_account(account_id):
+    account = bot.account(account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail=f"Unknown account {account_id}")
+    return account
+
+@app.get("/accounts")
+async def list_accounts():
+    """Every hosted paper account with its strategy, symbols and balance"""
+    try:
+        if bot:
+            return {"primary": bot.primary.id, "accounts": [a.summary() for a in bot.accounts.values()]}
+        else:
+            return {"error": "Bot not initialized"}
+    except Exception as e:
+        record_error("api", e)
+        log.exception("listing accounts failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/accounts")
+async def create_account(request: Request):
+    """Add a paper account driven by the shared feed: {"id", "symbols", "strategy", "balance", "config"?}"""
+    try:
+        payload = await request.json()
+        if payload.get("secret") != os.getenv("TRADINGVIEW_WEBHOOK_SECRET", "tv_webhook_9xA2kQp!"):
+            raise HTTPException(status_code=403, detail="Invalid secret")
+        if not bot:
+            raise HTTPException(status_code=503, detail="Bot not initialized")
+        account_id = str(payload.get("id", "")).strip()
+        if not account_id or not payload.get("symbols"):
+            raise HTTPException(status_code=400, detail="id and symbols are required")
+        if account_id in bot.accounts:
+            raise HTTPException(status_code=409, detail=f"Account {account_id} already exists")
+        try:
+            account = TradingAccount(account_id, payload["symbols"], payload.get("balance", 10000),
+                                     payload.get("strategy", "scalping"), payload.get("config"))
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        bot.add_account(account)
+        log.info("account added", account=account_id, strategy=account.strategy, symbols=len(account.symbols))
+        return JSONResponse(status_code=201, content=account.summary())
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("creating account failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/{account_id}/positions")
+async def get_account_positions(account_id: str):
+    """Open positions and balance of one account"""
+    try:
+        if bot:
+            return _get_account(account_id).get_positions(bot._current_price)
+        else:
+            return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting positions failed", account=account_id, error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/{account_id}/trades")
+async def get_account_trades(account_id: str, limit: int = 100):
+    """Closed trades of one account, most recent first"""
+    try:
+        if bot:
+            return _get_account(account_id).get_trade_history(limit)
+        else:
+            return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting trades failed", account=account_id, error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/{account_id}/latest_data")
+async def get_account_latest_data(account_id: str):
+    """Latest market rows for one account's symbols, with its own strategy's signals and levels"""
+    try:
+        if bot:
+            account = _get_account(account_id)
+            return {"data": bot.account_rows(account), "last_updated": bot.snapshot.taken_at.isoformat()}
+        else:
+            return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting latest data failed", account=account_id, error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/accounts/{account_id}/risk")
+async def get_account_risk(account_id: str):
+    """Exposure, margin usage, per-symbol netting, VaR and liquidation distances for one account"""
+    try:
+        if bot:
+            account = _get_account(account_id)
+            risk = bot.risk.snapshot()
+            return {**risk["accounts"][account.id], "limits": risk["limits"], "var_model": risk["var_model"]}
+        else:
+            return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting risk failed", account=account_id, error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/risk")
+async def get_risk():
+    """Portfolio risk across every account"""
+    try:
+        if bot:
+            return bot.risk.snapshot()
+        else:
+            return {"error": "Bot not initialized"}
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting risk failed", error=repr(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/latest_data")
@@ -474,11 +1512,13 @@ async def get_latest_data():
     """Get the latest market data for all symbols"""
     try:
         if bot:
-            return {"data": bot.latest_data, "last_updated": bot.last_update_time.isoformat()}
+            snapshot = bot.snapshot
+            return {"data": snapshot.data, "last_updated": snapshot.taken_at.isoformat()}
         else:
             return {"error": "Bot not initialized"}
     except Exception as e:
-        print(f"Error getting latest data: {e}")
+        record_error("api", e)
+        log.exception("getting latest data failed", error=repr(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/token_data")
@@ -491,14 +1531,82 @@ async def get_token_data(token: str):
             if not formatted_token.endswith('USDT'):
                 formatted_token = f"{formatted_token}USDT"
             
-            token_data = bot.get_single_token_data(formatted_token)
-            return {"data": token_data, "last_updated": datetime.now().isoformat()}
+            token_data = await bot.get_single_token_data(formatted_token)
+            return {"data": token_data, "last_updated": clock.now().isoformat()}
+        else:
+            return {"error": "Bot not initialized"}
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting token data failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/scanner")
+async def get_scanner(limit: Optional[int] = None):
+    """Top BUY and SELL candidates from the latest whole-market scan"""
+    try:
+        if bot:
+            if bot.scanner is None:
+                raise HTTPException(status_code=404, detail="Scanner mode is off (set SCANNER_STRATEGY)")
+            result = bot.scanner.result
+            if result is None:
+                raise HTTPException(status_code=503, detail="First scan still running", headers={"Retry-After": "5"})
+            if limit is not None:
+                result = {**result, "buy": result["buy"][:limit], "sell": result["sell"][:limit]}
+            return result
+        else:
+            return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_error("api", e)
+        log.exception("getting scanner results failed", error=repr(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/candles")
+async def get_candles(token: str, interval: str = "1m", start: Optional[int] = None,
+                      end: Optional[int] = None, points: int = 1000, format: str = "json"):
+    """
+    OHLCV history from the local candle store, aggregated to `interval` and
+    downsampled to at most `points` bars. start/end are epoch milliseconds;
+    format=bin returns packed little-endian columns (see chart_data.encode_binary)
+    """
+    try:
+        if bot:
+            if bot.candle_queries is None:
+                raise HTTPException(status_code=503, detail="Candle store disabled")
+            if interval not in INTERVAL_MS:
+                raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVAL_MS)}")
+            if format not in ("json", "bin"):
+                raise HTTPException(status_code=400, detail="format must be json or bin")
+            formatted_token = token.upper()
+            if not formatted_token.endswith('USDT'):
+                formatted_token = f"{formatted_token}USDT"
+            points = max(3, min(points, MAX_CANDLE_POINTS))
+
+            body, count = bot.candle_queries.query(formatted_token, interval, start, end, points, format)
+            media_type = "application/octet-stream" if format == "bin" else "application/json"
+            return Response(content=body, media_type=media_type, headers={"X-Candle-Count": str(count)})
         else:
             return {"error": "Bot not initialized"}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error getting token data: {e}")
+        record_error("api", e)
+        log.exception("getting candles failed", error=repr(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stream")
+async def stream():
+    """Push market and position diffs to the dashboard as Server-Sent Events"""
+    if not bot:
+        return {"error": "Bot not initialized"}
+    sub = broadcaster.subscribe()
+    return StreamingResponse(
+        broadcaster.events(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/")
 async def health():
     return {"status": "healthy", "message": "Demo Trading Bot API Running"}
@@ -507,6 +1615,9 @@ def run_bot_api():
     """Run the bot API server"""
     import os
     port = int(os.environ.get("PORT", 8000))
+    if API_WORKERS > 1:
+        serve_with_workers(port)
+        return
     uvicorn.run(
         app, 
         host="0.0.0.0", 
@@ -517,10 +1628,42 @@ def run_bot_api():
         log_level="info"
     )
 
+def run_engine():
+    """Engine process: the full app on a Unix socket, publishing its state for the API workers"""
+    if os.path.exists(ENGINE_SOCKET):
+        os.remove(ENGINE_SOCKET)
+    uvicorn.run(app, uds=ENGINE_SOCKET, timeout_graceful_shutdown=10, log_level="info")
+
+def serve_with_workers(port):
+    """
+    One engine process (market data, accounts, journal) plus API_WORKERS
+    stateless uvicorn workers (api_worker:app) that serve reads from shared
+    memory and forward writes to the engine
+    """
+    engine = multiprocessing.Process(target=run_engine, name="trading-engine")
+    engine.start()
+    log.info("engine started", pid=engine.pid, socket=ENGINE_SOCKET, workers=API_WORKERS, port=port)
+    try:
+        uvicorn.run(
+            "api_worker:app",
+            host="0.0.0.0",
+            port=port,
+            workers=API_WORKERS,
+            timeout_graceful_shutdown=10,
+            timeout_keep_alive=30,
+            log_level="info",
+        )
+    finally:
+        engine.terminate()
+        engine.join(timeout=15)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Demo Trading Bot API Running", "timestamp": datetime.now().isoformat()}
+    response = {"status": "healthy", "message": "Demo Trading Bot API Running", "timestamp": datetime.now().isoformat()}
+    if bot:
+        response["exchanges"] = bot.fetcher.router.status()
+    return response
 
 if __name__ == "__main__":
     # Run the API server
@@ -528,14 +1671,17 @@ if __name__ == "__main__":
     import os
     
     port = int(os.environ.get("PORT", 8000))
-    print(f"Starting Demo Trading Bot API on port {port}")
-    uvicorn.run(
-        "trading_bot_api:app", 
-        host="0.0.0.0", 
-        port=port,
-        workers=1,
-        timeout_graceful_shutdown=10,
-        timeout_keep_alive=30,
-        log_level="info",
-        reload=False  # Disable reload for production
-    )
+    log.info("starting api", port=port, workers=API_WORKERS)
+    if API_WORKERS > 1:
+        serve_with_workers(port)
+    else:
+        uvicorn.run(
+            "bot:app",
+            host="0.0.0.0", 
+            port=port,
+            workers=1,
+            timeout_graceful_shutdown=10,
+            timeout_keep_alive=30,
+            log_level="info",
+            reload=False  # Disable reload for production
+        )
@@ -0,0 +1,141 @@
+"""
+Snapshot Broadcaster
+Fans snapshot diffs (changed symbols and positions only) out to every
+dashboard subscriber from a single producer. Each message is computed and
+serialized once; slow clients get their backlog dropped and are resynced
+with a full snapshot instead of growing an unbounded queue
+"""
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Optional, Set
+
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("broadcast")
+
+
+class Subscriber:
+    def __init__(self, max_queue):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Set when messages were dropped; the next message sent is a full snapshot
+        self.needs_resync = True
+
+    def offer(self, message: str):
+        if self.needs_resync:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog, a snapshot replaces it
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.needs_resync = True
+            self.queue.put_nowait(None)  # wake the sender
+
+
+class SnapshotBroadcaster:
+    """
+    `get_state()` returns (version, market rows, positions payload). The
+    broadcaster wakes on `notify()`, at most every `min_interval` seconds,
+    diffs the new state against the last one it sent and publishes the diff.
+    """
+    def __init__(self, get_state: Callable[[], tuple], min_interval=0.25, max_queue=32, heartbeat=15.0):
+        self.get_state = get_state
+        self.min_interval = min_interval
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self.subscribers: Set[Subscriber] = set()
+        self._changed = asyncio.Event()
+        self._market: Dict[str, dict] = {}
+        self._positions: Dict[str, dict] = {}
+        self._account: dict = {}
+        self._version = 0
+
+    def notify(self):
+        self._changed.set()
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber(self.max_queue)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+
+    def snapshot_message(self):
+        version, market, positions = self.get_state()
+        return json.dumps({
+            "type": "snapshot",
+            "version": version,
+            "data": market,
+            "positions": positions["positions"],
+            "account": self._account_fields(positions),
+        })
+
+    @staticmethod
+    def _account_fields(positions):
+        return {k: v for k, v in positions.items() if k != "positions"}
+
+    def _diff_message(self) -> Optional[str]:
+        version, market, positions = self.get_state()
+        # Published rows are never mutated, so identity tells us what changed
+        changed = {s: row for s, row in market.items() if self._market.get(s) is not row}
+        removed = [s for s in self._market if s not in market]
+
+        pos_rows = {p["token"]: p for p in positions["positions"]}
+        changed_pos = {t: p for t, p in pos_rows.items() if self._positions.get(t) != p}
+        closed_pos = [t for t in self._positions if t not in pos_rows]
+        account = self._account_fields(positions)
+
+        self._market, self._positions, self._version = dict(market), pos_rows, version
+        account_changed = account != self._account
+        self._account = account
+        if not (changed or removed or changed_pos or closed_pos or account_changed):
+            return None
+        return json.dumps({
+            "type": "diff",
+            "version": version,
+            "data": changed,
+            "removed": removed,
+            "positions": list(changed_pos.values()),
+            "closed_positions": closed_pos,
+            "account": account,
+        })
+
+    async def run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            started = time.monotonic()
+            try:
+                message = self._diff_message()
+            except Exception as e:
+                record_error("broadcast", e)
+                log.error("broadcast diff failed", error=repr(e))
+                message = None
+            if message is not None:
+                for sub in list(self.subscribers):
+                    sub.offer(message)
+            await asyncio.sleep(max(0.0, self.min_interval - (time.monotonic() - started)))
+
+    async def events(self, sub: Subscriber):
+        """Server-Sent Events stream for one subscriber"""
+        try:
+            while True:
+                if sub.needs_resync:
+                    sub.needs_resync = False
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    yield f"event: snapshot\ndata: {self.snapshot_message()}\n\n"
+                    continue
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is not None:
+                    yield f"event: diff\ndata: {message}\n\n"
+        finally:
+            self.unsubscribe(sub)
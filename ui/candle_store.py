@@ -0,0 +1,149 @@
+"""
+Local Candle Store
+Persists every received kline per symbol and interval as append-friendly
+columnar files (one memory-mapped array per column), indexed by open time,
+so history reads are zero-copy NumPy views instead of exchange downloads
+"""
+import json
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+COLUMNS = (
+    ("open_time", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+INITIAL_CAPACITY = 4096
+
+
+class CandleSeries:
+    """
+    One symbol/interval: a directory holding <column>.bin memmaps and a
+    meta.json with the row count. Rows are kept sorted by open_time; the
+    common cases (revise the open candle, append the next one) are O(1).
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.count = 0
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.count = json.load(f)["count"]
+        capacity = max(INITIAL_CAPACITY, self.count)
+        existing = os.path.join(path, "open_time.bin")
+        if os.path.exists(existing):
+            capacity = max(capacity, os.path.getsize(existing) // 8)
+        self._map(capacity)
+        self._dirty = False
+
+    def _map(self, capacity):
+        self.capacity = capacity
+        self.cols: Dict[str, np.memmap] = {}
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(self.path, f"{name}.bin")
+            size = capacity * np.dtype(dtype).itemsize
+            with open(file_path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            self.cols[name] = np.memmap(file_path, dtype=dtype, mode="r+", shape=(capacity,))
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for col in self.cols.values():
+            col.flush()
+        # Views handed out earlier keep their own (still valid) mapping
+        self._map(capacity)
+
+    @property
+    def open_time(self):
+        return self.cols["open_time"][:self.count]
+
+    def upsert(self, open_time, o, h, l, c, v):
+        open_time = int(open_time)
+        n = self.count
+        times = self.cols["open_time"]
+        if n and open_time == times[n - 1]:
+            idx = n - 1
+        elif n == 0 or open_time > times[n - 1]:
+            if n >= self.capacity:
+                self._grow(n + 1)
+                times = self.cols["open_time"]
+            idx = n
+            self.count += 1
+        else:
+            idx = int(np.searchsorted(times[:n], open_time))
+            if times[idx] != open_time:
+                # Late candle filling a gap: shift the tail one row right
+                if n >= self.capacity:
+                    self._grow(n + 1)
+                for col in self.cols.values():
+                    col[idx + 1:n + 1] = col[idx:n].copy()
+                self.count += 1
+        row = (open_time, o, h, l, c, v)
+        for (name, _), value in zip(COLUMNS, row):
+            self.cols[name][idx] = value
+        self._dirty = True
+
+    def range(self, start=None, end=None) -> Dict[str, np.ndarray]:
+        """Columns for start <= open_time < end as zero-copy views"""
+        times = self.open_time
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = self.count if end is None else int(np.searchsorted(times, end, side="left"))
+        return {name: self.cols[name][lo:hi] for name, _ in COLUMNS}
+
+    def flush(self):
+        if not self._dirty:
+            return
+        for col in self.cols.values():
+            col.flush()
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"count": self.count}, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._dirty = False
+
+
+class CandleStore:
+    """<root>/<SYMBOL>/<interval>/ series, opened lazily"""
+    def __init__(self, root):
+        self.root = root
+        self.series: Dict[Tuple[str, str], CandleSeries] = {}
+
+    def get(self, symbol, interval="1m", create=True) -> Optional[CandleSeries]:
+        key = (symbol.upper(), interval)
+        series = self.series.get(key)
+        if series is None:
+            path = os.path.join(self.root, key[0], interval)
+            if not create and not os.path.isdir(path):
+                return None
+            series = self.series[key] = CandleSeries(path)
+        return series
+
+    def symbols(self, interval="1m"):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(s for s in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, s, interval)))
+
+    def add_klines(self, symbol, interval, klines: Iterable):
+        """Binance REST-style kline rows: [open_time, open, high, low, close, volume, ...]"""
+        series = self.get(symbol, interval)
+        for k in klines:
+            series.upsert(k[0], float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
+
+    def range(self, symbol, interval="1m", start=None, end=None):
+        series = self.get(symbol, interval, create=False)
+        if series is None:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+        return series.range(start, end)
+
+    def flush(self):
+        for series in self.series.values():
+            series.flush()
@@ -0,0 +1,167 @@
+"""
+Chart Data
+Serves OHLCV history for charts from the local candle store: 1m bars are
+aggregated on the fly to wider intervals, downsampled with LTTB to a point
+budget, and both the aggregated blocks and the encoded responses are cached
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+import clock
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+# Store reads are widened to multiples of this many bars so nearby ranges share them
+RANGE_BUCKET_BARS = 256
+
+
+def aggregate(cols: Dict[str, np.ndarray], bucket_ms: int) -> Dict[str, np.ndarray]:
+    """Roll 1m columns up into `bucket_ms` bars (aligned to the epoch, like Binance)"""
+    times = cols["open_time"]
+    if len(times) == 0 or bucket_ms <= INTERVAL_MS["1m"]:
+        return {k: np.asarray(v) for k, v in cols.items()}
+    ids = times // bucket_ms
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+    ends = np.concatenate([starts[1:], [len(times)]]) - 1
+    return {
+        "open_time": ids[starts] * bucket_ms,
+        "open": np.asarray(cols["open"])[starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": np.asarray(cols["close"])[ends],
+        "volume": np.add.reduceat(cols["volume"], starts),
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the line's shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(cols: Dict[str, np.ndarray], points: int) -> Dict[str, np.ndarray]:
+    """
+    Keep the LTTB-selected bars of the close series; each kept bar absorbs
+    the bars skipped since the previous one, so highs, lows and volume survive
+    """
+    n = len(cols["close"])
+    if n <= points:
+        return cols
+    idx = lttb_indices(cols["open_time"], cols["close"], points)
+    starts = np.concatenate([[0], idx[:-1] + 1])
+    return {
+        "open_time": cols["open_time"][idx],
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][idx],
+        "volume": np.add.reduceat(cols["volume"], starts),
+    }
+
+
+def encode_json(symbol, interval, cols) -> bytes:
+    """Columnar JSON: one array per field instead of one object per bar"""
+    return json.dumps({
+        "symbol": symbol,
+        "interval": interval,
+        "t": cols["open_time"].tolist(),
+        "o": cols["open"].tolist(),
+        "h": cols["high"].tolist(),
+        "l": cols["low"].tolist(),
+        "c": cols["close"].tolist(),
+        "v": cols["volume"].tolist(),
+    }, separators=(",", ":")).encode()
+
+
+def encode_binary(cols) -> bytes:
+    """Little-endian int64 open times followed by float64 o/h/l/c/v columns"""
+    parts = [cols["open_time"].astype("<i8").tobytes()]
+    parts += [cols[k].astype("<f8").tobytes() for k in ("open", "high", "low", "close", "volume")]
+    return b"".join(parts)
+
+
+class CandleQueryCache:
+    """
+    Two LRUs. Store reads are widened to whole RANGE_BUCKET_BARS blocks and
+    the aggregated columns cached per block range, so overlapping and
+    sliding windows share one read. Each request then cuts its exact
+    [start, end) out of those columns, downsamples and encodes it; encoded
+    bodies are cached by the cut's bar indices, which only move when a new
+    bar opens. Entries that reach the still-forming bar are only reused for
+    `live_ttl` seconds; fully historical ones until evicted.
+    """
+    def __init__(self, store, max_entries=512, live_ttl=2.0):
+        self.store = store
+        self.max_entries = max_entries
+        self.live_ttl = live_ttl
+        self._blocks: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _get(self, lru, key, live):
+        entry = lru.get(key)
+        if entry is not None and (not live or time.monotonic() - entry[0] < self.live_ttl):
+            lru.move_to_end(key)
+            return entry[1]
+        return None
+
+    def _put(self, lru, key, value):
+        lru[key] = (time.monotonic(), value)
+        lru.move_to_end(key)
+        while len(lru) > self.max_entries:
+            lru.popitem(last=False)
+
+    def query(self, symbol, interval="1m", start: Optional[int] = None, end: Optional[int] = None,
+              points=1000, fmt="json"):
+        """Returns (body, bar_count) for the bars opening in [start, end), downsampled to at most `points`"""
+        interval_ms = INTERVAL_MS[interval]
+        bucket = interval_ms * RANGE_BUCKET_BARS
+        now = int(clock.timestamp() * 1000)
+        end = now if end is None else end
+        start = end - interval_ms * points if start is None else start
+        start_b, end_b = start // bucket, -(-end // bucket)
+        live = end_b * bucket > now - interval_ms
+        block_key = (symbol, interval, start_b, end_b)
+
+        cols = self._get(self._blocks, block_key, live)
+        if cols is None:
+            cols = aggregate(self.store.range(symbol, "1m", start_b * bucket, end_b * bucket), interval_ms)
+            self._put(self._blocks, block_key, cols)
+
+        times = cols["open_time"]
+        lo, hi = int(np.searchsorted(times, start, "left")), int(np.searchsorted(times, end, "left"))
+        key = (block_key, lo, hi, points, fmt)
+        cached = self._get(self._entries, key, live)
+        if cached is not None:
+            return cached
+
+        cut = downsample({k: v[lo:hi] for k, v in cols.items()}, points)
+        body = encode_binary(cut) if fmt == "bin" else encode_json(symbol, interval, cut)
+        result = (body, len(cut["close"]))
+        self._put(self._entries, key, result)
+        return result
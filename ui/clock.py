@@ -0,0 +1,55 @@
+"""
+Engine Clock
+The trading engine reads wall-clock time through this module, so the same
+code can run on a virtual clock: replay.py installs one and moves it forward
+to each recorded event's timestamp
+"""
+import time as _time
+from datetime import datetime
+
+
+class SystemClock:
+    now = staticmethod(datetime.now)
+    time = staticmethod(_time.time)
+    monotonic = staticmethod(_time.monotonic)
+
+
+class VirtualClock:
+    """Time that only moves when advance_to() is called; never goes backwards"""
+    def __init__(self, start: float):
+        self.t = float(start)
+
+    def advance_to(self, t: float):
+        if t > self.t:
+            self.t = t
+
+    def now(self):
+        return datetime.fromtimestamp(self.t)
+
+    def time(self):
+        return self.t
+
+    def monotonic(self):
+        return self.t
+
+
+_current = SystemClock()
+
+
+def now() -> datetime:
+    return _current.now()
+
+
+def timestamp() -> float:
+    return _current.time()
+
+
+def monotonic() -> float:
+    return _current.monotonic()
+
+
+def install(clock):
+    """Make `clock` the engine's clock; returns the previous one so it can be restored"""
+    global _current
+    previous, _current = _current, clock
+    return previous
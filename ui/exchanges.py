@@ -0,0 +1,547 @@
+"""
+Exchange Adapters
+One adapter per venue (Binance, Bybit, OKX) normalizes tickers and klines to
+the Binance shapes the bot already consumes. ExchangeRouter queries them
+concurrently: requests are hedged to the next venue when the preferred one
+is slow, the first good answer (or the median across venues) wins, and
+per-venue health decides who is asked first. When every venue fails the
+router raises; it never makes up a price
+"""
+import abc
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from logs import get_logger
+from metrics import EXCHANGE_LATENCY, Counter, Gauge, record_error
+from rate_limit import PRIORITY_WATCHLIST, RequestScheduler, request_weight
+
+log = get_logger("exchanges")
+
+# Venues to read market data from, most preferred first. Later venues are only
+# asked when an earlier one is slow or failing (or always, in median mode);
+# EXCHANGES=binance turns failover off
+EXCHANGES = os.environ.get("EXCHANGES", "binance,bybit,okx")
+BINANCE_REST_URL = os.environ.get("BINANCE_REST_URL", "https://api.binance.com")
+BYBIT_REST_URL = os.environ.get("BYBIT_REST_URL", "https://api.bybit.com")
+OKX_REST_URL = os.environ.get("OKX_REST_URL", "https://www.okx.com")
+# Exchange per-minute request weight limit (Binance spot: 6000) and the share of it the bot may spend
+EXCHANGE_WEIGHT_LIMIT = int(os.environ.get("EXCHANGE_WEIGHT_LIMIT", 6000))
+EXCHANGE_WEIGHT_SAFETY = float(os.environ.get("EXCHANGE_WEIGHT_SAFETY", 0.8))
+# "first": the first good response wins; "median": median price of the venues that answer in time
+PRICE_AGGREGATION = os.environ.get("PRICE_AGGREGATION", "first").lower()
+# Longest wait for a venue before the same request is also sent to the next one
+HEDGE_DELAY = float(os.environ.get("HEDGE_DELAY", 0.25))
+# Median mode drops venues whose price is further than this from the median
+MAX_PRICE_DEVIATION = float(os.environ.get("MAX_PRICE_DEVIATION", 0.02))
+
+# Add headers to avoid being blocked
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+INTERVAL_MS = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "1h": 3_600_000}
+
+HEDGED = Counter("bot_exchange_hedged", "Requests also sent to another venue because this one was slow", ["exchange"])
+OUTLIERS = Counter("bot_exchange_outliers", "Quotes dropped for deviating from the cross-venue median", ["exchange"])
+EXCHANGE_UP = Gauge("bot_exchange_up", "1 while a venue is eligible for requests, 0 while it is cooling off",
+                    ["exchange"])
+
+
+class NoSourceError(Exception):
+    """Every configured venue failed the request"""
+
+
+class RejectedRequest(ValueError):
+    """The venue answered but refused the request (an unknown symbol, say); not held against its health"""
+
+
+def _is_rejection(error):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return 400 <= error.status < 500 and error.status not in (418, 429)
+    return isinstance(error, RejectedRequest)
+
+
+def _positive(value):
+    value = float(value)
+    if not math.isfinite(value) or value <= 0:
+        raise ValueError(f"bad price {value!r}")
+    return value
+
+
+@dataclass
+class Quote:
+    symbol: str
+    price: float
+    change: float  # 24h change, percent
+    source: str
+
+    def to_ticker(self):
+        """The Binance 24hr ticker fields the bot reads"""
+        return {"symbol": self.symbol, "lastPrice": self.price, "priceChangePercent": self.change,
+                "source": self.source}
+
+
+class SourceHealth:
+    """
+    EWMA latency and error rate of one venue. After `trip_after` consecutive
+    failures the venue cools off for `cooldown` seconds (doubling on every
+    further failure, up to `max_cooldown`); once that expires a single
+    request is let through to probe it.
+    """
+    def __init__(self, alpha=0.2, trip_after=3, cooldown=5.0, max_cooldown=120.0):
+        self.alpha = alpha
+        self.trip_after = trip_after
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_error: Optional[str] = None
+        self.successes = 0
+        self.failures = 0
+
+    def success(self, latency):
+        self.successes += 1
+        self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+        self.error_rate -= self.alpha * self.error_rate
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def failure(self, error):
+        self.failures += 1
+        self.error_rate += self.alpha * (1 - self.error_rate)
+        self.consecutive_failures += 1
+        self.last_error = repr(error)
+        if self.consecutive_failures >= self.trip_after:
+            cooldown = min(self.max_cooldown,
+                           self.base_cooldown * 2 ** (self.consecutive_failures - self.trip_after))
+            self.open_until = time.monotonic() + cooldown
+
+    @property
+    def available(self):
+        return time.monotonic() >= self.open_until
+
+    @property
+    def score(self):
+        """Lower is better: expected latency inflated by the recent error rate"""
+        return (self.latency if self.latency is not None else HEDGE_DELAY) * (1 + 4 * self.error_rate)
+
+    def hedge_delay(self, cap):
+        """Give a venue about three times its usual latency before asking another one too"""
+        if self.latency is None:
+            return cap
+        return min(cap, max(0.02, 3 * self.latency))
+
+    def status(self):
+        return {
+            "available": self.available,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_seconds": round(max(0.0, self.open_until - time.monotonic()), 1),
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class ExchangeAdapter(abc.ABC):
+    """
+    REST client for one venue over a pooled keep-alive session. Requests go
+    through the venue's own RequestScheduler, so each venue keeps its own
+    budget, priorities and back-off. Subclasses map symbols and endpoints
+    and normalize responses: tickers to Quote, klines to Binance rows
+    (oldest first).
+    """
+    name = "exchange"
+
+    def __init__(self, base_url, concurrency=10, timeout=5, scheduler: Optional[RequestScheduler] = None):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.scheduler = scheduler or self.make_scheduler(concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def make_scheduler(self, concurrency):
+        return RequestScheduler(EXCHANGE_WEIGHT_LIMIT, EXCHANGE_WEIGHT_SAFETY, concurrency=concurrency)
+
+    def weight(self, path, params):
+        return 1
+
+    def _get_session(self):
+        # Created lazily so the session binds to the loop that actually uses it
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=REQUEST_HEADERS,
+            )
+        return self._session
+
+    async def _get(self, path, params):
+        session = self._get_session()
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with session.get(f"{self.base_url}{path}", params=params) as res:
+                status = res.status
+                self.scheduler.observe(res.status, res.headers)
+                res.raise_for_status()
+                return await res.json()
+        finally:
+            EXCHANGE_LATENCY.labels(self.name, path, status).observe(time.perf_counter() - started)
+
+    async def get_json(self, path, params=None, priority=PRIORITY_WATCHLIST, timeout=None):
+        """GET through the scheduler; identical concurrent requests share one call"""
+        params = params or {}
+        key = (path, tuple(sorted(params.items())))
+        return await self.scheduler.submit(
+            key, self.weight(path, params), priority, lambda: self._get(path, params), timeout)
+
+    @abc.abstractmethod
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST) -> Dict[str, Quote]:
+        """24hr quotes for the symbols this venue lists; unlisted symbols are left out"""
+
+    @abc.abstractmethod
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST) -> list:
+        """The last `limit` candles as Binance kline rows, oldest first"""
+
+    async def close(self):
+        await self.scheduler.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class BinanceAdapter(ExchangeAdapter):
+    name = "binance"
+
+    def __init__(self, base_url=BINANCE_REST_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def weight(self, path, params):
+        return request_weight(path, params)
+
+    def _quote(self, t):
+        return Quote(t["symbol"], _positive(t["lastPrice"]), float(t["priceChangePercent"]), self.name)
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        """24hr tickers for all symbols with a single batched request"""
+        if not symbols:
+            return {}
+        try:
+            params = {"symbols": json.dumps(list(symbols), separators=(",", ":"))}
+            res = await self.get_json("/api/v3/ticker/24hr", params, priority)
+            return {t["symbol"]: self._quote(t) for t in res if isinstance(t, dict) and "symbol" in t}
+        except aiohttp.ClientResponseError as e:
+            if e.status != 400 or len(symbols) == 1:
+                raise
+            # Binance rejects the whole batch if one symbol is unknown, so fall
+            # back to per-symbol requests and let the bad one fail on its own
+            results = await asyncio.gather(
+                *(self.get_json("/api/v3/ticker/24hr", {"symbol": s}, priority) for s in symbols),
+                return_exceptions=True,
+            )
+            return {s: self._quote(r) for s, r in zip(symbols, results) if isinstance(r, dict)}
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        rows = await self.get_json("/api/v3/klines", params, priority)
+        if not isinstance(rows, list):
+            raise ValueError(f"unexpected klines response for {symbol}")
+        return rows
+
+
+def _kline_row(open_time, o, h, l, c, v, interval_ms):
+    """A Binance kline row from another venue's OHLCV"""
+    return [open_time, o, h, l, c, v, open_time + interval_ms - 1, "0", 0, "0", "0", "0"]
+
+
+class BybitAdapter(ExchangeAdapter):
+    """Bybit v5 spot market endpoints; symbols are spelled like Binance's"""
+    name = "bybit"
+    INTERVALS = {"1m": "1", "3m": "3", "5m": "5", "15m": "15", "1h": "60"}
+
+    def __init__(self, base_url=BYBIT_REST_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def make_scheduler(self, concurrency):
+        # 600 requests per 5 seconds per IP, one unit each
+        return RequestScheduler(7200, EXCHANGE_WEIGHT_SAFETY, concurrency=concurrency)
+
+    @staticmethod
+    def _result(res):
+        if res.get("retCode") not in (0, None):
+            raise RejectedRequest(f"bybit error {res.get('retCode')}: {res.get('retMsg')}")
+        return res["result"]["list"]
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        if not symbols:
+            return {}
+        params = {"category": "spot"}
+        if len(symbols) == 1:
+            params["symbol"] = symbols[0]
+        wanted = set(symbols)
+        quotes = {}
+        # One request for the whole spot list is cheaper than one per symbol
+        for t in self._result(await self.get_json("/v5/market/tickers", params, priority)):
+            if t.get("symbol") in wanted:
+                quotes[t["symbol"]] = Quote(t["symbol"], _positive(t["lastPrice"]),
+                                            float(t["price24hPcnt"]) * 100, self.name)
+        return quotes
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        params = {"category": "spot", "symbol": symbol, "interval": self.INTERVALS[interval], "limit": limit}
+        rows = self._result(await self.get_json("/v5/market/kline", params, priority))
+        interval_ms = INTERVAL_MS[interval]
+        # Newest first: [start, open, high, low, close, volume, turnover]
+        return [_kline_row(int(r[0]), r[1], r[2], r[3], r[4], r[5], interval_ms) for r in reversed(rows)]
+
+
+class OkxAdapter(ExchangeAdapter):
+    """OKX v5 spot market endpoints; BTCUSDT is instrument BTC-USDT"""
+    name = "okx"
+    BARS = {"1m": "1m", "3m": "3m", "5m": "5m", "15m": "15m", "1h": "1H"}
+
+    def __init__(self, base_url=OKX_REST_URL, **kwargs):
+        super().__init__(base_url, **kwargs)
+
+    def make_scheduler(self, concurrency):
+        # Market data endpoints allow 20 requests per 2 seconds each
+        return RequestScheduler(600, EXCHANGE_WEIGHT_SAFETY, concurrency=concurrency)
+
+    @staticmethod
+    def inst_id(symbol):
+        return f"{symbol[:-4]}-USDT" if symbol.endswith("USDT") else symbol
+
+    @staticmethod
+    def _data(res):
+        if str(res.get("code", "0")) != "0":
+            raise RejectedRequest(f"okx error {res.get('code')}: {res.get('msg')}")
+        return res["data"]
+
+    def _quote(self, symbol, t):
+        price = _positive(t["last"])
+        open_ = _positive(t["open24h"])
+        return Quote(symbol, price, round((price - open_) / open_ * 100, 3), self.name)
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        if not symbols:
+            return {}
+        if len(symbols) == 1:
+            res = await self.get_json("/api/v5/market/ticker", {"instId": self.inst_id(symbols[0])}, priority)
+            return {symbols[0]: self._quote(symbols[0], t) for t in self._data(res)[:1]}
+        by_inst = {self.inst_id(s): s for s in symbols}
+        res = await self.get_json("/api/v5/market/tickers", {"instType": "SPOT"}, priority)
+        return {by_inst[t["instId"]]: self._quote(by_inst[t["instId"]], t)
+                for t in self._data(res) if t.get("instId") in by_inst}
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        params = {"instId": self.inst_id(symbol), "bar": self.BARS[interval], "limit": limit}
+        rows = self._data(await self.get_json("/api/v5/market/candles", params, priority))
+        interval_ms = INTERVAL_MS[interval]
+        # Newest first: [ts, open, high, low, close, vol, volCcy, volCcyQuote, confirm]
+        return [_kline_row(int(r[0]), r[1], r[2], r[3], r[4], r[5], interval_ms) for r in reversed(rows)]
+
+
+ADAPTERS = {"binance": BinanceAdapter, "bybit": BybitAdapter, "okx": OkxAdapter}
+
+
+def make_adapters(names=EXCHANGES, **kwargs) -> List[ExchangeAdapter]:
+    """"binance,okx" -> adapters in that order of preference"""
+    if isinstance(names, str):
+        names = names.split(",")
+    adapters = []
+    for name in names:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in ADAPTERS:
+            raise ValueError(f"Unknown exchange {name!r}; known: {', '.join(ADAPTERS)}")
+        adapters.append(ADAPTERS[name](**kwargs))
+    return adapters
+
+
+class ExchangeRouter:
+    """
+    Market data from several venues. Venues are tried in order of health
+    (configured order breaks ties); a request that the current venue has not
+    answered within its hedge delay is also sent to the next one, and the
+    first good response wins while the rest are cancelled. A failure moves on
+    to the next venue immediately. With aggregation="median" tickers are
+    requested from every available venue and, once the first answers, the
+    others get one hedge delay to join before the median is taken.
+    """
+    def __init__(self, adapters: List[ExchangeAdapter], aggregation=PRICE_AGGREGATION, hedge_delay=HEDGE_DELAY,
+                 max_deviation=MAX_PRICE_DEVIATION):
+        if not adapters:
+            raise ValueError("ExchangeRouter needs at least one adapter")
+        if aggregation not in ("first", "median"):
+            raise ValueError(f"Unknown price aggregation {aggregation!r}")
+        self.adapters = list(adapters)
+        self.aggregation = aggregation
+        self.hedge_delay = hedge_delay
+        self.max_deviation = max_deviation
+        self.health: Dict[str, SourceHealth] = {a.name: SourceHealth() for a in self.adapters}
+        for adapter in self.adapters:
+            health = self.health[adapter.name]
+            EXCHANGE_UP.labels(adapter.name).set_function(lambda h=health: float(h.available))
+
+    def adapter(self, name) -> Optional[ExchangeAdapter]:
+        return next((a for a in self.adapters if a.name == name), None)
+
+    @property
+    def primary(self) -> ExchangeAdapter:
+        return self.adapters[0]
+
+    def ranked(self) -> List[ExchangeAdapter]:
+        """Available venues, healthiest first; if all are cooling off, the one that recovers soonest"""
+        order = {a.name: i for i, a in enumerate(self.adapters)}
+        available = [a for a in self.adapters if self.health[a.name].available]
+        if not available:
+            return [min(self.adapters, key=lambda a: self.health[a.name].open_until)]
+        # Scores within 50% of each other keep the configured preference
+        best = min(self.health[a.name].score for a in available)
+        return sorted(available, key=lambda a: (self.health[a.name].score > best * 1.5,
+                                                self.health[a.name].score, order[a.name]))
+
+    async def _attempt(self, adapter, call: Callable[[ExchangeAdapter], Awaitable]):
+        health = self.health[adapter.name]
+        started = time.perf_counter()
+        try:
+            result = await call(adapter)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            record_error(f"exchange_{adapter.name}", e)
+            if _is_rejection(e):
+                raise
+            health.failure(e)
+            log.warning("exchange request failed", exchange=adapter.name, error=repr(e),
+                        cooling_off=not health.available)
+            raise
+        health.success(time.perf_counter() - started)
+        return result
+
+    async def hedged(self, call: Callable[[ExchangeAdapter], Awaitable], adapters=None):
+        """(adapter, result) from the first venue to answer `call` successfully"""
+        queue = list(adapters if adapters is not None else self.ranked())
+        pending: Dict[asyncio.Future, ExchangeAdapter] = {}
+        errors = []
+
+        def launch():
+            adapter = queue.pop(0)
+            pending[asyncio.ensure_future(self._attempt(adapter, call))] = adapter
+            return adapter
+
+        latest = launch()
+        try:
+            while pending:
+                delay = self.health[latest.name].hedge_delay(self.hedge_delay) if queue else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    HEDGED.labels(latest.name).inc()
+                    latest = launch()
+                    continue
+                for task in done:
+                    adapter = pending.pop(task)
+                    if task.exception() is None:
+                        return adapter, task.result()
+                    errors.append(f"{adapter.name}: {task.exception()!r}")
+                if not pending and queue:
+                    latest = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise NoSourceError("; ".join(errors))
+
+    async def gathered(self, call: Callable[[ExchangeAdapter], Awaitable]):
+        """[(adapter, result)] from every available venue that answers within a hedge delay of the first"""
+        tasks = {asyncio.ensure_future(self._attempt(a, call)): a for a in self.ranked()}
+        results, errors = [], []
+        try:
+            pending = set(tasks)
+            while pending and not results:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        results.append((tasks[task], task.result()))
+                    else:
+                        errors.append(f"{tasks[task].name}: {task.exception()!r}")
+            if pending:
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_delay)
+                results += [(tasks[t], t.result()) for t in done if t.exception() is None]
+        finally:
+            for task in tasks:
+                task.cancel()
+        if not results:
+            raise NoSourceError("; ".join(errors))
+        return results
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST) -> Dict[str, Quote]:
+        """Quotes for `symbols`; symbols no venue quotes are missing from the result"""
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        if self.aggregation == "median" and len(self.adapters) > 1:
+            return self._median(symbols, await self.gathered(lambda a: a.tickers(symbols, priority)))
+
+        adapter, quotes = await self.hedged(lambda a: a.tickers(symbols, priority))
+        # Symbols the winning venue doesn't list are asked of the remaining ones
+        tried = {adapter.name}
+        for other in self.ranked():
+            missing = [s for s in symbols if s not in quotes]
+            if not missing:
+                break
+            if other.name in tried:
+                continue
+            tried.add(other.name)
+            try:
+                quotes.update(await self._attempt(other, lambda a: a.tickers(missing, priority)))
+            except Exception:
+                pass  # Already counted against the venue's health
+        return quotes
+
+    def _median(self, symbols, results):
+        quotes = {}
+        for symbol in symbols:
+            found = [q[symbol] for _, q in results if symbol in q]
+            if not found:
+                continue
+            mid = statistics.median(q.price for q in found)
+            if len(found) >= 3:
+                kept = [q for q in found if abs(q.price - mid) <= mid * self.max_deviation]
+                for q in found:
+                    if q not in kept:
+                        OUTLIERS.labels(q.source).inc()
+                        log.warning("quote deviates from median", exchange=q.source, symbol=symbol,
+                                    price=q.price, median=mid)
+                found = kept or found
+                mid = statistics.median(q.price for q in found)
+            quotes[symbol] = Quote(symbol, mid, statistics.median(q.change for q in found),
+                                   "+".join(sorted(q.source for q in found)))
+        return quotes
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        """Klines from the first venue to answer; candles are not mixed across venues"""
+        _, rows = await self.hedged(lambda a: a.klines(symbol, interval, limit, priority))
+        return rows
+
+    def status(self):
+        return {
+            a.name: {**self.health[a.name].status(), "rate_limit": a.scheduler.status()}
+            for a in self.adapters
+        }
+
+    async def close(self):
+        for adapter in self.adapters:
+            await adapter.close()
@@ -0,0 +1,230 @@
+"""
+Incremental indicator engine
+Keeps a fixed-size NumPy ring buffer of closes per symbol and updates RSI,
+Wilder RSI, moving averages and change% in O(1) per candle, so nothing has to
+be refetched or reallocated on each tick
+"""
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity float ring buffer; index -1 is the newest value"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # next write position
+        self.count = 0
+
+    def append(self, value):
+        """Append a value and return the one it evicted (None if not full yet)"""
+        evicted = self.buf[self.head] if self.count == self.capacity else None
+        self.buf[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return evicted
+
+    def __getitem__(self, k):
+        # Only negative indices (-1 newest ... -count oldest)
+        if not -self.count <= k < 0:
+            raise IndexError(k)
+        return self.buf[(self.head + k) % self.capacity]
+
+    def __setitem__(self, k, value):
+        if not -self.count <= k < 0:
+            raise IndexError(k)
+        self.buf[(self.head + k) % self.capacity] = value
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        """Copy of the contents, oldest first"""
+        if self.count < self.capacity:
+            return self.buf[:self.count].copy()
+        return np.roll(self.buf, -self.head)
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class RollingIndicators:
+    """
+    O(1) per-candle indicators for one symbol.
+    `push` appends a new candle close; `update_last` revises the close of the
+    still-open candle. The window RSI matches HyperTradingBot.calculate_rsi
+    over the last `rsi_window` closes; `wilder_rsi` uses Wilder smoothing.
+    """
+    # Recompute running sums from the buffers this often to cancel float drift
+    RESYNC_EVERY = 4096
+
+    def __init__(self, rsi_window=14, wilder_period=14, sma_periods=(3,), change_lookback=None):
+        self.rsi_window = rsi_window
+        self.wilder_period = wilder_period
+        self.sma_periods = tuple(sma_periods)
+        self.change_lookback = change_lookback
+        capacity = max(rsi_window, max(self.sma_periods, default=1), (change_lookback or 0) + 1)
+        self.closes = RingBuffer(capacity)
+        self.deltas = RingBuffer(max(rsi_window - 1, 1))
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.sma_sums = {p: 0.0 for p in self.sma_periods}
+        # Wilder state after the latest delta, and before it (for update_last)
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self._prev_avg = (None, None)
+        self._seed_gain = 0.0
+        self._seed_loss = 0.0
+        self._n_deltas = 0
+        self._updates = 0
+
+    def seed(self, closes: Iterable[float]):
+        self.__init__(self.rsi_window, self.wilder_period, self.sma_periods, self.change_lookback)
+        for c in closes:
+            self.push(c)
+
+    def push(self, close):
+        close = float(close)
+        if len(self.closes):
+            self._add_delta(close - self.closes[-1])
+        for p in self.sma_periods:
+            if len(self.closes) >= p:
+                self.sma_sums[p] -= self.closes[-p]
+            self.sma_sums[p] += close
+        self.closes.append(close)
+
+        self._updates += 1
+        if self._updates % self.RESYNC_EVERY == 0:
+            self._resync()
+
+    def update_last(self, close):
+        close = float(close)
+        if not len(self.closes):
+            return self.push(close)
+        old = self.closes[-1]
+        self.closes[-1] = close
+        for p in self.sma_sums:
+            self.sma_sums[p] += close - old
+        if len(self.deltas):
+            old_delta = self.deltas[-1]
+            new_delta = old_delta + (close - old)
+            self.deltas[-1] = new_delta
+            self.gain_sum += max(new_delta, 0.0) - max(old_delta, 0.0)
+            self.loss_sum += max(-new_delta, 0.0) - max(-old_delta, 0.0)
+            self._revise_wilder(old_delta, new_delta)
+
+    def _add_delta(self, delta):
+        evicted = self.deltas.append(delta)
+        if evicted is not None:
+            self.gain_sum -= max(evicted, 0.0)
+            self.loss_sum -= max(-evicted, 0.0)
+        self.gain_sum += max(delta, 0.0)
+        self.loss_sum += max(-delta, 0.0)
+        self._apply_wilder(delta)
+
+    def _apply_wilder(self, delta):
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self._n_deltas += 1
+        self._prev_avg = (self.avg_gain, self.avg_loss)
+        p = self.wilder_period
+        if self._n_deltas < p:
+            self._seed_gain += gain
+            self._seed_loss += loss
+        elif self._n_deltas == p:
+            self.avg_gain = (self._seed_gain + gain) / p
+            self.avg_loss = (self._seed_loss + loss) / p
+        else:
+            self.avg_gain = (self.avg_gain * (p - 1) + gain) / p
+            self.avg_loss = (self.avg_loss * (p - 1) + loss) / p
+
+    def _revise_wilder(self, old_delta, new_delta):
+        d_gain = max(new_delta, 0.0) - max(old_delta, 0.0)
+        d_loss = max(-new_delta, 0.0) - max(-old_delta, 0.0)
+        p = self.wilder_period
+        if self._n_deltas < p:
+            self._seed_gain += d_gain
+            self._seed_loss += d_loss
+        elif self._n_deltas == p:
+            self.avg_gain += d_gain / p
+            self.avg_loss += d_loss / p
+        else:
+            prev_gain, prev_loss = self._prev_avg
+            self.avg_gain = (prev_gain * (p - 1) + max(new_delta, 0.0)) / p
+            self.avg_loss = (prev_loss * (p - 1) + max(-new_delta, 0.0)) / p
+
+    def _resync(self):
+        d = self.deltas.values()
+        self.gain_sum = float(d[d > 0].sum())
+        self.loss_sum = float(-d[d < 0].sum())
+        c = self.closes.values()
+        for p in self.sma_sums:
+            self.sma_sums[p] = float(c[-p:].sum())
+
+    @property
+    def last(self):
+        return self.closes[-1] if len(self.closes) else 0.0
+
+    @property
+    def rsi(self):
+        # Same rules as HyperTradingBot.calculate_rsi on the last rsi_window closes
+        if min(len(self.closes), self.rsi_window) < 10:
+            return 50
+        if self.loss_sum <= 0:
+            return 100
+        return round(100 - (100 / (1 + self.gain_sum / self.loss_sum)), 2)
+
+    @property
+    def wilder_rsi(self):
+        if self.avg_gain is None:
+            return 50
+        if self.avg_loss <= 0:
+            return 100
+        return round(100 - (100 / (1 + self.avg_gain / self.avg_loss)), 2)
+
+    def sma(self, period):
+        n = min(len(self.closes), period)
+        if n == 0:
+            return 0.0
+        if n < period:
+            return float(self.closes.values()[-n:].mean())
+        return self.sma_sums[period] / period
+
+    @property
+    def change(self):
+        """Percent change over change_lookback candles (or the whole buffer)"""
+        lookback = min(self.change_lookback or self.closes.capacity - 1, len(self.closes) - 1)
+        if lookback <= 0:
+            return 0.0
+        base = self.closes[-1 - lookback]
+        return round((self.closes[-1] - base) / base * 100, 2) if base else 0.0
+
+
+class IndicatorEngine:
+    """Per-symbol RollingIndicators keyed by candle open time"""
+    def __init__(self, **indicator_kwargs):
+        self.indicator_kwargs = indicator_kwargs
+        self.symbols: Dict[str, RollingIndicators] = {}
+        self._open_times: Dict[str, int] = {}
+
+    def get(self, symbol) -> RollingIndicators:
+        ind = self.symbols.get(symbol)
+        if ind is None:
+            ind = self.symbols[symbol] = RollingIndicators(**self.indicator_kwargs)
+        return ind
+
+    def seed(self, symbol, closes, last_open_time=0):
+        self.get(symbol).seed(closes)
+        self._open_times[symbol] = last_open_time
+
+    def update(self, symbol, open_time, close):
+        """Apply a kline tick: a new open time pushes a candle, the same one revises it"""
+        ind = self.get(symbol)
+        last_open = self._open_times.get(symbol)
+        if last_open is not None and open_time == last_open:
+            ind.update_last(close)
+        elif last_open is None or open_time > last_open:
+            ind.push(close)
+            self._open_times[symbol] = open_time
+        return ind
@@ -0,0 +1,157 @@
+"""
+Trade Journal
+Durable paper-trading state: an append-only SQLite (WAL) log of position
+opens, closes and balance changes plus periodic compact snapshots. Writes
+are handed to a background thread and committed in batches, so the trading
+hot path never waits on disk
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("journal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq INTEGER PRIMARY KEY,  -- last event seq folded into this snapshot
+    ts REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+_STOP = object()
+
+
+class TradeJournal:
+    """
+    append() assigns a sequence number and enqueues; the writer thread drains
+    the queue and commits everything it has in one transaction (one fsync)
+    at most every `flush_interval` seconds. snapshot() stores full state at
+    the current sequence and compacts the events it covers.
+    """
+    def __init__(self, path, flush_interval=0.05, max_batch=5000, keep_snapshots=2):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.keep_snapshots = keep_snapshots
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.last_seq = 0
+        self.last_snapshot_seq = 0
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        row = conn.execute("SELECT MAX(seq) FROM events").fetchone()
+        snap = conn.execute("SELECT MAX(seq) FROM snapshots").fetchone()
+        self.last_snapshot_seq = snap[0] or 0
+        self.last_seq = max(row[0] or 0, self.last_snapshot_seq)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: every batch commit is fsynced, so an acknowledged batch survives a crash
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def load(self) -> Tuple[Optional[dict], List[Tuple[int, str, dict]]]:
+        """Latest snapshot state (or None) and the events recorded after it"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT seq, state FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+            state, since = (json.loads(row[1]), row[0]) if row else (None, 0)
+            events = [
+                (seq, type_, json.loads(payload))
+                for seq, type_, payload in conn.execute(
+                    "SELECT seq, type, payload FROM events WHERE seq > ? ORDER BY seq", (since,))
+            ]
+            return state, events
+        finally:
+            conn.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name="trade-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, type_, payload):
+        self.last_seq += 1
+        self._queue.put(("event", self.last_seq, time.time(), type_, payload))
+
+    def snapshot(self, state):
+        """Record `state`, which must reflect every event appended so far"""
+        self._queue.put(("snapshot", self.last_seq, time.time(), None, state))
+        self.last_snapshot_seq = self.last_seq
+
+    @property
+    def events_since_snapshot(self):
+        return self.last_seq - self.last_snapshot_seq
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _writer(self):
+        conn = self._connect()
+        stopping = False
+        try:
+            while not stopping:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                if _STOP in batch:
+                    stopping = True
+                    batch = [item for item in batch if item is not _STOP]
+                    # Drain whatever was queued before close()
+                    while True:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                try:
+                    self._write(conn, batch)
+                except Exception as e:
+                    record_error("journal", e)
+                    log.error("journal write failed", records=len(batch), error=repr(e))
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        events = []
+        with conn:
+            for kind, seq, ts, type_, payload in batch:
+                if kind == "event":
+                    events.append((seq, ts, type_, json.dumps(payload, default=str)))
+                    continue
+                if events:
+                    conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?)", events)
+                    events = []
+                conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                             (seq, ts, json.dumps(payload, default=str)))
+                # Compact: the snapshot covers everything up to seq
+                conn.execute("DELETE FROM events WHERE seq <= ?", (seq,))
+                conn.execute(
+                    "DELETE FROM snapshots WHERE seq NOT IN "
+                    "(SELECT seq FROM snapshots ORDER BY seq DESC LIMIT ?)", (self.keep_snapshots,))
+            if events:
+                conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?)", events)
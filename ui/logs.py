@@ -0,0 +1,128 @@
+"""
+Structured Logging
+One line per event (JSON by default) with a timestamp, level, logger, event
+name and fields. Each (logger, event) pair is rate-limited, so a hot error
+path cannot flood the output; the next line that gets through reports how
+many were suppressed
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # "json" or "text"
+# At most LOG_RATE_BURST lines per event every LOG_RATE_PERIOD seconds
+LOG_RATE_BURST = int(os.environ.get("LOG_RATE_BURST", 10))
+LOG_RATE_PERIOD = float(os.environ.get("LOG_RATE_PERIOD", 10))
+
+ROOT = "trading"
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (logger, event); ERROR and above share the limit too"""
+    def __init__(self, burst=LOG_RATE_BURST, period=LOG_RATE_PERIOD):
+        super().__init__()
+        self.burst = burst
+        self.rate = burst / period
+        self._buckets: Dict[Tuple[str, str], list] = {}  # key -> [tokens, last, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+def _fields(record):
+    fields = dict(getattr(record, "fields", {}))
+    if getattr(record, "suppressed", 0):
+        fields["suppressed"] = record.suppressed
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        ts = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        fields = " ".join(f"{k}={v}" for k, v in _fields(record).items())
+        line = f"{ts} {record.levelname:<7} {record.name} {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class StructLogger:
+    """log.info("event name", key=value, ...); fields are only formatted if the level is enabled"""
+    def __init__(self, name):
+        self._logger = logging.getLogger(f"{ROOT}.{name}")
+
+    def _log(self, level, event, fields, exc_info=None):
+        if self._logger.isEnabledFor(level):
+            self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+
+_configured = False
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Attach the stdout handler to the `trading` logger tree (idempotent; leaves uvicorn's logging alone)"""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger(ROOT)
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    _configured = True
+
+
+def get_logger(name) -> StructLogger:
+    setup_logging()
+    return StructLogger(name)
@@ -0,0 +1,215 @@
+"""
+Streaming market data ingestion
+Subscribes to Binance combined kline + miniTicker streams and keeps an
+in-memory per-symbol state that the bot reads directly instead of polling REST
+"""
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional
+
+import aiohttp
+
+import clock
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("market_stream")
+
+BINANCE_WS_URL = os.environ.get("BINANCE_WS_URL", "wss://stream.binance.com:9443")
+
+INTERVAL_MS = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "1h": 3_600_000}
+
+
+@dataclass
+class SymbolState:
+    symbol: str
+    price: float = 0.0
+    change: float = 0.0
+    # Last `limit` kline closes; the final entry is the still-open candle
+    closes: Deque[float] = field(default_factory=deque)
+    last_open_time: int = 0
+    updated_at: float = 0.0
+    # Bumped whenever `closes` is replaced wholesale by a REST backfill
+    resets: int = 0
+
+    @property
+    def ready(self):
+        return self.price > 0 and len(self.closes) > 0
+
+
+class BinanceStreamFeed:
+    """
+    Maintains SymbolState for each symbol from a combined WebSocket stream.
+    On every (re)connect, and whenever a kline gap is detected, the affected
+    symbols are backfilled over REST through the shared AsyncMarketDataFetcher.
+    `on_update(state, candle_closed)` is called after every applied message,
+    and `on_klines(symbol, interval, rows)` with REST-style kline rows for
+    every streamed or backfilled candle. With a `recorder`, every raw
+    message and backfill result is captured for replay.
+    """
+    def __init__(self, symbols, fetcher, ws_url=BINANCE_WS_URL, interval="1m", limit=14,
+                 on_update: Optional[Callable[[SymbolState, bool], None]] = None, stale_after=30,
+                 on_klines: Optional[Callable[[str, str, list], None]] = None, recorder=None):
+        self.symbols = list(symbols)
+        self.fetcher = fetcher
+        self.ws_url = ws_url.rstrip("/")
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.limit = limit
+        self.on_update = on_update
+        self.on_klines = on_klines
+        self.stale_after = stale_after
+        self.recorder = recorder
+        self.states: Dict[str, SymbolState] = {
+            s: SymbolState(symbol=s, closes=deque(maxlen=limit)) for s in self.symbols
+        }
+        self.connected = asyncio.Event()
+        self._backfilling = set()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+
+    @property
+    def stream_url(self):
+        streams = []
+        for s in self.symbols:
+            streams.append(f"{s.lower()}@kline_{self.interval}")
+            streams.append(f"{s.lower()}@miniTicker")
+        return f"{self.ws_url}/stream?streams={'/'.join(streams)}"
+
+    async def run(self):
+        """Consume the stream forever, reconnecting with exponential backoff"""
+        backoff = 1
+        session = aiohttp.ClientSession()
+        try:
+            while True:
+                try:
+                    async with session.ws_connect(self.stream_url, heartbeat=self.stale_after / 2) as ws:
+                        self._ws = ws
+                        backoff = 1
+                        self.connected.set()
+                        # Anything may have moved while we were disconnected
+                        asyncio.create_task(self.backfill(self.symbols))
+                        await self._consume(ws)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    record_error("market_stream", e)
+                    log.error("market stream error", error=repr(e))
+                self.connected.clear()
+                log.warning("market stream disconnected", reconnect_in=backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        finally:
+            await session.close()
+
+    def add_symbols(self, symbols):
+        """Start following more symbols; the combined stream is reconnected with the new list"""
+        new = [s for s in symbols if s not in self.states]
+        if not new:
+            return
+        for s in new:
+            self.symbols.append(s)
+            self.states[s] = SymbolState(symbol=s, closes=deque(maxlen=self.limit))
+        if self._ws is not None and not self._ws.closed:
+            # run() reconnects with the new stream_url and backfills every symbol
+            asyncio.ensure_future(self._ws.close())
+
+    async def _consume(self, ws):
+        while True:
+            try:
+                msg = await ws.receive(timeout=self.stale_after)
+            except asyncio.TimeoutError:
+                log.warning("market stream silent, reconnecting", silent_for=self.stale_after)
+                return
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                if self.recorder is not None:
+                    self.recorder.record_json("msg", msg.data)
+                try:
+                    self.handle_message(msg.json())
+                except Exception as e:
+                    record_error("market_stream", e)
+                    log.warning("bad market stream message", error=repr(e))
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED,
+                              aiohttp.WSMsgType.ERROR):
+                # CLOSING is what a close() from another task (add_symbols) wakes us with
+                return
+
+    def handle_message(self, payload):
+        data = payload.get("data", payload)
+        event = data.get("e")
+        symbol = data.get("s")
+        state = self.states.get(symbol)
+        if state is None:
+            return
+
+        candle_closed = False
+        if event == "kline":
+            k = data["k"]
+            candle_closed = self._apply_kline(state, int(k["t"]), float(k["c"]), bool(k["x"]))
+            state.price = float(k["c"])
+            if self.on_klines:
+                self.on_klines(symbol, self.interval, [[k["t"], k["o"], k["h"], k["l"], k["c"], k["v"]]])
+        elif event == "24hrMiniTicker":
+            close, open_ = float(data["c"]), float(data["o"])
+            state.price = close
+            state.change = round((close - open_) / open_ * 100, 2) if open_ else 0.0
+        else:
+            return
+
+        state.updated_at = clock.timestamp()
+        if self.on_update and state.ready:
+            self.on_update(state, candle_closed)
+
+    def _apply_kline(self, state, open_time, close, is_closed):
+        if open_time == state.last_open_time and state.closes:
+            state.closes[-1] = close
+        elif open_time > state.last_open_time:
+            if state.last_open_time and open_time - state.last_open_time > self.interval_ms:
+                # Missed at least one candle, recover it from REST
+                asyncio.create_task(self.backfill([state.symbol]))
+            state.closes.append(close)
+            state.last_open_time = open_time
+        else:
+            # Late message for a candle we already moved past
+            return False
+        return is_closed
+
+    async def backfill(self, symbols):
+        symbols = [s for s in symbols if s not in self._backfilling]
+        if not symbols:
+            return
+        self._backfilling.update(symbols)
+        try:
+            self.apply_backfill(await self.fetcher.fetch_all(symbols))
+        except Exception as e:
+            record_error("backfill", e)
+            log.error("backfill failed", symbols=len(symbols), error=repr(e))
+        finally:
+            self._backfilling.difference_update(symbols)
+
+    def apply_backfill(self, raw):
+        """Replace each symbol's history with fetch_all() results: {symbol: (ticker, klines)}"""
+        if self.recorder is not None:
+            self.recorder.record("backfill", raw)
+        for symbol, (t_res, k_res) in raw.items():
+            state = self.states.get(symbol)
+            if state is None:
+                continue
+            if k_res and self.on_klines:
+                self.on_klines(symbol, self.interval, k_res)
+            if k_res:
+                last_open = int(k_res[-1][0])
+                # Never rewind past a candle the stream has already delivered
+                if last_open >= state.last_open_time:
+                    state.closes.clear()
+                    state.closes.extend(float(k[4]) for k in k_res)
+                    state.last_open_time = last_open
+                    state.resets += 1
+            if isinstance(t_res, dict) and "lastPrice" in t_res:
+                if not state.price:
+                    state.price = float(t_res["lastPrice"])
+                state.change = float(t_res["priceChangePercent"])
+            state.updated_at = clock.timestamp()
+            if self.on_update and state.ready:
+                self.on_update(state, False)
@@ -0,0 +1,302 @@
+"""
+Metrics
+Dependency-free counters, gauges and histograms rendered in the Prometheus
+text exposition format, plus a Lock wrapper that records wait and hold times
+"""
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond lock holds up to multi-second fetch cycles
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Unlabelled metrics have a single child
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+
+class _PerThread(abc.ABC):
+    """
+    Children are updated from the event loop and from the journal and
+    recorder threads. Each thread accumulates into its own cell, so a
+    read-modify-write never races another writer and no update is lost,
+    without taking a lock per update; reads add the cells up.
+    """
+    __slots__ = ("_local", "_cells", "_lock")
+
+    def __init__(self):
+        self._local = threading.local()
+        self._cells: List[list] = []
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_cell(self) -> list:
+        """A zeroed cell for one thread"""
+
+    def _register(self):
+        """The calling thread's cell, on its first update"""
+        cell = self._local.cell = self._new_cell()
+        with self._lock:
+            self._cells.append(cell)
+        return cell
+
+    def _all_cells(self):
+        with self._lock:
+            return list(self._cells)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}_total{_labels(self.labelnames, key)} {_num(child.value)}"]
+
+
+class _CounterChild(_PerThread):
+    __slots__ = ()
+
+    def _new_cell(self):
+        return [0.0]
+
+    def inc(self, amount=1.0):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._register()
+        cell[0] += amount
+
+    @property
+    def value(self):
+        return sum(cell[0] for cell in self._all_cells())
+
+
+class Gauge(_Metric):
+    """set() directly, or set_function() to read the value at scrape time"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._default().fn = fn
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_num(child.get())}"]
+
+
+class _GaugeChild(_Value):
+    __slots__ = ("fn",)
+
+    def __init__(self):
+        super().__init__()
+        self.fn: Optional[Callable[[], float]] = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        self.fn = fn
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            return float(self.fn())
+        except Exception:
+            return float("nan")
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, key, child):
+        counts, total = child.totals()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_num(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _HistogramChild(_PerThread):
+    __slots__ = ("buckets",)
+
+    def __init__(self, buckets):
+        super().__init__()
+        self.buckets = buckets
+
+    def _new_cell(self):
+        # A count per bucket (plus +Inf), then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._register()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def totals(self):
+        """(bucket counts, sum) across every thread's cell"""
+        cells = self._all_cells()
+        n = len(self.buckets) + 1
+        return [sum(cell[i] for cell in cells) for i in range(n)], sum(cell[-1] for cell in cells)
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LOCK_WAIT = Histogram("bot_lock_wait_seconds", "Time spent waiting to acquire a bot lock", ["lock"])
+LOCK_HOLD = Histogram("bot_lock_hold_seconds", "Time a bot lock was held", ["lock"])
+
+
+class InstrumentedLock:
+    """
+    Drop-in threading.Lock that records how long callers waited for it and
+    how long they held it. Non-reentrant like Lock, so one acquire time is
+    enough to track.
+    """
+    def __init__(self, name):
+        self._lock = threading.Lock()
+        self._wait = LOCK_WAIT.labels(name)
+        self._hold = LOCK_HOLD.labels(name)
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+            self._wait.observe(self._acquired_at - started)
+        return acquired
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        self._hold.observe(held)
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+EXCHANGE_LATENCY = Histogram("bot_exchange_request_seconds", "Exchange REST request latency",
+                             ["exchange", "endpoint", "status"])
+EXCHANGE_QUEUE_WAIT = Histogram("bot_exchange_queue_wait_seconds", "Time requests waited for rate-limit budget", ["priority"])
+UPDATE_CYCLE = Histogram("bot_update_cycle_seconds", "Poll-mode market data cycle duration")
+MARKET_UPDATE = Histogram("bot_market_update_seconds", "Time to apply one streamed market update")
+SIGNAL_LATENCY = Histogram("bot_signal_to_position_seconds", "Webhook intake to position opened", ["account"])
+HTTP_LATENCY = Histogram("bot_http_request_seconds", "API handler latency", ["method", "route", "status"])
+STALE_ROWS = Counter("bot_stale_rows", "Rows republished unchanged because a fetch failed", ["symbol"])
+ERRORS = Counter("bot_errors", "Errors by component and exception type", ["component", "error"])
+
+
+def record_error(component, exc):
+    ERRORS.labels(component, type(exc).__name__).inc()
@@ -0,0 +1,382 @@
+"""
+Mock Exchange
+Local stand-in for the Binance spot REST and WebSocket endpoints the bot
+uses, plus the Bybit and OKX market endpoints its exchange adapters call,
+with configurable latency, jitter, error and throttle rates. Prices are
+seeded random walks, so runs with the same seed see the same market.
+MockAdapter is the same market in-process, for exercising the router's
+hedging and failover without any HTTP
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Set
+
+from aiohttp import web
+
+from exchanges import ExchangeAdapter, Quote
+from rate_limit import PRIORITY_WATCHLIST, request_weight
+
+KNOWN_BASE_PRICES = {"BTC": 45000.0, "ETH": 2500.0, "SOL": 100.0, "XRP": 0.5, "BNB": 300.0, "DOGE": 0.08}
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.05        # base REST response delay, seconds
+    jitter: float = 0.02         # +/- uniform jitter on top of `latency`
+    error_rate: float = 0.0      # share of REST requests answered with a 500
+    throttle_rate: float = 0.0   # share of REST requests answered with a 429
+    weight_limit: int = 6000     # per-minute weight before real 429s
+    universe: int = 500          # symbols listed by exchangeInfo and the all-tickers call
+    ws_interval: float = 0.25    # seconds between stream pushes per connection
+    ws_drop_rate: float = 0.0    # chance per push round that the server drops the connection
+    seed: int = 0
+
+
+def universe_symbols(n):
+    """The known majors followed by synthetic MOCKnnnUSDT pairs"""
+    symbols = [f"{base}USDT" for base in KNOWN_BASE_PRICES]
+    symbols += [f"MOCK{i:03d}USDT" for i in range(max(0, n - len(symbols)))]
+    return symbols[:n]
+
+
+class MockMarket:
+    """Per-symbol random walk; any *USDT symbol is created on first use"""
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.prices: Dict[str, float] = {}
+        self.opens: Dict[str, float] = {}
+
+    def _base(self, symbol):
+        base = symbol[:-4] if symbol.endswith("USDT") else symbol
+        if base in KNOWN_BASE_PRICES:
+            return KNOWN_BASE_PRICES[base]
+        return round(random.Random(symbol).uniform(0.01, 500), 4)
+
+    def price(self, symbol):
+        if symbol not in self.prices:
+            self.prices[symbol] = self.opens[symbol] = self._base(symbol)
+        return self.prices[symbol]
+
+    def step(self, symbol):
+        price = self.price(symbol) * (1 + self.rng.gauss(0, 0.0008))
+        self.prices[symbol] = price
+        return price
+
+    def ticker(self, symbol):
+        price = self.step(symbol)
+        open_ = self.opens[symbol]
+        return {
+            "symbol": symbol,
+            "lastPrice": f"{price:.8f}",
+            "openPrice": f"{open_:.8f}",
+            "priceChangePercent": f"{(price - open_) / open_ * 100:.3f}",
+            "volume": f"{self.rng.uniform(1e3, 1e6):.2f}",
+        }
+
+    def klines(self, symbol, interval_ms, limit):
+        """`limit` bars ending in the current one, walking back from the current price"""
+        price = self.price(symbol)
+        now_open = int(time.time() * 1000) // interval_ms * interval_ms
+        closes = [price]
+        for _ in range(limit - 1):
+            closes.append(closes[-1] / (1 + self.rng.gauss(0, 0.002)))
+        closes.reverse()
+        rows = []
+        for i, close in enumerate(closes):
+            open_time = now_open - (limit - 1 - i) * interval_ms
+            open_ = closes[i - 1] if i else close
+            rows.append([
+                open_time, f"{open_:.8f}", f"{max(open_, close) * 1.001:.8f}", f"{min(open_, close) * 0.999:.8f}",
+                f"{close:.8f}", f"{self.rng.uniform(10, 1000):.4f}", open_time + interval_ms - 1,
+                "0", self.rng.randint(10, 500), "0", "0", "0",
+            ])
+        return rows
+
+
+INTERVALS_MS = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "1h": 3_600_000}
+
+
+class MockExchange:
+    def __init__(self, config: MockConfig = None):
+        self.config = config or MockConfig()
+        self.market = MockMarket(self.config.seed)
+        self.rng = random.Random(self.config.seed + 1)
+        self.universe = universe_symbols(self.config.universe)
+        self._minute = 0
+        self._used_weight = 0
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "ws_connections": 0, "ws_messages": 0}
+        self._streams: Set[web.WebSocketResponse] = set()
+
+    def _spend(self, weight):
+        minute = int(time.time() // 60)
+        if minute != self._minute:
+            self._minute, self._used_weight = minute, 0
+        self._used_weight += weight
+        return self._used_weight
+
+    async def _respond(self, request, path, body_fn):
+        self.stats["requests"] += 1
+        params = dict(request.query)
+        used = self._spend(request_weight(path, params))
+        delay = self.config.latency + self.rng.uniform(-self.config.jitter, self.config.jitter)
+        await asyncio.sleep(max(0.0, delay))
+        # Only Binance reports its used weight; the other venues' clients would misread it
+        headers = {"X-MBX-USED-WEIGHT-1M": str(used)} if path.startswith("/api/v3/") else {}
+        roll = self.rng.random()
+        if used > self.config.weight_limit or roll < self.config.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.json_response({"code": -1003, "msg": "Too many requests"}, status=429,
+                                     headers={**headers, "Retry-After": "1"})
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"code": -1001, "msg": "Internal error"}, status=500, headers=headers)
+        try:
+            body = body_fn(params)
+        except KeyError as e:
+            return web.json_response({"code": -1102, "msg": f"Mandatory parameter {e} missing"}, status=400)
+        return web.json_response(body, headers=headers)
+
+    def _ticker_body(self, params):
+        if "symbol" in params:
+            return self.market.ticker(params["symbol"])
+        symbols = json.loads(params["symbols"]) if "symbols" in params else self.universe
+        return [self.market.ticker(s) for s in symbols]
+
+    def _price_body(self, params):
+        if "symbol" in params:
+            return {"symbol": params["symbol"], "price": f"{self.market.step(params['symbol']):.8f}"}
+        return [{"symbol": s, "price": f"{self.market.step(s):.8f}"} for s in self.universe]
+
+    def _klines_body(self, params):
+        interval_ms = INTERVALS_MS.get(params.get("interval", "1m"), 60_000)
+        limit = min(int(params.get("limit", 500)), 1000)
+        return self.market.klines(params["symbol"], interval_ms, limit)
+
+    def _exchange_info_body(self, params):
+        return {"symbols": [
+            {"symbol": s, "status": "TRADING", "baseAsset": s[:-4], "quoteAsset": "USDT"} for s in self.universe
+        ]}
+
+    def _bybit_tickers_body(self, params):
+        symbols = [params["symbol"]] if "symbol" in params else self.universe
+        rows = []
+        for t in map(self.market.ticker, symbols):
+            change = float(t["priceChangePercent"]) / 100
+            rows.append({"symbol": t["symbol"], "lastPrice": t["lastPrice"], "prevPrice24h": t["openPrice"],
+                         "price24hPcnt": f"{change:.5f}", "volume24h": t["volume"]})
+        return {"retCode": 0, "retMsg": "OK", "result": {"category": "spot", "list": rows}}
+
+    def _bybit_kline_body(self, params):
+        interval_ms = int(params.get("interval", "1")) * 60_000
+        rows = self.market.klines(params["symbol"], interval_ms, min(int(params.get("limit", 200)), 1000))
+        # Newest first: [start, open, high, low, close, volume, turnover]
+        rows = [[str(r[0]), *r[1:6], "0"] for r in reversed(rows)]
+        return {"retCode": 0, "retMsg": "OK", "result": {"category": "spot", "symbol": params["symbol"], "list": rows}}
+
+    @staticmethod
+    def _okx_symbol(inst_id):
+        return inst_id.replace("-", "")
+
+    def _okx_ticker_row(self, symbol):
+        t = self.market.ticker(symbol)
+        return {"instId": f"{symbol[:-4]}-USDT", "last": t["lastPrice"], "open24h": t["openPrice"],
+                "vol24h": t["volume"], "ts": str(int(time.time() * 1000))}
+
+    def _okx_ticker_body(self, params):
+        return {"code": "0", "msg": "", "data": [self._okx_ticker_row(self._okx_symbol(params["instId"]))]}
+
+    def _okx_tickers_body(self, params):
+        return {"code": "0", "msg": "", "data": [self._okx_ticker_row(s) for s in self.universe]}
+
+    def _okx_candles_body(self, params):
+        bar = params.get("bar", "1m")
+        interval_ms = INTERVALS_MS.get(bar.replace("H", "h"), 60_000)
+        rows = self.market.klines(self._okx_symbol(params["instId"]), interval_ms,
+                                  min(int(params.get("limit", 100)), 300))
+        # Newest first: [ts, open, high, low, close, vol, volCcy, volCcyQuote, confirm]
+        rows = [[str(r[0]), *r[1:6], "0", "0", "1"] for r in reversed(rows)]
+        return {"code": "0", "msg": "", "data": rows}
+
+    async def ticker_24hr(self, request):
+        return await self._respond(request, "/api/v3/ticker/24hr", self._ticker_body)
+
+    async def ticker_price(self, request):
+        return await self._respond(request, "/api/v3/ticker/price", self._price_body)
+
+    async def klines(self, request):
+        return await self._respond(request, "/api/v3/klines", self._klines_body)
+
+    async def exchange_info(self, request):
+        return await self._respond(request, "/api/v3/exchangeInfo", self._exchange_info_body)
+
+    async def bybit_tickers(self, request):
+        return await self._respond(request, "/v5/market/tickers", self._bybit_tickers_body)
+
+    async def bybit_kline(self, request):
+        return await self._respond(request, "/v5/market/kline", self._bybit_kline_body)
+
+    async def okx_ticker(self, request):
+        return await self._respond(request, "/api/v5/market/ticker", self._okx_ticker_body)
+
+    async def okx_tickers(self, request):
+        return await self._respond(request, "/api/v5/market/tickers", self._okx_tickers_body)
+
+    async def okx_candles(self, request):
+        return await self._respond(request, "/api/v5/market/candles", self._okx_candles_body)
+
+    async def stream(self, request):
+        """Combined stream: kline and miniTicker pushes for every requested symbol"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self.stats["ws_connections"] += 1
+        self._streams.add(ws)
+        subs: Dict[str, List[str]] = {}
+        for name in request.query.get("streams", "").split("/"):
+            if "@" in name:
+                symbol, kind = name.split("@", 1)
+                subs.setdefault(symbol.upper(), []).append(kind)
+        open_times: Dict[str, int] = {}
+        # Read (and so answer) the client's close frame while pushing
+        reader = asyncio.ensure_future(self._drain(ws))
+        try:
+            while not ws.closed:
+                if self.rng.random() < self.config.ws_drop_rate:
+                    break
+                for symbol, kinds in subs.items():
+                    price = self.market.step(symbol)
+                    for kind in kinds:
+                        if kind.startswith("kline_"):
+                            interval = kind[len("kline_"):]
+                            interval_ms = INTERVALS_MS.get(interval, 60_000)
+                            open_time = int(time.time() * 1000) // interval_ms * interval_ms
+                            previous = open_times.get(symbol)
+                            if previous is not None and open_time > previous:
+                                # Close out the previous candle before starting the next
+                                await ws.send_str(self._kline_msg(symbol, kind, interval, previous, price, True))
+                            open_times[symbol] = open_time
+                            await ws.send_str(self._kline_msg(symbol, kind, interval, open_time, price, False))
+                        elif kind == "miniTicker":
+                            open_ = self.market.opens[symbol]
+                            await ws.send_str(json.dumps({"stream": f"{symbol.lower()}@miniTicker", "data": {
+                                "e": "24hrMiniTicker", "E": int(time.time() * 1000), "s": symbol,
+                                "c": f"{price:.8f}", "o": f"{open_:.8f}",
+                            }}))
+                        self.stats["ws_messages"] += 1
+                await asyncio.sleep(self.config.ws_interval)
+        except (ConnectionResetError, RuntimeError):
+            pass  # Client went away mid-send
+        finally:
+            self._streams.discard(ws)
+            reader.cancel()
+        await ws.close()
+        return ws
+
+    @staticmethod
+    async def _drain(ws):
+        async for _ in ws:
+            pass
+
+    async def drop_streams(self):
+        """Close every open stream connection from the server side, as an exchange restart would"""
+        for ws in list(self._streams):
+            await ws.close()
+
+    def _kline_msg(self, symbol, kind, interval, open_time, price, closed):
+        return json.dumps({"stream": f"{symbol.lower()}@{kind}", "data": {"e": "kline", "s": symbol, "k": {
+            "t": open_time, "i": interval, "o": f"{price:.8f}", "h": f"{price:.8f}", "l": f"{price:.8f}",
+            "c": f"{price:.8f}", "v": "1.0", "x": closed,
+        }}})
+
+    async def mock_stats(self, request):
+        return web.json_response({**self.stats, "used_weight": self._used_weight, "config": asdict(self.config)})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get("/api/v3/ticker/24hr", self.ticker_24hr)
+        app.router.add_get("/api/v3/ticker/price", self.ticker_price)
+        app.router.add_get("/api/v3/klines", self.klines)
+        app.router.add_get("/api/v3/exchangeInfo", self.exchange_info)
+        app.router.add_get("/v5/market/tickers", self.bybit_tickers)
+        app.router.add_get("/v5/market/kline", self.bybit_kline)
+        app.router.add_get("/api/v5/market/ticker", self.okx_ticker)
+        app.router.add_get("/api/v5/market/tickers", self.okx_tickers)
+        app.router.add_get("/api/v5/market/candles", self.okx_candles)
+        app.router.add_get("/stream", self.stream)
+        app.router.add_get("/mock/stats", self.mock_stats)
+        return app
+
+    async def start(self, host="127.0.0.1", port=8765):
+        runner = web.AppRunner(self.make_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+class MockAdapter(ExchangeAdapter):
+    """
+    An exchange adapter answering from an in-process MockMarket after
+    `latency` seconds, failing `error_rate` of requests and quoting prices
+    off by `bias` (0.01 = 1% high). Several of these, with different
+    settings, make a router testable without any network.
+    """
+    def __init__(self, name="mock", latency=0.0, error_rate=0.0, bias=0.0, seed=0, market=None):
+        super().__init__(f"mock://{name}")
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bias = bias
+        self.market = market or MockMarket(seed)
+        self.rng = random.Random(seed + 1)
+        self.calls = 0
+
+    async def _answer(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            raise ConnectionError(f"{self.name} mock failure")
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        await self._answer()
+        quotes = {}
+        for symbol in symbols:
+            t = self.market.ticker(symbol)
+            quotes[symbol] = Quote(symbol, float(t["lastPrice"]) * (1 + self.bias),
+                                   float(t["priceChangePercent"]), self.name)
+        return quotes
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        await self._answer()
+        return self.market.klines(symbol, INTERVALS_MS[interval], limit)
+
+
+def serve(config: MockConfig, host="127.0.0.1", port=8765):
+    """Blocking; the benchmark runs this in its own process"""
+    web.run_app(MockExchange(config).make_app(), host=host, port=port, print=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Binance, Bybit and OKX market data endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency)
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=MockConfig.throttle_rate)
+    parser.add_argument("--weight-limit", type=int, default=MockConfig.weight_limit)
+    parser.add_argument("--universe", type=int, default=MockConfig.universe)
+    parser.add_argument("--ws-interval", type=float, default=MockConfig.ws_interval)
+    parser.add_argument("--ws-drop-rate", type=float, default=MockConfig.ws_drop_rate)
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        weight_limit=args.weight_limit, universe=args.universe, ws_interval=args.ws_interval,
+        ws_drop_rate=args.ws_drop_rate, seed=args.seed,
+    )
+    print(f"Mock exchange on http://{args.host}:{args.port} (ws://{args.host}:{args.port}/stream)")
+    serve(config, args.host, args.port)
@@ -0,0 +1,249 @@
+"""
+Parallel Parameter Sweep
+Grid or random search over tp / sl / rsi_buy / rsi_sell for each strategy,
+evaluated by the vectorized backtester across a process pool. Candles and the
+parameter-independent indicators live in one shared memory block that every
+worker maps, so nothing is pickled per task
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from backtest import (Candles, backtest_symbol, generate_signals, load_directory, load_klines, rolling_change,
+                      rolling_mean, rolling_rsi, stack_closes, summarize)
+from strategy import STRATEGY_CONFIG
+
+console = Console()
+
+PARAMS = ("tp", "sl", "rsi_buy", "rsi_sell")
+# Columns packed into shared memory for each symbol, all float64
+SHARED_COLUMNS = ("open_time", "open", "high", "low", "close", "volume", "rsi", "change", "avg")
+
+
+@dataclass
+class SharedLayout:
+    """Where each symbol's columns sit inside the shared block"""
+    shm_name: str
+    total: int
+    # symbol -> (offset, length) along the time axis
+    symbols: Dict[str, Tuple[int, int]]
+
+
+def share_candles(data: Dict[str, Candles]):
+    """Copy candles plus RSI, 24h change and 3-bar average into one shared memory block; returns (shm, layout)"""
+    # The parameter-independent indicators, for every symbol in one pass
+    closes = stack_closes(data)
+    rsi, change, avg = rolling_rsi(closes), rolling_change(closes), rolling_mean(closes, 3)
+    offsets, total = {}, 0
+    for symbol, candles in data.items():
+        offsets[symbol] = (total, len(candles))
+        total += len(candles)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * 8 * len(SHARED_COLUMNS))
+    block = np.ndarray((len(SHARED_COLUMNS), total), dtype=np.float64, buffer=shm.buf)
+    for row, (symbol, candles) in enumerate(data.items()):
+        start, length = offsets[symbol]
+        cols = block[:, start:start + length]
+        cols[0] = candles.open_time
+        cols[1] = candles.open
+        cols[2] = candles.high
+        cols[3] = candles.low
+        cols[4] = candles.close
+        cols[5] = candles.volume
+        cols[6] = rsi[row, :length]
+        cols[7] = change[row, :length]
+        cols[8] = avg[row, :length]
+    return shm, SharedLayout(shm.name, total, offsets)
+
+
+# Per-worker views into the shared block, set by _attach
+_shm = None
+_block: Optional[np.ndarray] = None
+_views: Dict[str, Tuple[Candles, int, int]] = {}
+
+
+def _attach(layout: SharedLayout):
+    global _shm, _block
+    _shm = shared_memory.SharedMemory(name=layout.shm_name)
+    block = _block = np.ndarray((len(SHARED_COLUMNS), layout.total), dtype=np.float64, buffer=_shm.buf)
+    for symbol, (start, length) in layout.symbols.items():
+        cols = block[:, start:start + length]
+        # open_time stays float64 ms (exact well past year 2200) to avoid a per-worker copy
+        candles = Candles(symbol=symbol, open_time=cols[0], open=cols[1],
+                          high=cols[2], low=cols[3], close=cols[4], volume=cols[5])
+        _views[symbol] = (candles, start, length)
+
+
+def _evaluate(strategy, combos, initial_balance, fee_rate):
+    """
+    Backtest a chunk of parameter sets inside a worker. Each set's signals
+    are computed in one pass over every symbol in the shared block; only the
+    trade walk runs per symbol
+    """
+    close, rsi, change, avg = (_block[SHARED_COLUMNS.index(c)] for c in ("close", "rsi", "change", "avg"))
+    data = {s: v[0] for s, v in _views.items()}
+    out = []
+    for params in combos:
+        conf = {**STRATEGY_CONFIG[strategy], **params}
+        signals = generate_signals(close, rsi, change, conf, avg)
+        results = {
+            symbol: backtest_symbol(candles, strategy, conf, initial_balance, fee_rate=fee_rate,
+                                    signals=signals[start:start + length])
+            for symbol, (candles, start, length) in _views.items()
+        }
+        summary = summarize(results, data)
+        out.append({"strategy": strategy, "params": params, **summary})
+    return out
+
+
+def parse_range(spec, integer=False):
+    """'a:b:step' -> inclusive range, 'a,b,c' -> list"""
+    cast = int if integer else float
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        values = np.arange(start, stop + step / 2, step)
+        return [cast(round(v, 6)) for v in values]
+    return [cast(x) for x in spec.split(",")]
+
+
+def build_combos(space: Dict[str, List[float]], n_random=0, seed=0):
+    """Full grid, or `n_random` samples drawn from the grid; rsi_buy must stay below rsi_sell"""
+    keys = list(space)
+    if n_random:
+        rng = random.Random(seed)
+        combos, seen, attempts = [], set(), 0
+        while len(combos) < n_random and attempts < n_random * 50:
+            attempts += 1
+            combo = tuple(rng.choice(space[k]) for k in keys)
+            if combo not in seen:
+                seen.add(combo)
+                combos.append(dict(zip(keys, combo)))
+    else:
+        combos = [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+    return [c for c in combos if c.get("rsi_buy", 0) < c.get("rsi_sell", 100)]
+
+
+def default_space(strategy):
+    """Search around a strategy's preset: TP/SL scaled 0.5x-2x, RSI thresholds shifted by up to 10"""
+    conf = STRATEGY_CONFIG[strategy]
+    scales = (0.5, 0.75, 1.0, 1.5, 2.0)
+    return {
+        "tp": [round(conf["tp"] * s, 6) for s in scales],
+        "sl": [round(conf["sl"] * s, 6) for s in scales],
+        "rsi_buy": [conf["rsi_buy"] + d for d in (-10, -5, 0, 5)],
+        "rsi_sell": [conf["rsi_sell"] + d for d in (-5, 0, 5, 10)],
+    }
+
+
+def sweep(data: Dict[str, Candles], spaces: Dict[str, Dict[str, List[float]]], n_random=0, workers=None,
+          chunk_size=8, initial_balance=10000.0, fee_rate=0.0, metric="return_pct", top=20, out_path=None, seed=0):
+    """
+    Evaluate every strategy's search space and return the `top` results ranked
+    by `metric`, streaming all of them to `out_path` as they complete
+    """
+    combos = {strategy: build_combos(space, n_random, seed) for strategy, space in spaces.items()}
+    total = sum(len(c) for c in combos.values())
+    workers = workers or os.cpu_count()
+    shm, layout = share_candles(data)
+    ranked: List[Tuple[float, int, dict]] = []
+    done, started = 0, time.monotonic()
+    out = open(out_path, "w") if out_path else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(layout,)) as pool:
+            futures = [
+                pool.submit(_evaluate, strategy, chunk[i:i + chunk_size], initial_balance, fee_rate)
+                for strategy, chunk in combos.items()
+                for i in range(0, len(chunk), chunk_size)
+            ]
+            console.print(f"Evaluating {total} parameter sets on {len(data)} symbols with {workers} workers")
+
+            for future in as_completed(futures):
+                for result in future.result():
+                    done += 1
+                    if out:
+                        out.write(json.dumps(result) + "\n")
+                    entry = (result[metric], done, result)
+                    if len(ranked) < top:
+                        heapq.heappush(ranked, entry)
+                    else:
+                        heapq.heappushpop(ranked, entry)
+                if out:
+                    out.flush()
+                best = max(ranked)[2]
+                console.print(f"[{done}/{total}] {done / (time.monotonic() - started):.1f} sets/s - "
+                              f"best {best['strategy']} {best['params']} {metric}={best[metric]:.2f}")
+    finally:
+        if out:
+            out.close()
+        shm.close()
+        shm.unlink()
+
+    return [entry[2] for entry in sorted(ranked, reverse=True)]
+
+
+def print_ranking(results, metric):
+    table = Table(title=f"Top parameter sets by {metric}")
+    for col in ("#", "Strategy", *PARAMS, "Trades", "Win %", "Return %", "Max DD %"):
+        table.add_column(col, justify="right")
+    for rank, r in enumerate(results, 1):
+        table.add_row(str(rank), r["strategy"], *(str(r["params"].get(p, "")) for p in PARAMS),
+                      str(r["trades"]), f"{r['win_rate']:.1f}", f"{r['return_pct']:.2f}",
+                      f"{r['max_drawdown_pct']:.2f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel TP/SL/RSI parameter sweep")
+    parser.add_argument("path", help="Directory of <SYMBOL>*.csv / .parquet kline files, or a single file")
+    parser.add_argument("--strategies", default="scalping,short,swing")
+    parser.add_argument("--symbols", help="Comma separated symbols to include")
+    # Unset ranges default to a neighbourhood of each strategy's preset
+    parser.add_argument("--tp", help="start:stop:step or comma list")
+    parser.add_argument("--sl")
+    parser.add_argument("--rsi-buy")
+    parser.add_argument("--rsi-sell")
+    parser.add_argument("--random", type=int, default=0, help="Sample N sets instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--metric", default="return_pct", choices=["return_pct", "pnl", "win_rate"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default="sweep_results.jsonl", help="Streams every result as JSON lines")
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else None
+    if os.path.isdir(args.path):
+        data = load_directory(args.path, symbols)
+    else:
+        candles = load_klines(args.path)
+        data = {candles.symbol: candles}
+
+    overrides = {
+        "tp": args.tp and parse_range(args.tp),
+        "sl": args.sl and parse_range(args.sl),
+        "rsi_buy": args.rsi_buy and parse_range(args.rsi_buy, integer=True),
+        "rsi_sell": args.rsi_sell and parse_range(args.rsi_sell, integer=True),
+    }
+    spaces = {}
+    for strategy in (s.strip().lower() for s in args.strategies.split(",")):
+        space = default_space(strategy)
+        space.update({k: v for k, v in overrides.items() if v})
+        spaces[strategy] = space
+
+    results = sweep(data, spaces, args.random, args.workers, args.chunk_size,
+                    args.balance, args.fee, args.metric, args.top, args.out, args.seed)
+    print_ranking(results, args.metric)
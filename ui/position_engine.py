@@ -0,0 +1,160 @@
+"""
+Event-driven Position Engine
+Indexes open positions by trigger price (TP, SL, liquidation) in per-symbol
+heaps, so a price update only touches the positions whose level it crossed
+"""
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple
+
+import clock
+
+
+@dataclass
+class ClosedTrade:
+    symbol: str
+    side: str  # 'LONG' or 'SHORT'
+    entry_price: float
+    exit_price: float
+    quantity: float
+    entry_time: datetime
+    exit_time: datetime
+    reason: str  # 'TP', 'SL', 'LIQ' or 'REPLACED'
+    pnl: float
+
+    def to_dict(self):
+        return {
+            'token': self.symbol,
+            'side': self.side,
+            'entry_price': self.entry_price,
+            'exit_price': self.exit_price,
+            'quantity': self.quantity,
+            'entry_time': self.entry_time.isoformat(),
+            'exit_time': self.exit_time.isoformat(),
+            'reason': self.reason,
+            'pnl': self.pnl,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            symbol=d['token'],
+            side=d['side'],
+            entry_price=d['entry_price'],
+            exit_price=d['exit_price'],
+            quantity=d['quantity'],
+            entry_time=datetime.fromisoformat(d['entry_time']),
+            exit_time=datetime.fromisoformat(d['exit_time']),
+            reason=d['reason'],
+            pnl=d['pnl'],
+        )
+
+
+def realized_pnl(position, exit_price):
+    pnl = (exit_price - position.entry_price) * position.quantity
+    return -pnl if position.side == 'SHORT' else pnl
+
+
+class PositionEngine:
+    """
+    Each symbol has an "up" min-heap of levels that fire when price rises to
+    them (LONG TP, SHORT SL/liquidation) and a "down" max-heap of levels that
+    fire when price falls to them (LONG SL/liquidation, SHORT TP). A tick pops
+    only crossed levels, so its cost scales with triggers hit, not with the
+    number of open positions. Removed positions leave stale heap entries that
+    are skipped lazily and compacted when they pile up.
+
+    TP exits fill at their level, like a resting limit order. SL and
+    liquidation exits fill at the tick that crossed them: when price gaps
+    through a stop, the market never traded at the stop level.
+    """
+    def __init__(self, history_size=1000):
+        self.open: Dict[int, object] = {}
+        # id(position) -> engine-assigned id; heap entries reference the latter
+        # so a recycled object id can never match a stale entry
+        self._pids: Dict[int, int] = {}
+        self._next_pid = 0
+        self.history: Deque[ClosedTrade] = deque(maxlen=history_size)
+        self._up: Dict[str, List[Tuple[float, int, int, str]]] = {}
+        self._down: Dict[str, List[Tuple[float, int, int, str]]] = {}
+        self._live: Dict[str, int] = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.open)
+
+    def _push(self, heaps, symbol, key, pid, reason):
+        self._seq += 1
+        heapq.heappush(heaps.setdefault(symbol, []), (key, self._seq, pid, reason))
+
+    def add(self, position):
+        self._next_pid += 1
+        pid = self._pids[id(position)] = self._next_pid
+        self.open[pid] = position
+        s = position.symbol
+        self._live[s] = self._live.get(s, 0) + 1
+        if position.side == 'LONG':
+            self._push(self._up, s, position.tp_price, pid, 'TP')
+            self._push(self._down, s, -position.sl_price, pid, 'SL')
+            self._push(self._down, s, -position.liq_price, pid, 'LIQ')
+        else:
+            self._push(self._down, s, -position.tp_price, pid, 'TP')
+            self._push(self._up, s, position.sl_price, pid, 'SL')
+            self._push(self._up, s, position.liq_price, pid, 'LIQ')
+
+    def remove(self, position):
+        pid = self._pids.pop(id(position), None)
+        if pid is None or self.open.pop(pid, None) is None:
+            return False
+        s = position.symbol
+        self._live[s] -= 1
+        self._compact(s)
+        return True
+
+    def _compact(self, symbol):
+        # Each live position has 3 heap entries; rebuild once stale ones dominate
+        live = self._live.get(symbol, 0)
+        for heaps in (self._up, self._down):
+            heap = heaps.get(symbol)
+            if heap and len(heap) > 4 * live + 64:
+                heap[:] = [e for e in heap if e[2] in self.open]
+                heapq.heapify(heap)
+
+    def on_price(self, symbol, price):
+        """Pop every level crossed by `price`; returns [(position, reason, fill price)] now closed"""
+        fired = []
+        up = self._up.get(symbol)
+        while up and up[0][0] <= price:
+            level, _, pid, reason = heapq.heappop(up)
+            position = self.open.pop(pid, None)
+            if position is not None:
+                self._pids.pop(id(position), None)
+                fired.append((position, reason, level if reason == 'TP' else price))
+        down = self._down.get(symbol)
+        while down and -down[0][0] >= price:
+            key, _, pid, reason = heapq.heappop(down)
+            position = self.open.pop(pid, None)
+            if position is not None:
+                self._pids.pop(id(position), None)
+                fired.append((position, reason, -key if reason == 'TP' else price))
+        if fired:
+            self._live[symbol] -= len(fired)
+            self._compact(symbol)
+        return fired
+
+    def record(self, position, exit_price, reason, exit_time=None) -> ClosedTrade:
+        trade = ClosedTrade(
+            symbol=position.symbol,
+            side=position.side,
+            entry_price=position.entry_price,
+            exit_price=exit_price,
+            quantity=position.quantity,
+            entry_time=position.entry_time,
+            exit_time=exit_time or clock.now(),
+            reason=reason,
+            pnl=realized_pnl(position, exit_price),
+        )
+        self.history.append(trade)
+        return trade
@@ -0,0 +1,284 @@
+"""
+Exchange Request Scheduler
+Every REST call to the exchange goes through one scheduler that spends a
+token-bucket request-weight budget (kept in sync with the X-MBX-USED-WEIGHT
+headers), serves queued requests by priority, coalesces identical in-flight
+requests, and stops sending entirely while a 429/418 back-off is in effect
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from logs import get_logger
+from metrics import EXCHANGE_QUEUE_WAIT
+
+log = get_logger("rate_limit")
+
+# Lower value is served first
+PRIORITY_POSITION = 0   # prices for open positions (TP/SL/liquidation checks)
+PRIORITY_WATCHLIST = 1  # the bot's own symbols
+PRIORITY_ON_DEMAND = 2  # /token_data lookups for unwatched symbols
+PRIORITY_SCANNER = 3    # whole-market screening, only with budget to spare
+
+USED_WEIGHT_HEADERS = ("X-MBX-USED-WEIGHT-1M", "X-MBX-USED-WEIGHT")
+
+
+def request_weight(path, params=None):
+    """Binance spot request weights for the endpoints the bot calls"""
+    params = params or {}
+    if path == "/api/v3/ticker/24hr":
+        if "symbol" in params:
+            return 2
+        if "symbols" in params:
+            n = params["symbols"].count(",") + 1
+            return 2 if n <= 20 else 40 if n <= 100 else 80
+        return 80
+    if path == "/api/v3/ticker/price":
+        return 2 if "symbol" in params else 4
+    if path == "/api/v3/exchangeInfo":
+        return 20
+    return 2
+
+
+class RateLimitedError(Exception):
+    """The request could not be sent within its deadline because of the rate limit"""
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class RequestCancelledError(Exception):
+    """The shared request was cancelled while in flight, so it has no result for its waiters"""
+
+
+class WeightBudget:
+    """Token bucket over request weight; `scale` throttles the refill rate after a 429"""
+    def __init__(self, weight_per_minute):
+        self.capacity = float(weight_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.scale = 1.0
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate * self.scale)
+        self._last = now
+
+    def wait_time(self, weight):
+        self._refill()
+        missing = weight - self.tokens
+        return 0.0 if missing <= 0 else missing / (self.rate * self.scale)
+
+    def take(self, weight):
+        self._refill()
+        self.tokens -= weight
+
+    def sync(self, used_weight):
+        """The exchange counted `used_weight` this minute; never assume more headroom than it allows"""
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used_weight)
+
+
+@dataclass
+class _Request:
+    key: Tuple
+    weight: int
+    priority: int
+    call: Callable[[], Awaitable]
+    future: asyncio.Future
+    waiters: int = 1
+    dispatched: bool = False
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass(order=True)
+class _HeapEntry:
+    priority: int
+    seq: int
+    request: _Request = field(compare=False)
+
+
+class RequestScheduler:
+    """
+    submit() queues a request (or joins an identical one already queued or
+    in flight) and awaits its result. A single dispatcher task starts the
+    most urgent request as soon as both the weight budget and a concurrency
+    slot allow it. `weight_limit` is the exchange's per-minute limit and only
+    `safety` of it is spent, leaving headroom for other clients on the IP.
+    """
+    def __init__(self, weight_limit=6000, safety=0.8, concurrency=10):
+        self.weight_limit = weight_limit
+        self.budget = WeightBudget(weight_limit * safety)
+        self.concurrency = concurrency
+        self.paused_until = 0.0
+        self.used_weight = 0
+        self._heap: List[_HeapEntry] = []
+        self._pending: Dict[Tuple, _Request] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "coalesced": 0, "throttled": 0, "expired": 0, "failed": 0}
+
+    def _ensure_dispatcher(self):
+        # Started lazily so it binds to the loop that actually uses it
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+    async def submit(self, key, weight, priority, call: Callable[[], Awaitable], timeout: Optional[float] = None):
+        """Run `call` under the budget; raises RateLimitedError if it cannot start within `timeout`"""
+        self._ensure_dispatcher()
+        request = self._pending.get(key)
+        if request is not None:
+            self.stats["coalesced"] += 1
+            request.waiters += 1
+            if priority < request.priority and not request.dispatched:
+                # Re-queue at the more urgent priority; the old entry is skipped
+                request.priority = priority
+                heapq.heappush(self._heap, _HeapEntry(priority, next(self._seq), request))
+                self._wakeup.set()
+        else:
+            future = asyncio.get_running_loop().create_future()
+            request = self._pending[key] = _Request(key, weight, priority, call, future)
+            heapq.heappush(self._heap, _HeapEntry(priority, next(self._seq), request))
+            self._wakeup.set()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(request.future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(request)
+            raise RateLimitedError(self.retry_after)
+        except asyncio.CancelledError:
+            self._abandon(request)
+            task = asyncio.current_task()
+            if request.future.cancelled() and request.dispatched and not (task and task.cancelling()):
+                # The call was cancelled under us, not this waiter; fail it like any other error
+                raise RequestCancelledError(f"request {request.key[0]} was cancelled in flight") from None
+            raise
+
+    def _abandon(self, request: _Request):
+        request.waiters -= 1
+        if request.waiters == 0 and not request.dispatched:
+            # Nobody wants it anymore; don't spend weight on it
+            request.future.cancel()
+            self._pending.pop(request.key, None)
+            self.stats["expired"] += 1
+
+    @property
+    def queued(self):
+        """Distinct requests waiting for budget or still in flight"""
+        return len(self._pending)
+
+    @property
+    def retry_after(self):
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def observe(self, status, headers):
+        """Feed every exchange response's status and headers back into the budget"""
+        for name in USED_WEIGHT_HEADERS:
+            value = headers.get(name)
+            if value is not None:
+                try:
+                    self.used_weight = int(value)
+                    self.budget.sync(self.used_weight)
+                except ValueError:
+                    pass
+                break
+
+        if status in (418, 429):
+            self.stats["throttled"] += 1
+            # 418 is an IP ban; Retry-After says how long. Without one, assume the rest of the minute
+            try:
+                retry_after = float(headers.get("Retry-After", 0)) or (120.0 if status == 418 else 60.0)
+            except ValueError:
+                retry_after = 60.0
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.budget.tokens = 0.0
+            self.budget.scale = max(0.25, self.budget.scale / 2)
+            log.warning("exchange throttled", status=status, pause_seconds=retry_after,
+                        refill_scale=self.budget.scale)
+        elif 200 <= status < 300 and self.budget.scale < 1.0:
+            # Additive recovery after a multiplicative cut
+            self.budget.scale = min(1.0, self.budget.scale + 0.01)
+
+    def _drop_stale(self):
+        while self._heap and (self._heap[0].request.dispatched or self._heap[0].request.future.done()):
+            heapq.heappop(self._heap)
+
+    async def _dispatch(self):
+        while True:
+            self._drop_stale()
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            pause = self.retry_after
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            wait = self.budget.wait_time(self._heap[0].request.weight)
+            if wait > 0:
+                # Sleep for the refill, but wake early if something more urgent arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._slots.acquire()
+            # The head, the budget or the pause may have changed while waiting for a slot
+            self._drop_stale()
+            if not self._heap or self.retry_after > 0 or self.budget.wait_time(self._heap[0].request.weight) > 0:
+                self._slots.release()
+                continue
+            request = heapq.heappop(self._heap).request
+            request.dispatched = True
+            EXCHANGE_QUEUE_WAIT.labels(request.priority).observe(time.monotonic() - request.queued_at)
+            self.budget.take(request.weight)
+            asyncio.ensure_future(self._run(request))
+
+    async def _run(self, request: _Request):
+        try:
+            self.stats["sent"] += 1
+            result = await request.call()
+            if not request.future.done():
+                request.future.set_result(result)
+        except Exception as e:
+            self.stats["failed"] += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+                # Retrieved by waiters; avoid "exception never retrieved" when all timed out
+                request.future.exception()
+        finally:
+            # Cancelled (or any other BaseException): waiters must not hang until their own timeout
+            if not request.future.done():
+                self.stats["failed"] += 1
+                request.future.cancel()
+            if self._pending.get(request.key) is request:
+                del self._pending[request.key]
+            self._slots.release()
+
+    def status(self):
+        return {
+            "weight_limit": self.weight_limit,
+            "used_weight": self.used_weight,
+            "budget_tokens": round(self.budget.tokens, 1),
+            "refill_scale": self.budget.scale,
+            "paused_for": round(self.retry_after, 1),
+            "queued": self.queued,
+            **self.stats,
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
@@ -0,0 +1,93 @@
+"""
+Feed Recorder
+Append-only JSON-lines capture of everything that moves the engine: stream
+messages (as received), REST backfills and poll results, on-demand token
+fetches, applied webhook signals and new accounts, each stamped with its
+wall-clock time, plus the engine state at the start and end. replay.py feeds
+a recording back through the same code on a virtual clock. A background
+thread serializes and writes, so the hot path only enqueues
+"""
+import gzip
+import json
+import queue
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("recorder")
+
+_STOP = object()
+
+
+def _open(path, mode):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+class FeedRecorder:
+    """
+    record(kind, data) enqueues a JSON-serializable event; record_json() takes
+    text that is already JSON (a raw stream message) and writes it verbatim.
+    Lines are {"t": epoch seconds, "k": kind, "d": data}. A path ending in
+    .gz is gzip-compressed.
+    """
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self.events = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name="feed-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, kind, data):
+        self.events += 1
+        self._queue.put((time.time(), kind, data, False))
+
+    def record_json(self, kind, text):
+        self.events += 1
+        self._queue.put((time.time(), kind, text, True))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _writer(self):
+        with _open(self.path, "a") as f:
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if item is not None:
+                    ts, kind, data, raw = item
+                    try:
+                        body = data if raw else json.dumps(data, separators=(",", ":"), default=str)
+                        f.write(f'{{"t":{ts:.6f},"k":"{kind}","d":{body}}}\n')
+                    except Exception as e:
+                        record_error("recorder", e)
+                        log.error("recording event failed", kind=kind, error=repr(e))
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    f.flush()
+                    last_flush = time.monotonic()
+        log.info("recording closed", path=self.path, events=self.events)
+
+
+def read_recording(path) -> Iterator[Tuple[float, str, object]]:
+    """(timestamp, kind, data) for every event in a recording, in order; a torn last line is skipped"""
+    with _open(path, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            yield event["t"], event["k"], event["d"]
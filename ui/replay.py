@@ -0,0 +1,462 @@
+"""
+Replay Simulator
+Drives a fresh HyperTradingBot through the live engine code, on a virtual
+clock, from a recording made with BOT_RECORD_PATH or from stored candles plus
+a file of webhook alerts. Stream messages go through the feed's
+handle_message (so on_market_update, indicators and TP/SL/liquidation
+triggers run unchanged), recorded REST results through the same apply_*
+methods the live fetches use, and signals through handle_signal ->
+process_signal. Runs as fast as the CPU allows or at a fixed multiple of real
+time, and checks the simulated trades against the live run's final state
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+import clock
+from backtest import CANDLES_PER_DAY, Candles, load_directory, load_klines, load_store
+from bot import (DEFAULT_ACCOUNT, AsyncMarketDataFetcher, HyperTradingBot, TradingAccount, load_account_specs,
+                 normalize_symbols)
+from exchanges import ExchangeAdapter, ExchangeRouter, Quote
+from market_stream import INTERVAL_MS, BinanceStreamFeed
+from position_engine import ClosedTrade
+from rate_limit import PRIORITY_WATCHLIST
+from recorder import read_recording
+from signal_queue import QueuedSignal
+from strategy import STRATEGY_CONFIG
+
+console = Console()
+
+# (epoch seconds, kind, data), as stored in a recording
+Event = Tuple[float, str, object]
+
+
+class ReplayFeed(BinanceStreamFeed):
+    """The live feed's message handling without a socket; backfills arrive as recorded events instead"""
+    async def backfill(self, symbols):
+        pass
+
+
+class ReplayAdapter(ExchangeAdapter):
+    """
+    Answers the engine's own REST fetches (on-demand rows for unwatched
+    symbols) from the replayed market: the latest recorded fetch of a
+    symbol, else the stream feed's state for it
+    """
+    name = "replay"
+
+    def __init__(self):
+        super().__init__("replay://")
+        self.feed: Optional[BinanceStreamFeed] = None
+        self.fetched: Dict[str, list] = {}  # symbol -> [ticker, klines]
+
+    def remember(self, raw):
+        for symbol, (t_res, k_res) in raw.items():
+            entry = self.fetched.setdefault(symbol, [None, None])
+            if t_res is not None:
+                entry[0] = t_res
+            if k_res is not None:
+                entry[1] = k_res
+
+    def _state(self, symbol):
+        state = self.feed.states.get(symbol) if self.feed is not None else None
+        return state if state is not None and state.ready else None
+
+    async def tickers(self, symbols, priority=PRIORITY_WATCHLIST):
+        quotes = {}
+        for symbol in symbols:
+            state = self._state(symbol)
+            t_res = self.fetched.get(symbol, (None, None))[0]
+            if state is not None:
+                quotes[symbol] = Quote(symbol, state.price, state.change, self.name)
+            elif isinstance(t_res, dict) and "lastPrice" in t_res:
+                quotes[symbol] = Quote(symbol, float(t_res["lastPrice"]), float(t_res["priceChangePercent"]),
+                                       self.name)
+        return quotes
+
+    async def klines(self, symbol, interval, limit, priority=PRIORITY_WATCHLIST):
+        k_res = self.fetched.get(symbol, (None, None))[1]
+        if k_res:
+            return k_res[-limit:]
+        state = self._state(symbol)
+        if state is None:
+            raise LookupError(f"nothing replayed for {symbol} yet")
+        interval_ms = INTERVAL_MS[interval]
+        closes = list(state.closes)[-limit:]
+        first_open = state.last_open_time - (len(closes) - 1) * interval_ms
+        return [[first_open + i * interval_ms, c, c, c, c, "0"] for i, c in enumerate(closes)]
+
+
+def _kline(symbol, interval, open_time, o, h, l, c, v, closed):
+    return {"stream": f"{symbol.lower()}@kline_{interval}", "data": {"e": "kline", "s": symbol, "k": {
+        "t": open_time, "i": interval, "o": o, "h": h, "l": l, "c": c, "v": v, "x": closed}}}
+
+
+def candle_events(data: Dict[str, Candles], interval="1m") -> Iterator[Event]:
+    """
+    Stream messages synthesized from stored candles, in time order. Each
+    candle becomes its open, the extreme nearer the open, the other extreme
+    and the closing kline (x=True), then a miniTicker whose open is the close
+    a day earlier, like the live 24h window
+    """
+    interval_ms = INTERVAL_MS[interval]
+    quarter = interval_ms // 4
+
+    def symbol_events(c: Candles):
+        day_ago = c.close[np.maximum(np.arange(len(c)) - CANDLES_PER_DAY, 0)]
+        symbol = c.symbol
+        for i in range(len(c)):
+            t = int(c.open_time[i])
+            o, h, l, close, v = (float(c.open[i]), float(c.high[i]), float(c.low[i]),
+                                 float(c.close[i]), float(c.volume[i]))
+            # A bullish bar most likely dipped first, a bearish one rallied first
+            path = (o, l, h) if close >= o else (o, h, l)
+            high = low = o
+            for j, price in enumerate(path):
+                high, low = max(high, price), min(low, price)
+                yield (t + j * quarter) / 1000, "msg", _kline(symbol, interval, t, o, high, low, price, 0.0, False)
+            end = (t + interval_ms - 1) / 1000
+            yield end, "msg", _kline(symbol, interval, t, o, h, l, close, v, True)
+            yield end, "msg", {"stream": f"{symbol.lower()}@miniTicker", "data": {
+                "e": "24hrMiniTicker", "s": symbol, "c": close, "o": float(day_ago[i])}}
+
+    return heapq.merge(*(symbol_events(c) for c in data.values()), key=lambda e: e[0])
+
+
+def _parse_time(value):
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_alerts(path) -> List[Event]:
+    """
+    Webhook alerts as signal events, sorted by time. The file holds a JSON
+    list or one JSON object per line, each a webhook payload plus its "time"
+    (epoch seconds or milliseconds, or ISO 8601)
+    """
+    with open(path) as f:
+        text = f.read()
+    payloads = json.loads(text) if text.lstrip().startswith("[") else [
+        json.loads(line) for line in text.splitlines() if line.strip()]
+    events = []
+    for i, p in enumerate(payloads):
+        ts = _parse_time(p["time"])
+        events.append((ts, "signal", {
+            "symbol": p["symbol"].upper(), "side": p["side"].upper(), "account": p.get("account"),
+            "key": str(p.get("id", i)), "received_at": datetime.fromtimestamp(ts).isoformat(),
+        }))
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def build_bot(specs=None, state=None) -> HyperTradingBot:
+    """A bot hosting `specs`, or the accounts of a to_state() snapshot"""
+    if state is not None:
+        specs = [entry['spec'] for entry in state.get('accounts', [])]
+    primary = next((s for s in specs if s['id'] == DEFAULT_ACCOUNT), specs[0])
+    bot = HyperTradingBot(symbols=primary['symbols'], initial_balance=primary['balance'],
+                          strategy=primary['strategy'], account_id=primary['id'])
+    if primary.get('config'):
+        bot.primary.config[bot.primary.strategy].update(primary['config'])
+    if state is not None:
+        bot.restore(state, [])
+    else:
+        for spec in specs:
+            if spec is not primary:
+                bot.add_account(TradingAccount.from_spec(spec))
+    return bot
+
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    signals: int = 0
+    first: Optional[float] = None
+    last: Optional[float] = None
+    wall_seconds: float = 0.0
+
+    @property
+    def virtual_seconds(self):
+        return (self.last - self.first) if self.first is not None else 0.0
+
+    @property
+    def speedup(self):
+        return self.virtual_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "events": self.events,
+            "signals": self.signals,
+            "start": datetime.fromtimestamp(self.first).isoformat() if self.first is not None else None,
+            "virtual_seconds": round(self.virtual_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "speedup": round(self.speedup, 1),
+        }
+
+
+class Replay:
+    """
+    Applies events to `bot` in order, each at its own timestamp on a
+    VirtualClock installed for the duration of run(). speed=0 runs as fast as
+    the CPU allows; otherwise virtual time runs `speed` times faster than
+    real time.
+    """
+    def __init__(self, bot: HyperTradingBot, speed=0.0, interval="1m", limit=14, yield_every=512):
+        self.bot = bot
+        self.speed = speed
+        self.yield_every = yield_every
+        self.adapter = ReplayAdapter()
+        # Nothing in a replay may reach a real exchange
+        bot.fetcher = AsyncMarketDataFetcher(interval=interval, limit=limit,
+                                             router=ExchangeRouter([self.adapter]))
+        self.feed = ReplayFeed(bot.symbols, bot.fetcher, interval=interval, limit=limit,
+                               on_update=bot.on_market_update)
+        bot.feed = self.adapter.feed = self.feed
+        self.signal_results: List[dict] = []
+        self.stats = ReplayStats()
+
+    async def apply(self, kind, data):
+        bot = self.bot
+        if kind == "msg":
+            self.feed.handle_message(data)
+        elif kind == "signal":
+            # Let the pending snapshot swap run first, as the event loop would live
+            await asyncio.sleep(0)
+            signal = QueuedSignal(symbol=data["symbol"], side=data["side"], key=data.get("key", ""),
+                                  account=data.get("account"))
+            if data.get("received_at"):
+                signal.received_at = datetime.fromisoformat(data["received_at"])
+            self.signal_results.append(await bot.handle_signal(signal))
+            self.stats.signals += 1
+        elif kind in ("backfill", "poll"):
+            raw = {symbol: tuple(pair) for symbol, pair in data.items()}
+            self.adapter.remember(raw)
+            if kind == "backfill":
+                self.feed.apply_backfill(raw)
+            else:
+                bot.apply_market_data(raw)
+        elif kind == "token":
+            self.adapter.remember({data["symbol"]: (data["ticker"], data["klines"])})
+            row = bot.apply_token_data(data["symbol"], data["ticker"], data["klines"])
+            if row is not None:
+                bot.token_cache.put(data["symbol"], row)
+        elif kind == "account":
+            if data["id"] not in bot.accounts:
+                bot.add_account(TradingAccount.from_spec(data))
+
+    async def run(self, events: Iterable[Event]):
+        stats = self.stats
+        virtual = None
+        previous = None
+        started = time.perf_counter()
+        try:
+            for ts, kind, data in events:
+                if virtual is None:
+                    virtual = clock.VirtualClock(ts)
+                    previous = clock.install(virtual)
+                    stats.first = ts
+                virtual.advance_to(ts)
+                stats.last = ts
+                stats.events += 1
+                if self.speed > 0:
+                    ahead = (ts - stats.first) / self.speed - (time.perf_counter() - started)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+                elif stats.events % self.yield_every == 0:
+                    await asyncio.sleep(0)
+                await self.apply(kind, data)
+            await asyncio.sleep(0)
+        finally:
+            self.bot._flush_pending()
+            if previous is not None:
+                clock.install(previous)
+            stats.wall_seconds = time.perf_counter() - started
+        return self.result()
+
+    def result(self):
+        accounts = {}
+        for account in self.bot.accounts.values():
+            with account.lock:
+                accounts[account.id] = account.to_state()
+        return {"stats": self.stats.to_dict(), "state": {"accounts": list(accounts.values())}}
+
+
+def read_session(path) -> Tuple[dict, Iterator[Event], List[Optional[dict]]]:
+    """
+    The start event's data, the events after it, and a one-slot list that
+    holds the end event's data once those events are exhausted (None if the
+    recording was cut short)
+    """
+    events = read_recording(path)
+    for ts, kind, data in events:
+        if kind == "start":
+            break
+    else:
+        raise ValueError(f"{path} has no start event; was it made with BOT_RECORD_PATH?")
+    end: List[Optional[dict]] = [None]
+
+    def body():
+        for event in events:
+            if event[1] == "end":
+                end[0] = event[2]
+                return
+            if event[1] == "start":
+                return  # The engine restarted; a new session begins here
+            yield event
+
+    return data, body(), end
+
+
+def _trades(state, since: datetime) -> Dict[str, List[ClosedTrade]]:
+    """Closed trades per account that exited at or after `since`"""
+    out = {}
+    for entry in state.get("accounts", []):
+        trades = [ClosedTrade.from_dict(t) for t in entry.get("history", [])]
+        out[entry["spec"]["id"]] = [t for t in trades if t.exit_time >= since]
+    return out
+
+
+def _close(a, b, tolerance):
+    return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+
+def compare(live_state, sim_state, since: datetime, time_tolerance=1.0, tolerance=1e-6):
+    """
+    Match live and simulated trades per account by symbol, side and entry
+    time (within `time_tolerance` seconds), then check prices, exit reason,
+    PnL and final balances agree within `tolerance` (relative)
+    """
+    live, sim = _trades(live_state, since), _trades(sim_state, since)
+    balances = {
+        name: {e["spec"]["id"]: e["balance"] for e in state.get("accounts", [])}
+        for name, state in (("live", live_state), ("sim", sim_state))
+    }
+    report = {}
+    for account in sorted(set(live) | set(sim)):
+        pending: Dict[tuple, List[ClosedTrade]] = {}
+        for t in sim.get(account, []):
+            pending.setdefault((t.symbol, t.side), []).append(t)
+        matched = differing = 0
+        unmatched_live = []
+        for t in live.get(account, []):
+            candidates = pending.get((t.symbol, t.side), [])
+            hit = next((s for s in candidates
+                        if abs((s.entry_time - t.entry_time).total_seconds()) <= time_tolerance), None)
+            if hit is None:
+                unmatched_live.append(t)
+                continue
+            candidates.remove(hit)
+            matched += 1
+            if not (_close(hit.entry_price, t.entry_price, tolerance) and _close(hit.exit_price, t.exit_price, tolerance)
+                    and hit.reason == t.reason and _close(hit.pnl, t.pnl, tolerance)):
+                differing += 1
+        live_balance = balances["live"].get(account)
+        sim_balance = balances["sim"].get(account)
+        report[account] = {
+            "live_trades": len(live.get(account, [])),
+            "sim_trades": len(sim.get(account, [])),
+            "matched": matched,
+            "differing": differing,
+            "live_only": len(unmatched_live),
+            "sim_only": sum(len(v) for v in pending.values()),
+            "live_pnl": sum(t.pnl for t in live.get(account, [])),
+            "sim_pnl": sum(t.pnl for t in sim.get(account, [])),
+            "live_balance": live_balance,
+            "sim_balance": sim_balance,
+        }
+        r = report[account]
+        r["match"] = (r["differing"] == r["live_only"] == r["sim_only"] == 0 and live_balance is not None
+                      and sim_balance is not None and _close(live_balance, sim_balance, tolerance))
+    return report
+
+
+def print_result(result, since: datetime, report=None):
+    stats = result["stats"]
+    console.print(f"Replayed {stats['events']} events ({stats['signals']} signals) covering "
+                  f"{stats['virtual_seconds']:.0f}s in {stats['wall_seconds']:.2f}s ({stats['speedup']:.0f}x)")
+    table = Table(title="Replay" + (" vs live" if report else ""))
+    columns = ["Account", "Trades", "PnL", "Balance"]
+    if report:
+        columns += ["Live trades", "Matched", "Differing", "Live PnL", "Live balance", "Match"]
+    for col in columns:
+        table.add_column(col, justify="right")
+    sim = _trades(result["state"], since)
+    for entry in result["state"]["accounts"]:
+        account = entry["spec"]["id"]
+        row = [account, str(len(sim[account])), f"{sum(t.pnl for t in sim[account]):.2f}", f"{entry['balance']:.2f}"]
+        if report:
+            r = report.get(account, {})
+            live_balance = r.get("live_balance")
+            row += [str(r.get("live_trades", 0)), str(r.get("matched", 0)), str(r.get("differing", 0)),
+                    f"{r.get('live_pnl', 0.0):.2f}", "-" if live_balance is None else f"{live_balance:.2f}",
+                    "yes" if r.get("match") else "NO"]
+        table.add_row(*row)
+    console.print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded or stored market data through the live engine")
+    parser.add_argument("source", help="Recording made with BOT_RECORD_PATH (.jsonl or .jsonl.gz), "
+                                       "or kline files / a candle store with --candles / --store")
+    parser.add_argument("--candles", action="store_true", help="source is a kline CSV/Parquet file or directory")
+    parser.add_argument("--store", action="store_true", help="source is the bot's candle store directory")
+    parser.add_argument("--alerts", help="Webhook alerts to replay over candles: JSON list or JSON lines with a time")
+    parser.add_argument("--symbols", help="Comma separated symbols for the primary account (candle sources)")
+    parser.add_argument("--strategy", default="scalping", choices=sorted(STRATEGY_CONFIG))
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--accounts", default="", help="Extra accounts, as BOT_ACCOUNTS (candle sources)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Multiple of real time; 0 runs as fast as possible")
+    parser.add_argument("--json", help="Write the simulated state, stats and comparison here")
+    parser.add_argument("--verbose", action="store_true", help="Keep the engine's info logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("trading").setLevel(logging.WARNING)
+
+    end = [None]
+    if args.candles or args.store:
+        symbols = normalize_symbols(args.symbols) if args.symbols else None
+        if args.store:
+            from candle_store import CandleStore
+            data = load_store(CandleStore(args.source), symbols)
+        elif args.source.endswith((".csv", ".parquet")):
+            candles = load_klines(args.source)
+            data = {candles.symbol: candles}
+        else:
+            data = load_directory(args.source, symbols)
+        if not data:
+            raise SystemExit(f"No candles found in {args.source}")
+        specs = [{"id": DEFAULT_ACCOUNT, "symbols": symbols or list(data), "strategy": args.strategy,
+                  "balance": args.balance}] + load_account_specs(args.accounts)
+        bot = build_bot(specs)
+        events = candle_events(data)
+        if args.alerts:
+            events = heapq.merge(events, load_alerts(args.alerts), key=lambda e: e[0])
+        replay = Replay(bot, args.speed)
+    else:
+        start, events, end = read_session(args.source)
+        bot = build_bot(state=start["state"])
+        replay = Replay(bot, args.speed, start.get("interval", "1m"), start.get("limit", 14))
+
+    result = asyncio.run(replay.run(events))
+    since = datetime.fromtimestamp(replay.stats.first) if replay.stats.first is not None else datetime.min
+    report = compare(end[0]["state"], result["state"], since) if end[0] else None
+    if end[0] is None and not (args.candles or args.store):
+        console.print("[yellow]Recording has no end state (engine stopped uncleanly); nothing to compare[/yellow]")
+    print_result(result, since, report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**result, "comparison": report}, f, indent=2, default=str)
+        console.print(f"Saved {args.json}")
@@ -0,0 +1,369 @@
+"""
+Portfolio Risk Engine
+Keeps every open position across all accounts in flat NumPy columns so
+exposure, margin usage, per-symbol netting, correlation-aware VaR and
+liquidation distances are a few bincounts and one quadratic form, however
+many positions are open. Also the pre-trade check that rejects signals
+which would breach the configured limits
+"""
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import clock
+from metrics import Counter, InstrumentedLock
+
+# Limits per account; 0 disables a limit
+# Initial margin of all positions over account equity
+RISK_MAX_MARGIN_USAGE = float(os.environ.get("RISK_MAX_MARGIN_USAGE", 0.9))
+# Net notional on any one symbol, as a multiple of account equity
+RISK_MAX_SYMBOL_LEVERAGE = float(os.environ.get("RISK_MAX_SYMBOL_LEVERAGE", 5))
+# Value at risk as a share of account equity
+RISK_MAX_VAR_PCT = float(os.environ.get("RISK_MAX_VAR_PCT", 1.0))
+
+# VaR: one price sample per symbol every RISK_SAMPLE_SECONDS, RISK_VAR_WINDOW samples kept
+RISK_SAMPLE_SECONDS = float(os.environ.get("RISK_SAMPLE_SECONDS", 60))
+RISK_VAR_WINDOW = int(os.environ.get("RISK_VAR_WINDOW", 240))
+RISK_VAR_HORIZON = int(os.environ.get("RISK_VAR_HORIZON", 60))  # in samples
+RISK_VAR_Z = 2.326  # one-sided 99%
+# Per-sample volatility assumed (fully correlated) until a symbol has enough history
+RISK_DEFAULT_VOL = float(os.environ.get("RISK_DEFAULT_VOL", 0.003))
+MIN_VAR_SAMPLES = 20
+
+RISK_REJECTIONS = Counter("bot_risk_rejections", "Signals rejected by the pre-trade risk check", ["account", "limit"])
+
+
+@dataclass
+class RiskLimits:
+    max_margin_usage: float = RISK_MAX_MARGIN_USAGE
+    max_symbol_leverage: float = RISK_MAX_SYMBOL_LEVERAGE
+    max_var_pct: float = RISK_MAX_VAR_PCT
+
+
+class PriceHistory:
+    """
+    Fixed-interval price samples for every symbol in one (symbols, window)
+    ring. The covariance is rebuilt only when a new sample lands.
+    """
+    def __init__(self, window=RISK_VAR_WINDOW, sample_seconds=RISK_SAMPLE_SECONDS, default_vol=RISK_DEFAULT_VOL):
+        self.window = window
+        self.sample_seconds = sample_seconds
+        self.default_vol = default_vol
+        self.samples = np.full((0, window), np.nan)
+        self.count = 0
+        self.head = 0
+        self._period = None
+        self._cov: Optional[np.ndarray] = None
+
+    def grow(self, n_symbols):
+        if n_symbols > len(self.samples):
+            extra = np.full((n_symbols - len(self.samples), self.window), np.nan)
+            self.samples = np.vstack([self.samples, extra])
+            self._cov = None
+
+    def maybe_sample(self, prices, now=None):
+        period = int((clock.timestamp() if now is None else now) // self.sample_seconds)
+        if period == self._period:
+            return
+        self._period = period
+        self.samples[:, self.head] = np.where(prices > 0, prices, np.nan)
+        self.head = (self.head + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        self._cov = None
+
+    def covariance(self):
+        """Per-sample return covariance; symbols without MIN_VAR_SAMPLES returns get the default vol at correlation 1"""
+        if self._cov is not None and len(self._cov) == len(self.samples):
+            return self._cov
+        n = len(self.samples)
+        ordered = np.roll(self.samples, -self.head, axis=1)[:, self.window - self.count:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(ordered), axis=1)
+        valid = np.isfinite(returns)
+        mature = valid.sum(axis=1) >= MIN_VAR_SAMPLES
+
+        vol = np.full(n, self.default_vol)
+        corr = np.ones((n, n))
+        if mature.any():
+            r = returns[mature]
+            # Only periods where every mature symbol has a return
+            r = r[:, valid[mature].all(axis=0)]
+            if r.shape[1] >= MIN_VAR_SAMPLES:
+                vol[mature] = r.std(axis=1, ddof=1)
+                c = np.atleast_2d(np.corrcoef(r))
+                idx = np.flatnonzero(mature)
+                corr[np.ix_(idx, idx)] = np.nan_to_num(c, nan=1.0)
+        self._cov = np.outer(vol, vol) * corr
+        return self._cov
+
+
+class RiskBook:
+    """
+    Engine-wide position columns. Slots are reused through a free list and
+    the arrays double when full; a position's slot is found through its
+    id(). Aggregates are recomputed from the columns at the latest prices
+    whenever they are read, which costs O(positions) vectorized work, so
+    price updates themselves only write one array element.
+    """
+    def __init__(self, leverage, maintenance_buffer, limits: RiskLimits = None, capacity=256,
+                 history: PriceHistory = None):
+        self.leverage = leverage
+        self.maintenance_buffer = maintenance_buffer
+        self.limits = limits or RiskLimits()
+        self.history = history or PriceHistory()
+        self.lock = InstrumentedLock("risk")
+
+        self.accounts: List = []
+        self.account_index: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.symbol_index: Dict[str, int] = {}
+        self.prices = np.zeros(0)
+
+        self.acct = np.zeros(capacity, dtype=np.int64)
+        self.sym = np.zeros(capacity, dtype=np.int64)
+        self.sign = np.zeros(capacity)  # +1 LONG, -1 SHORT, 0 free slot
+        self.qty = np.zeros(capacity)
+        self.entry = np.zeros(capacity)
+        self.liq = np.zeros(capacity)
+        self._slots: Dict[int, int] = {}
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+
+    # --- registration ---------------------------------------------------------
+
+    def _symbol(self, symbol):
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            i = self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.prices = np.append(self.prices, 0.0)
+            self.history.grow(len(self.symbols))
+        return i
+
+    def add_account(self, account):
+        with self.lock:
+            if account.id not in self.account_index:
+                self.account_index[account.id] = len(self.accounts)
+                self.accounts.append(account)
+        for position in list(account.positions.values()):
+            self.add(account, position)
+
+    def _grow(self):
+        old = len(self.sign)
+        for name in ("acct", "sym", "sign", "qty", "entry", "liq"):
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros(old, dtype=column.dtype)]))
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def add(self, account, position):
+        with self.lock:
+            if id(position) in self._slots:
+                return
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            self._slots[id(position)] = slot
+            self.acct[slot] = self.account_index[account.id]
+            self.sym[slot] = self._symbol(position.symbol)
+            self.sign[slot] = 1.0 if position.side == 'LONG' else -1.0
+            self.qty[slot] = position.quantity
+            self.entry[slot] = position.entry_price
+            self.liq[slot] = position.liq_price
+            if self.prices[self.sym[slot]] <= 0:
+                self.prices[self.sym[slot]] = position.entry_price
+
+    def remove(self, position):
+        with self.lock:
+            slot = self._slots.pop(id(position), None)
+            if slot is not None:
+                self.sign[slot] = 0.0
+                self.qty[slot] = 0.0
+                self._free.append(slot)
+
+    def on_price(self, symbol, price):
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            with self.lock:
+                i = self._symbol(symbol)
+        self.prices[i] = price
+        self.history.maybe_sample(self.prices)
+
+    # --- vectorized views -----------------------------------------------------
+
+    def _columns(self):
+        """Per-slot notional, signed notional, unrealized PnL, initial margin and maintenance margin"""
+        price = self.prices[self.sym] if len(self.prices) else np.zeros(len(self.sym))
+        notional = self.qty * price
+        signed = self.sign * notional
+        upnl = self.sign * (price - self.entry) * self.qty
+        margin = self.qty * self.entry / self.leverage
+        maintenance = margin * (1 - self.maintenance_buffer)
+        return price, notional, signed, upnl, margin, maintenance
+
+    def _var(self, exposures):
+        """VaR over RISK_VAR_HORIZON samples for each row of an (n, symbols) signed-notional matrix"""
+        cov = self.history.covariance()
+        variance = ((exposures @ cov) * exposures).sum(axis=1)
+        return RISK_VAR_Z * np.sqrt(np.maximum(variance, 0.0) * RISK_VAR_HORIZON)
+
+    def snapshot(self):
+        """Every account's exposure, margin, netting, VaR and liquidation distances, plus portfolio totals"""
+        with self.lock:
+            n_acct, n_sym = len(self.accounts), len(self.symbols)
+            price, notional, signed, upnl, margin, maintenance = self._columns()
+            live = self.sign != 0
+            acct, sym = self.acct, self.sym
+
+            balance = np.array([a.balance for a in self.accounts], dtype=np.float64)
+            equity = balance + np.bincount(acct, upnl, n_acct)
+            gross = np.bincount(acct, notional, n_acct)
+            net = np.bincount(acct, signed, n_acct)
+            margin_used = np.bincount(acct, margin, n_acct)
+            maint_used = np.bincount(acct, maintenance, n_acct)
+            counts = np.bincount(acct[live], minlength=n_acct)
+            # Live slots only: a free slot may point at a symbol index that doesn't exist yet
+            netting = np.bincount(acct[live] * n_sym + sym[live], signed[live],
+                                  n_acct * n_sym).reshape(n_acct, n_sym)
+            var = self._var(netting)
+            portfolio_var = self._var(netting.sum(axis=0, keepdims=True))[0]
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # Isolated: how far price may move against the position before its own liq price
+                isolated = np.where(live, self.sign * (price - self.liq) / price, np.inf)
+                # Cross: the adverse move on this symbol alone that would eat the account's free equity
+                free = equity[acct] - maint_used[acct]
+                cross = np.where(live, free / notional, np.inf)
+            min_isolated = np.full(n_acct, np.inf)
+            min_cross = np.full(n_acct, np.inf)
+            np.minimum.at(min_isolated, acct[live], isolated[live])
+            np.minimum.at(min_cross, acct[live], cross[live])
+            symbols = self.symbols
+            ids = [a.id for a in self.accounts]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            positive = equity > 0
+            margin_usage = np.where(positive, margin_used / equity, np.nan)
+            var_pct = np.where(positive, var / equity, np.nan)
+
+        def pct(values):
+            return [round(v * 100, 3) if np.isfinite(v) else None for v in values.tolist()]
+
+        def ratio(values):
+            return [v if np.isfinite(v) else None for v in values.tolist()]
+
+        # Non-zero netting entries for all accounts in one pass
+        net_by_symbol = [{} for _ in ids]
+        rows, cols = np.nonzero(netting)
+        for a, s, value in zip(rows.tolist(), cols.tolist(), netting[rows, cols].tolist()):
+            net_by_symbol[a][symbols[s]] = value
+
+        columns = zip(ids, equity.tolist(), gross.tolist(), net.tolist(), margin_used.tolist(), ratio(margin_usage),
+                      (equity - balance).tolist(), var.tolist(), ratio(var_pct), pct(min_isolated), pct(min_cross),
+                      counts.tolist(), net_by_symbol)
+        accounts = {
+            account_id: {
+                "equity": eq,
+                "gross_exposure": g,
+                "net_exposure": n,
+                "margin_used": m,
+                "margin_usage": mu,
+                "unrealized_pnl": u,
+                "var": v,
+                "var_pct": vp,
+                "min_liq_distance_pct": liq,
+                "min_cross_liq_distance_pct": cross_liq,
+                "positions": c,
+                "net_by_symbol": nets,
+            }
+            for account_id, eq, g, n, m, mu, u, v, vp, liq, cross_liq, c, nets in columns
+        }
+        total_net = netting.sum(axis=0)
+        return {
+            "accounts": accounts,
+            "portfolio": {
+                "equity": float(equity.sum()),
+                "gross_exposure": float(gross.sum()),
+                "net_exposure": float(net.sum()),
+                "margin_used": float(margin_used.sum()),
+                "var": float(portfolio_var),
+                "positions": int(counts.sum()),
+                "net_by_symbol": {symbols[s]: float(total_net[s]) for s in np.flatnonzero(total_net)},
+            },
+            "limits": asdict(self.limits),
+            "var_model": {
+                "confidence": 0.99,
+                "horizon_seconds": RISK_VAR_HORIZON * self.history.sample_seconds,
+                "samples": self.history.count,
+            },
+        }
+
+    def liquidation_distances(self, positions):
+        """{id(position): (isolated, cross)} adverse-move fractions for the given positions"""
+        with self.lock:
+            slots = [self._slots.get(id(p)) for p in positions]
+            known = [s for s in slots if s is not None]
+            if not known:
+                return {}
+            idx = np.array(known)
+            price, notional, _, upnl, _, maintenance = self._columns()
+            a = self.acct[idx[0]]
+            mine = (self.acct == a) & (self.sign != 0)
+            equity = self.accounts[a].balance + upnl[mine].sum()
+            free = equity - maintenance[mine].sum()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                isolated = self.sign[idx] * (price[idx] - self.liq[idx]) / price[idx]
+                cross = free / notional[idx]
+        out = {}
+        it = iter(zip(isolated.tolist(), cross.tolist()))
+        for p, slot in zip(positions, slots):
+            if slot is not None:
+                out[id(p)] = next(it)
+        return out
+
+    # --- pre-trade check ------------------------------------------------------
+
+    def check(self, account, symbol, side, quantity, price, replacing=None) -> Optional[str]:
+        """
+        Reason the new position would breach a limit, or None. `replacing` is
+        the account's current position on the symbol, which the new one
+        closes at `price` (its PnL moves into the balance, so equity is unchanged).
+        """
+        limits = self.limits
+        with self.lock:
+            a = self.account_index[account.id]
+            s = self._symbol(symbol)
+            if self.prices[s] <= 0:
+                self.prices[s] = price
+            mine = (self.acct == a) & (self.sign != 0)
+            replaced = self._slots.get(id(replacing)) if replacing is not None else None
+            if replaced is not None:
+                mine[replaced] = False
+            _, _, signed, upnl, margin, _ = self._columns()
+
+            equity = account.balance + upnl[mine].sum()
+            if replaced is not None:
+                equity += upnl[replaced]
+            sign = 1.0 if side == 'LONG' else -1.0
+            exposures = np.bincount(self.sym[mine], signed[mine], len(self.symbols))
+            exposures[s] += sign * quantity * price
+            margin_after = margin[mine].sum() + quantity * price / self.leverage
+            var_after = self._var(exposures[None, :])[0] if limits.max_var_pct else 0.0
+
+        if equity <= 0:
+            return self._reject(account, "equity", "account equity is exhausted")
+        if limits.max_margin_usage and margin_after / equity > limits.max_margin_usage:
+            return self._reject(account, "margin_usage",
+                                f"margin usage {margin_after / equity:.0%} > {limits.max_margin_usage:.0%}")
+        if limits.max_symbol_leverage and abs(exposures[s]) / equity > limits.max_symbol_leverage:
+            return self._reject(account, "symbol_leverage",
+                                f"{symbol} net exposure {abs(exposures[s]) / equity:.1f}x equity "
+                                f"> {limits.max_symbol_leverage:g}x")
+        if limits.max_var_pct and var_after / equity > limits.max_var_pct:
+            return self._reject(account, "var",
+                                f"VaR {var_after / equity:.0%} of equity > {limits.max_var_pct:.0%}")
+        return None
+
+    def _reject(self, account, limit, reason):
+        RISK_REJECTIONS.labels(account.id, limit).inc()
+        return reason
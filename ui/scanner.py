@@ -0,0 +1,241 @@
+"""
+Market Scanner
+Screens every trading USDT pair each cycle with the bot's RSI / momentum
+rules. Closes live in one (symbols, window) NumPy matrix that is seeded from
+klines once and then advanced from a single bulk 24hr ticker request, so a
+cycle costs one request and a handful of vectorized operations regardless of
+how many pairs are listed
+"""
+import asyncio
+import heapq
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import clock
+from logs import get_logger
+from metrics import Gauge, Histogram, record_error
+from rate_limit import PRIORITY_SCANNER
+
+log = get_logger("scanner")
+
+# Strategy whose thresholds the scanner applies; empty disables scanner mode
+SCANNER_STRATEGY = os.environ.get("SCANNER_STRATEGY", "")
+SCANNER_INTERVAL = float(os.environ.get("SCANNER_INTERVAL", 10))
+SCANNER_TOP_K = int(os.environ.get("SCANNER_TOP_K", 25))
+# Pairs trading less quote volume than this over 24h are skipped
+SCANNER_MIN_QUOTE_VOLUME = float(os.environ.get("SCANNER_MIN_QUOTE_VOLUME", 0))
+# How often the list of trading USDT pairs is re-read from exchangeInfo
+SCANNER_UNIVERSE_TTL = float(os.environ.get("SCANNER_UNIVERSE_TTL", 3600))
+
+SCAN_SECONDS = Histogram("bot_scanner_cycle_seconds", "Scanner compute time per cycle, excluding the fetch")
+SCAN_UNIVERSE = Gauge("bot_scanner_universe", "Pairs with enough history to be screened")
+
+
+def latest_rsi(closes, counts):
+    """
+    HyperTradingBot.calculate_rsi for the newest close of every row. Rows
+    shorter than the window are left-padded with their first close; those
+    zero deltas leave the gain/loss ratio unchanged.
+    """
+    deltas = np.diff(closes, axis=1)
+    gain = np.maximum(deltas, 0.0).sum(axis=1)
+    loss = np.maximum(-deltas, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.round(100 - (100 / (1 + gain / loss)), 2)
+    rsi = np.where(loss <= 0, 100.0, rsi)
+    return np.where(counts < 10, 50.0, rsi)
+
+
+def screen(closes, counts, change, conf):
+    """
+    Vectorized TradingAccount.signal_rule for the newest bar of every row.
+    Returns (signal, rsi, score): +1 BUY, -1 SELL, 0 HOLD, and a strength
+    that rewards both RSI extremity and 24h momentum in the signal's direction.
+    """
+    rsi = latest_rsi(closes, counts)
+    last = closes[:, -1]
+    avg = closes[:, -3:].mean(axis=1)
+    buy = (rsi <= conf["rsi_buy"]) | ((last > avg) & (change > 0.01))
+    sell = ~buy & ((rsi >= conf["rsi_sell"]) | ((last < avg) & (change < -0.01)))
+    signal = buy.astype(np.int8) - sell.astype(np.int8)
+    score = np.where(buy, (50 - rsi) + change, (rsi - 50) - change)
+    return signal, rsi, score
+
+
+class MarketScanner:
+    """
+    run() refreshes the universe from exchangeInfo, seeds new pairs from
+    klines (at PRIORITY_SCANNER, so it never delays the bot's own fetches),
+    then every `interval` seconds folds the bulk ticker into the closes
+    matrix: the newest column tracks the forming candle and the matrix rolls
+    left when a new candle opens, like the kline stream.
+    """
+    def __init__(self, fetcher, conf, strategy, interval=SCANNER_INTERVAL, top_k=SCANNER_TOP_K,
+                 min_quote_volume=SCANNER_MIN_QUOTE_VOLUME, universe_ttl=SCANNER_UNIVERSE_TTL):
+        self.fetcher = fetcher
+        self.conf = conf
+        self.strategy = strategy
+        self.interval = interval
+        self.top_k = top_k
+        self.min_quote_volume = min_quote_volume
+        self.universe_ttl = universe_ttl
+        self.window = fetcher.limit
+        self.interval_ms = {"1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000,
+                            "1h": 3_600_000}[fetcher.interval]
+
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.closes = np.zeros((0, self.window))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.open_times = np.zeros(0, dtype=np.int64)
+        self._universe_at = 0.0
+
+        self.result: Optional[dict] = None
+        self.cycles = 0
+        # Called after every completed scan
+        self.listeners: List[Callable[[], None]] = []
+
+    def set_universe(self, symbols):
+        """Resize the matrix to `symbols`, keeping the history of pairs that remain"""
+        symbols = sorted(set(symbols))
+        closes = np.zeros((len(symbols), self.window))
+        counts = np.zeros(len(symbols), dtype=np.int64)
+        open_times = np.zeros(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            j = self.index.get(symbol)
+            if j is not None:
+                closes[i], counts[i], open_times[i] = self.closes[j], self.counts[j], self.open_times[j]
+        self.symbols, self.closes, self.counts, self.open_times = symbols, closes, counts, open_times
+        self.index = {s: i for i, s in enumerate(symbols)}
+
+    async def refresh_universe(self):
+        info = await self.fetcher.get_json("/api/v3/exchangeInfo", {}, PRIORITY_SCANNER)
+        symbols = [
+            s["symbol"] for s in info.get("symbols", [])
+            if s.get("quoteAsset") == "USDT" and s.get("status") == "TRADING"
+        ]
+        if symbols:
+            self.set_universe(symbols)
+            self._universe_at = time.monotonic()
+            log.info("scanner universe loaded", pairs=len(symbols))
+
+    def seed(self, symbol, klines):
+        i = self.index.get(symbol)
+        if i is None or not isinstance(klines, list) or not klines:
+            return
+        closes = [float(k[4]) for k in klines[-self.window:]]
+        row = self.closes[i]
+        row[:] = closes[0]
+        row[self.window - len(closes):] = closes
+        self.counts[i] = len(closes)
+        self.open_times[i] = int(klines[-1][0])
+
+    async def seed_missing(self):
+        """Klines for every pair that has none yet; the scheduler paces these behind the bot's own requests"""
+        missing = [s for s, n in zip(self.symbols, self.counts) if n == 0]
+        if not missing:
+            return
+        results = await asyncio.gather(
+            *(self.fetcher.get_json("/api/v3/klines",
+                                    {"symbol": s, "interval": self.fetcher.interval, "limit": self.window},
+                                    PRIORITY_SCANNER) for s in missing),
+            return_exceptions=True,
+        )
+        for symbol, klines in zip(missing, results):
+            if not isinstance(klines, BaseException):
+                self.seed(symbol, klines)
+
+    def apply_tickers(self, tickers, now_ms=None):
+        """
+        Fold one bulk ticker response into the matrix and return the rows it
+        covered with their 24h change%
+        """
+        n = len(self.symbols)
+        prices = np.full(n, np.nan)
+        change = np.zeros(n)
+        volume = np.zeros(n)
+        index = self.index
+        for t in tickers:
+            i = index.get(t.get("symbol"))
+            if i is not None:
+                prices[i] = float(t["lastPrice"])
+                change[i] = float(t["priceChangePercent"])
+                volume[i] = float(t.get("quoteVolume", 0) or 0)
+
+        now_ms = int(clock.timestamp() * 1000) if now_ms is None else now_ms
+        open_time = now_ms // self.interval_ms * self.interval_ms
+        live = ~np.isnan(prices) & (self.counts > 0)
+        # New candles opened since the last update: shift the window left by
+        # one column per elapsed interval, carrying the last close forward
+        # through candles no ticker was seen for
+        rolled = live & (open_time > self.open_times)
+        if rolled.any():
+            steps = np.minimum((open_time - self.open_times[rolled]) // self.interval_ms, self.window)
+            cols = np.minimum(np.arange(self.window) + steps[:, None], self.window - 1)
+            self.closes[rolled] = np.take_along_axis(self.closes[rolled], cols, axis=1)
+            self.counts[rolled] = np.minimum(self.counts[rolled] + steps, self.window)
+            self.open_times[rolled] = open_time
+        self.closes[live, -1] = prices[live]
+        return live & (volume >= self.min_quote_volume), change
+
+    def rank(self, mask, change):
+        """Top-K BUY and SELL candidates among the rows in `mask`"""
+        signal, rsi, score = screen(self.closes, self.counts, change, self.conf)
+        out = {}
+        for name, side in (("buy", 1), ("sell", -1)):
+            rows = np.flatnonzero(mask & (signal == side))
+            best = heapq.nlargest(self.top_k, rows, key=score.__getitem__)
+            out[name] = [
+                {
+                    "symbol": self.symbols[i],
+                    "price": float(self.closes[i, -1]),
+                    "change": float(change[i]),
+                    "rsi": float(rsi[i]),
+                    "signal": "BUY" if side == 1 else "SELL",
+                    "score": round(float(score[i]), 2),
+                }
+                for i in best
+            ]
+        return out
+
+    async def scan(self):
+        if not self.symbols or time.monotonic() - self._universe_at > self.universe_ttl:
+            await self.refresh_universe()
+        await self.seed_missing()
+        tickers = await self.fetcher.get_json("/api/v3/ticker/24hr", {}, PRIORITY_SCANNER)
+
+        started = time.perf_counter()
+        mask, change = self.apply_tickers(tickers)
+        ranked = self.rank(mask, change)
+        elapsed = time.perf_counter() - started
+        SCAN_SECONDS.observe(elapsed)
+        SCAN_UNIVERSE.set(int(mask.sum()))
+
+        self.cycles += 1
+        self.result = {
+            "strategy": self.strategy,
+            "cycle": self.cycles,
+            "updated": clock.now().isoformat(),
+            "universe": len(self.symbols),
+            "screened": int(mask.sum()),
+            "scan_ms": round(elapsed * 1000, 3),
+            **ranked,
+        }
+        for listener in self.listeners:
+            listener()
+        return self.result
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                record_error("scanner", e)
+                log.error("scan failed", error=repr(e))
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,176 @@
+"""
+Shared Engine State
+Lets one engine process publish pre-rendered API responses to any number of
+API worker processes through a named shared-memory segment. A seqlock header
+lets readers copy a consistent version without locks or syscalls
+"""
+import asyncio
+import json
+import os
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, Optional, Tuple
+
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("shared_state")
+
+# Number of uvicorn API workers; above 1, `python bot.py` starts a separate engine process
+API_WORKERS = int(os.environ.get("API_WORKERS", 1))
+SHARED_STATE_NAME = os.environ.get("SHARED_STATE_NAME", "trading_bot_state")
+SHARED_STATE_SIZE = int(os.environ.get("SHARED_STATE_SIZE", 32 * 1024 * 1024))
+# Minimum seconds between publishes
+SHARED_STATE_INTERVAL = float(os.environ.get("SHARED_STATE_INTERVAL", 0.1))
+# Where the engine serves the full API for writes forwarded by the workers
+ENGINE_SOCKET = os.environ.get("ENGINE_SOCKET", "/tmp/trading_bot_engine.sock")
+# Trades published per account for API workers; larger limits go to the engine
+SHARED_TRADES_LIMIT = 100
+
+# seq (odd while a write is in progress), payload length
+HEADER = struct.Struct("<QQ")
+INDEX_LEN = struct.Struct("<I")
+
+
+class SharedStatePublisher:
+    """
+    Engine side. publish() lays out {"version", "sections": {name: [offset,
+    length]}} followed by the section bodies, bumping the sequence number
+    before and after the copy. Like SnapshotBroadcaster, run() wakes on
+    notify() and publishes at most every `min_interval` seconds.
+    """
+    def __init__(self, name=SHARED_STATE_NAME, size=SHARED_STATE_SIZE, min_interval=SHARED_STATE_INTERVAL):
+        try:
+            # Left behind by an engine that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.size = size
+        self.min_interval = min_interval
+        self.seq = 0
+        HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        self._changed = asyncio.Event()
+
+    def publish(self, version, sections: Dict[str, bytes]):
+        index, offset = {}, 0
+        for name, body in sections.items():
+            index[name] = (offset, len(body))
+            offset += len(body)
+        head = json.dumps({"version": version, "published_at": time.time(), "sections": index}).encode()
+        payload = b"".join([INDEX_LEN.pack(len(head)), head, *sections.values()])
+        if HEADER.size + len(payload) > self.size:
+            raise ValueError(f"Shared state of {len(payload)} bytes exceeds SHARED_STATE_SIZE={self.size}")
+
+        buf = self.shm.buf
+        self.seq += 1
+        struct.pack_into("<Q", buf, 0, self.seq)
+        buf[HEADER.size:HEADER.size + len(payload)] = payload
+        struct.pack_into("<Q", buf, 8, len(payload))
+        self.seq += 1
+        struct.pack_into("<Q", buf, 0, self.seq)
+
+    def notify(self):
+        self._changed.set()
+
+    async def run(self, get_sections: Callable[[], Tuple[int, Dict[str, bytes]]]):
+        self._changed.set()
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            started = time.monotonic()
+            try:
+                self.publish(*get_sections())
+            except Exception as e:
+                record_error("shared_state", e)
+                log.error("shared state publish failed", error=repr(e))
+            await asyncio.sleep(max(0.0, self.min_interval - (time.monotonic() - started)))
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedStateReader:
+    """
+    Worker side. refresh() checks the sequence number (a few hundred ns) and
+    only copies the segment when the engine published something new; section
+    bodies can be returned as-is, parsed ones are cached per version.
+    """
+    def __init__(self, name=SHARED_STATE_NAME, max_spins=1000):
+        self.name = name
+        self.max_spins = max_spins
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.version: Optional[int] = None
+        self.published_at = 0.0
+        self.sections: Dict[str, bytes] = {}
+        self._seq = 0
+        self._parsed: Dict[str, object] = {}
+        self._rows: Dict[str, dict] = {}
+
+    def _attach(self):
+        if self.shm is None:
+            # Raises FileNotFoundError until the engine has created the segment
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            # The engine owns the segment; don't let this process's tracker unlink it on exit
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        return self.shm.buf
+
+    def refresh(self):
+        """Pick up the latest published version; True if it changed"""
+        buf = self._attach()
+        for _ in range(self.max_spins):
+            seq, length = HEADER.unpack_from(buf, 0)
+            if seq == self._seq:
+                return False
+            if seq & 1:
+                continue  # Mid-write
+            payload = bytes(buf[HEADER.size:HEADER.size + length])
+            if struct.unpack_from("<Q", buf, 0)[0] == seq:
+                break
+        else:
+            # The writer kept us out; keep serving the previous version
+            return False
+
+        n = INDEX_LEN.unpack_from(payload, 0)[0]
+        head = json.loads(payload[INDEX_LEN.size:INDEX_LEN.size + n])
+        base = INDEX_LEN.size + n
+        self.sections = {
+            name: payload[base + offset:base + offset + length]
+            for name, (offset, length) in head["sections"].items()
+        }
+        self.version = head["version"]
+        self.published_at = head["published_at"]
+        self._parsed = {}
+        self._seq = seq
+        return True
+
+    def body(self, name) -> Optional[bytes]:
+        return self.sections.get(name)
+
+    def parsed(self, name):
+        if name not in self._parsed:
+            body = self.sections.get(name)
+            self._parsed[name] = json.loads(body) if body is not None else None
+        return self._parsed[name]
+
+    def market_rows(self) -> Dict[str, dict]:
+        """
+        latest_data rows, reusing the previous version's object for rows that
+        did not change, so SnapshotBroadcaster's identity diff still works
+        """
+        latest = self.parsed("latest_data") or {"data": {}}
+        rows = {}
+        for symbol, row in latest["data"].items():
+            previous = self._rows.get(symbol)
+            rows[symbol] = previous if previous == row else row
+        self._rows = rows
+        return rows
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
@@ -0,0 +1,149 @@
+"""
+Webhook Signal Queue
+Bounded async intake for webhook alerts: duplicates are dropped by
+idempotency key, bursts for the same account and symbol collapse to the
+latest signal, and a small worker pool applies them off the request path
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import clock
+from logs import get_logger
+from metrics import record_error
+
+log = get_logger("signal_queue")
+
+
+@dataclass
+class QueuedSignal:
+    symbol: str
+    side: str
+    key: str
+    # Target paper account; None means the bot's primary account
+    account: Optional[str] = None
+    received_at: datetime = field(default_factory=clock.now)
+    # time.monotonic() at intake, for signal-to-position latency
+    received_mono: float = field(default_factory=time.monotonic)
+
+    @property
+    def slot(self) -> Tuple[Optional[str], str]:
+        """Signals for the same account and symbol replace each other"""
+        return self.account, self.symbol
+
+
+def idempotency_key(payload: dict, header_key=None):
+    """Explicit key from the header or payload, else a hash of the payload minus its secret"""
+    explicit = header_key or payload.get("idempotency_key") or payload.get("id") or payload.get("alert_id")
+    if explicit:
+        return str(explicit)
+    body = {k: v for k, v in payload.items() if k != "secret"}
+    return hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class SignalQueue:
+    """
+    submit() is O(1) and never touches the exchange. Each (account, symbol)
+    slot sits in the queue at most once; a newer signal for a queued or
+    in-flight slot replaces the pending one, and a slot is never processed
+    by two workers at the same time, so signals apply in arrival order.
+    """
+    def __init__(self, handler: Callable[[QueuedSignal], Awaitable], maxsize=10000, workers=4,
+                 dedupe_ttl=60.0, dedupe_size=100_000):
+        self.handler = handler
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.n_workers = workers
+        self.dedupe_ttl = dedupe_ttl
+        self.dedupe_size = dedupe_size
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._latest: Dict[tuple, QueuedSignal] = {}
+        self._active: Set[tuple] = set()
+        # Queue entries promised to in-flight slots that have a newer signal waiting
+        self._reserved = 0
+        self.stats = {"accepted": 0, "duplicate": 0, "coalesced": 0, "processed": 0, "failed": 0, "rejected": 0}
+
+    def _is_duplicate(self, key):
+        now = time.monotonic()
+        while self._seen:
+            oldest_key, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.dedupe_ttl and len(self._seen) < self.dedupe_size:
+                break
+            self._seen.popitem(last=False)
+        if key in self._seen:
+            return True
+        self._seen[key] = now
+        return False
+
+    def _has_room(self):
+        return self.queue.maxsize <= 0 or self.queue.qsize() + self._reserved < self.queue.maxsize
+
+    def _reject(self, signal: QueuedSignal):
+        self._seen.pop(signal.key, None)  # Let the sender retry the same key
+        self.stats["rejected"] += 1
+        raise QueueFullError(f"Signal queue full ({self.queue.maxsize} slots pending)")
+
+    def submit(self, signal: QueuedSignal):
+        """Returns 'accepted', 'coalesced' or 'duplicate'; raises QueueFullError when saturated"""
+        if self._is_duplicate(signal.key):
+            self.stats["duplicate"] += 1
+            return "duplicate"
+
+        slot = signal.slot
+        if slot in self._latest:
+            self._latest[slot] = signal
+            self.stats["coalesced"] += 1
+            return "coalesced"
+
+        if not self._has_room():
+            self._reject(signal)
+        if slot in self._active:
+            # The worker re-queues the slot when the in-flight signal finishes
+            self._reserved += 1
+        else:
+            self.queue.put_nowait(slot)
+        self._latest[slot] = signal
+        self.stats["accepted"] += 1
+        return "accepted"
+
+    @property
+    def depth(self):
+        return len(self._latest)
+
+    async def _worker(self):
+        while True:
+            slot = await self.queue.get()
+            signal = self._latest.pop(slot, None)
+            if signal is None:
+                continue
+            self._active.add(slot)
+            try:
+                await self.handler(signal)
+                self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                record_error("signal_queue", e)
+                log.error("signal processing failed", side=signal.side, symbol=signal.symbol,
+                          account=signal.account, error=repr(e))
+            finally:
+                self._active.discard(slot)
+                # A newer signal arrived while this one was in flight
+                if slot in self._latest:
+                    self._reserved -= 1
+                    self.queue.put_nowait(slot)
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
@@ -4,7 +4,15 @@ import { useCallback, useEffect, useMemo, useState } from "react";
 import { SearchBar } from "../components/SearchBar";
 import { TokenCard } from "../components/TokenCard";
 import { TokenCharts } from "../components/TokenCharts";
-import { getLatestData, getTokenData, login, logout, me, signup } from "../lib/api";
+import {
+  getLatestData,
+  getTokenData,
+  login,
+  logout,
+  me,
+  signup,
+  subscribeMarket,
+} from "../lib/api";
 import { TokenHistoryPoint, TokenMetrics } from "../lib/types";
 import { normalizeTokenInput } from "../lib/utils";
 
@@ -100,10 +108,38 @@ export default function Home() {
   };
 
   useEffect(() => {
-    loadDashboard();
-    const id = setInterval(loadDashboard, DASHBOARD_POLL_MS);
-    return () => clearInterval(id);
-  }, [loadDashboard]);
+    if (typeof EventSource === "undefined") {
+      loadDashboard();
+      const id = setInterval(loadDashboard, DASHBOARD_POLL_MS);
+      return () => clearInterval(id);
+    }
+
+    // Pushed updates: only changed symbols arrive, so no per-tab polling load
+    return subscribeMarket(
+      (state, changed) => {
+        const normalized = Object.entries(state.data).reduce(
+          (acc, [key, value]) => {
+            acc[key] = { ...value, symbol: key };
+            return acc;
+          },
+          {} as Record<string, TokenMetrics>
+        );
+        setDashboardData(normalized);
+        changed.forEach((key) => {
+          const item = normalized[key];
+          if (!item) return;
+          addHistoryPoint(item.symbol, {
+            timestamp: item.last_updated,
+            price: item.price,
+            rsi: item.rsi,
+          });
+        });
+        setError(null);
+        setDashboardLoading(false);
+      },
+      () => setError("Live updates interrupted, reconnecting...")
+    );
+  }, [loadDashboard, addHistoryPoint]);
 
   useEffect(() => {
     if (!tokenData?.symbol) return;
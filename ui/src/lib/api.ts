@@ -1,6 +1,14 @@
 import {
+  CandleInterval,
+  CandlePoint,
+  CandlesResponse,
   LatestDataResponse,
+  MarketStreamState,
+  Position,
   PositionsResponse,
+  ScannerResponse,
+  StreamDiffMessage,
+  StreamSnapshotMessage,
   TokenDataResponse,
 } from "./types";
 
@@ -26,6 +34,73 @@ export const getTokenData = (token: string) =>
 
 export const getPositions = () => fetchJson<PositionsResponse>("/positions");
 
+export const getCandles = (
+  token: string,
+  opts: { interval?: CandleInterval; start?: number; end?: number; points?: number } = {}
+) => {
+  const params = new URLSearchParams({ token, interval: opts.interval ?? "1m" });
+  if (opts.start !== undefined) params.set("start", String(opts.start));
+  if (opts.end !== undefined) params.set("end", String(opts.end));
+  if (opts.points !== undefined) params.set("points", String(opts.points));
+  return fetchJson<CandlesResponse>(`/candles?${params}`);
+};
+
+export const getScanner = (limit?: number) =>
+  fetchJson<ScannerResponse>(limit === undefined ? "/scanner" : `/scanner?limit=${limit}`);
+
+export const toCandlePoints = (res: CandlesResponse): CandlePoint[] =>
+  res.t.map((t, i) => ({
+    x: new Date(t).toISOString(),
+    o: res.o[i],
+    h: res.h[i],
+    l: res.l[i],
+    c: res.c[i],
+  }));
+
+const byToken = (positions: Position[]) =>
+  positions.reduce((acc, p) => {
+    acc[p.token] = p;
+    return acc;
+  }, {} as Record<string, Position>);
+
+// Live market + positions over Server-Sent Events. The server sends a full
+// snapshot on connect (and after falling behind), then only diffs; this merges
+// them into a fresh state object per update, passing along the symbols that
+// changed. Returns an unsubscribe function.
+export const subscribeMarket = (
+  onUpdate: (state: MarketStreamState, changed: string[]) => void,
+  onError?: (event: Event) => void
+) => {
+  let state: MarketStreamState = { version: 0, data: {}, positions: {}, account: null };
+  const source = new EventSource(`${API_BASE}/stream`);
+
+  source.addEventListener("snapshot", (event) => {
+    const msg = JSON.parse((event as MessageEvent).data) as StreamSnapshotMessage;
+    state = {
+      version: msg.version,
+      data: msg.data,
+      positions: byToken(msg.positions),
+      account: msg.account,
+    };
+    onUpdate(state, Object.keys(msg.data));
+  });
+
+  source.addEventListener("diff", (event) => {
+    const msg = JSON.parse((event as MessageEvent).data) as StreamDiffMessage;
+    const data = { ...state.data, ...msg.data };
+    msg.removed.forEach((symbol) => delete data[symbol]);
+    const positions = { ...state.positions, ...byToken(msg.positions) };
+    msg.closed_positions.forEach((token) => delete positions[token]);
+    state = { version: msg.version, data, positions, account: msg.account };
+    onUpdate(state, Object.keys(msg.data));
+  });
+
+  // EventSource reconnects on its own; the server resends a snapshot then
+  if (onError) source.onerror = onError;
+
+  return () => source.close();
+};
+
 // Auth (same-origin)
 const authFetch = async <T>(path: string, init?: RequestInit) => {
   const res = await fetch(path, {
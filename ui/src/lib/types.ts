@@ -29,6 +29,9 @@ export type Position = {
   tp_price: number;
   sl_price: number;
   liq_price: number;
+  // Adverse move (% of price) to liq_price, and to the account running out of margin
+  liq_distance_pct: number | null;
+  cross_liq_distance_pct: number | null;
   pnl: number;
   pnl_percent: number;
 };
@@ -54,3 +57,65 @@ export type CandlePoint = {
   l: number;
   c: number;
 };
+
+export type CandleInterval = "1m" | "5m" | "15m" | "1h" | "4h" | "1d";
+
+// Columnar /candles response: index i across t/o/h/l/c/v is one bar
+export type CandlesResponse = {
+  symbol: string;
+  interval: CandleInterval;
+  t: number[]; // bar open time, epoch ms
+  o: number[];
+  h: number[];
+  l: number[];
+  c: number[];
+  v: number[];
+};
+
+export type ScannerCandidate = {
+  symbol: string;
+  price: number;
+  change: number;
+  rsi: number;
+  signal: "BUY" | "SELL";
+  score: number;
+};
+
+// /scanner: ranked candidates from the latest whole-market scan
+export type ScannerResponse = {
+  strategy: string;
+  cycle: number;
+  updated: string;
+  universe: number;
+  screened: number;
+  scan_ms: number;
+  buy: ScannerCandidate[];
+  sell: ScannerCandidate[];
+};
+
+export type AccountSummary = Omit<PositionsResponse, "positions">;
+
+export type StreamSnapshotMessage = {
+  type: "snapshot";
+  version: number;
+  data: Record<string, TokenMetrics>;
+  positions: Position[];
+  account: AccountSummary;
+};
+
+export type StreamDiffMessage = {
+  type: "diff";
+  version: number;
+  data: Record<string, TokenMetrics>;
+  removed: string[];
+  positions: Position[];
+  closed_positions: string[];
+  account: AccountSummary;
+};
+
+export type MarketStreamState = {
+  version: number;
+  data: Record<string, TokenMetrics>;
+  positions: Record<string, Position>;
+  account: AccountSummary | null;
+};
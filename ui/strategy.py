@@ -0,0 +1,12 @@
+"""
+Strategy Presets
+Take-profit / stop-loss distances and RSI thresholds per trading style,
+shared by the live bot, the backtester and the parameter sweep
+"""
+
+# Aggressive Logic for Presentation (Sensitivity increased)
+STRATEGY_CONFIG = {
+    'scalping': {'tp': 0.008, 'sl': 0.004, 'rsi_buy': 48, 'rsi_sell': 52}, 
+    'short':    {'tp': 0.015, 'sl': 0.008, 'rsi_buy': 45, 'rsi_sell': 55},
+    'swing':    {'tp': 0.040, 'sl': 0.020, 'rsi_buy': 40, 'rsi_sell': 60}
+}
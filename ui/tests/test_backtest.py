@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from backtest import Candles, backtest_symbol, run_backtest, simulate
+
+CONF = {"tp": 0.01, "sl": 0.01, "rsi_buy": 45, "rsi_sell": 55}
+
+
+def bars(rows):
+    """rows of (open, high, low, close)"""
+    o, h, l, c = (np.array(col, dtype=np.float64) for col in zip(*rows))
+    return Candles(symbol="TESTUSDT", open_time=np.arange(len(rows), dtype=np.int64) * 60_000,
+                   open=o, high=h, low=l, close=c, volume=np.ones(len(rows)))
+
+
+def test_long_stop_gapped_through_fills_at_the_open():
+    candles = bars([(100, 100, 100, 100), (95, 96, 94, 95)])
+    trades, _ = simulate(candles, np.array([1, 0], dtype=np.int8), CONF)
+    assert trades["exit_reason"][0] == "SL"
+    assert trades["exit_price"][0] == 95.0
+
+
+def test_short_stop_gapped_through_fills_at_the_open():
+    candles = bars([(100, 100, 100, 100), (104, 105, 103, 104)])
+    trades, _ = simulate(candles, np.array([-1, 0], dtype=np.int8), CONF)
+    assert trades["exit_price"][0] == 104.0
+
+
+def test_stop_touched_intrabar_fills_at_the_stop():
+    candles = bars([(100, 100, 100, 100), (100, 100.5, 98, 99.5)])
+    trades, _ = simulate(candles, np.array([1, 0], dtype=np.int8), CONF)
+    assert trades["exit_price"][0] == pytest.approx(99.0)
+
+
+def test_take_profit_fills_at_its_level_even_on_a_gap():
+    candles = bars([(100, 100, 100, 100), (105, 106, 104, 105)])
+    trades, _ = simulate(candles, np.array([1, 0], dtype=np.int8), CONF)
+    assert trades["exit_reason"][0] == "TP"
+    assert trades["exit_price"][0] == pytest.approx(101.0)
+
+
+def random_walk(symbol, n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.003, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return Candles(symbol=symbol, open_time=np.arange(n, dtype=np.int64) * 60_000, open=open_,
+                   high=np.maximum(open_, close) * 1.001, low=np.minimum(open_, close) * 0.999,
+                   close=close, volume=np.ones(n))
+
+
+def test_stacked_run_matches_each_symbol_on_its_own():
+    data = {"AAAUSDT": random_walk("AAAUSDT", 3000, 0), "BBBUSDT": random_walk("BBBUSDT", 1700, 1),
+            "CCCUSDT": random_walk("CCCUSDT", 5, 2)}
+    results = run_backtest(data, "scalping")
+    for symbol, candles in data.items():
+        alone = backtest_symbol(candles, "scalping")
+        assert np.array_equal(results[symbol].trades, alone.trades)
+        assert results[symbol].final_balance == alone.final_balance
+    assert results["AAAUSDT"].n_trades > 0
@@ -0,0 +1,71 @@
+import numpy as np
+
+from candle_store import INITIAL_CAPACITY, CandleSeries, CandleStore
+
+MINUTE = 60_000
+
+
+def candle(i, close=None):
+    close = float(i) if close is None else close
+    return (i * MINUTE, close, close + 1, close - 1, close, 1.0)
+
+
+def test_upsert_appends_and_revises_the_open_candle(tmp_path):
+    series = CandleSeries(str(tmp_path))
+    series.upsert(*candle(0))
+    series.upsert(*candle(1))
+    series.upsert(*candle(1, close=5.0))
+    assert series.count == 2
+    assert series.range()["close"].tolist() == [0.0, 5.0]
+
+
+def test_late_candle_fills_a_gap_in_order(tmp_path):
+    series = CandleSeries(str(tmp_path))
+    for i in (0, 1, 4, 5):
+        series.upsert(*candle(i))
+    series.upsert(*candle(3))
+    series.upsert(*candle(2))
+    series.upsert(*candle(4, close=40.0))  # interior row revised in place
+    cols = series.range()
+    assert (cols["open_time"] // MINUTE).tolist() == [0, 1, 2, 3, 4, 5]
+    assert cols["close"].tolist() == [0.0, 1.0, 2.0, 3.0, 40.0, 5.0]
+    assert cols["high"].tolist() == [1.0, 2.0, 3.0, 4.0, 41.0, 6.0]
+
+
+def test_arrays_grow_past_the_initial_capacity(tmp_path):
+    series = CandleSeries(str(tmp_path))
+    for i in range(INITIAL_CAPACITY):
+        series.upsert(*candle(2 * i))
+    earlier = series.range(end=10 * MINUTE)
+    series.upsert(*candle(2 * INITIAL_CAPACITY))  # append at capacity
+    assert series.capacity == 2 * INITIAL_CAPACITY
+    # Views taken before the remap stay readable
+    assert earlier["close"].tolist() == [0.0, 2.0, 4.0, 6.0, 8.0]
+    series.upsert(*candle(1))  # gap insert after growing
+    times = series.open_time // MINUTE
+    assert series.count == INITIAL_CAPACITY + 2
+    assert np.all(np.diff(times) > 0)
+    assert times[:3].tolist() == [0, 1, 2]
+    assert times[-1] == 2 * INITIAL_CAPACITY
+
+
+def test_gap_insert_at_capacity_grows(tmp_path):
+    series = CandleSeries(str(tmp_path))
+    for i in range(INITIAL_CAPACITY):
+        series.upsert(*candle(i + 1))
+    series.upsert(*candle(0))
+    assert series.count == INITIAL_CAPACITY + 1
+    assert series.range()["close"][:2].tolist() == [0.0, 1.0]
+    assert series.range()["close"][-1] == INITIAL_CAPACITY
+
+
+def test_flushed_series_reopens_with_its_rows(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.add_klines("btcusdt", "1m", [[i * MINUTE, "1", "2", "0.5", str(i), "3", 0] for i in range(10)])
+    store.flush()
+
+    reopened = CandleStore(str(tmp_path))
+    assert reopened.symbols() == ["BTCUSDT"]
+    cols = reopened.range("BTCUSDT", start=2 * MINUTE, end=5 * MINUTE)
+    assert cols["close"].tolist() == [2.0, 3.0, 4.0]
+    assert reopened.range("ETHUSDT")["close"].size == 0
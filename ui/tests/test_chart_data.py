@@ -0,0 +1,112 @@
+import json
+
+import numpy as np
+
+import clock
+from candle_store import CandleStore
+from chart_data import (RANGE_BUCKET_BARS, CandleQueryCache, aggregate, downsample, encode_binary,
+                        lttb_indices)
+
+MINUTE = 60_000
+# 2024-01-01 00:00 UTC, aligned to every interval
+T0 = 1_704_067_200_000
+
+
+def minute_cols(n, start=T0):
+    t = start + np.arange(n, dtype=np.int64) * MINUTE
+    close = 100 + np.sin(np.arange(n) / 7.0) * 5
+    return {"open_time": t, "open": close - 0.5, "high": close + 1, "low": close - 1, "close": close,
+            "volume": np.ones(n)}
+
+
+def test_aggregate_rolls_minutes_into_wider_bars():
+    cols = minute_cols(12)
+    bars = aggregate(cols, 5 * MINUTE)
+    assert bars["open_time"].tolist() == [T0, T0 + 5 * MINUTE, T0 + 10 * MINUTE]
+    assert bars["open"][1] == cols["open"][5]
+    assert bars["close"][1] == cols["close"][9]
+    assert bars["high"][0] == cols["high"][:5].max()
+    assert bars["low"][2] == cols["low"][10:].min()
+    assert bars["volume"].tolist() == [5, 5, 2]
+
+
+def test_lttb_keeps_the_endpoints_and_the_spike():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    idx = lttb_indices(np.arange(1000), y, 20)
+    assert len(idx) == 20
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 437 in idx
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_downsample_preserves_extremes_and_volume():
+    cols = minute_cols(500)
+    cols["high"][123] = 1000.0
+    out = downsample(cols, 50)
+    assert len(out["close"]) == 50
+    assert out["high"].max() == 1000.0
+    assert out["volume"].sum() == 500
+
+
+def test_encode_binary_layout():
+    cols = minute_cols(3)
+    body = encode_binary(cols)
+    assert len(body) == 3 * 8 * 6
+    assert np.frombuffer(body[:24], "<i8").tolist() == cols["open_time"].tolist()
+    assert np.frombuffer(body[-24:], "<f8").tolist() == cols["volume"].tolist()
+
+
+def make_cache(tmp_path, n):
+    store = CandleStore(str(tmp_path))
+    cols = minute_cols(n)
+    series = store.get("BTCUSDT")
+    for row in zip(*(cols[k] for k in ("open_time", "open", "high", "low", "close", "volume"))):
+        series.upsert(*row)
+    return CandleQueryCache(store), cols
+
+
+def test_query_returns_exactly_the_requested_bars(tmp_path):
+    cache, cols = make_cache(tmp_path, 3000)
+    start, end = T0 + 300 * MINUTE, T0 + 1300 * MINUTE  # not block-aligned
+    body, count = cache.query("BTCUSDT", "1m", start, end, points=1000)
+    data = json.loads(body)
+    assert count == 1000
+    assert data["t"][0] == start and data["t"][-1] == end - MINUTE
+    assert data["c"] == cols["close"][300:1300].tolist()
+
+
+def test_query_downsamples_only_the_requested_span(tmp_path):
+    cache, _ = make_cache(tmp_path, 3000)
+    start, end = T0 + 100 * MINUTE, T0 + 2100 * MINUTE
+    body, count = cache.query("BTCUSDT", "1m", start, end, points=500)
+    data = json.loads(body)
+    assert count == 500
+    assert data["t"][0] == start and data["t"][-1] == end - MINUTE
+
+
+def test_default_query_is_the_last_points_bars(tmp_path):
+    cache, cols = make_cache(tmp_path, 3000)
+    previous = clock.install(clock.VirtualClock((T0 + 2999 * MINUTE + 30_000) / 1000))
+    try:
+        body, count = cache.query("BTCUSDT", "1m", points=1000)
+    finally:
+        clock.install(previous)
+    data = json.loads(body)
+    assert count == 1000
+    assert data["c"] == cols["close"][2000:].tolist()
+
+
+def test_overlapping_queries_share_the_block_read(tmp_path):
+    cache, _ = make_cache(tmp_path, 3000)
+    reads = []
+    store_range = cache.store.range
+    cache.store.range = lambda *a: reads.append(a) or store_range(*a)
+    cache.query("BTCUSDT", "1m", T0 + 10 * MINUTE, T0 + 200 * MINUTE)
+    cache.query("BTCUSDT", "1m", T0 + 20 * MINUTE, T0 + 210 * MINUTE)
+    body, count = cache.query("BTCUSDT", "1m", T0 + 10 * MINUTE, T0 + 200 * MINUTE)
+    assert len(reads) == 1
+    read_start, read_end = reads[0][2:]
+    assert read_start <= T0 + 10 * MINUTE and read_end >= T0 + 210 * MINUTE
+    assert (read_end - read_start) % (MINUTE * RANGE_BUCKET_BARS) == 0
+    assert count == 190
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from exchanges import HEDGED, OUTLIERS, ExchangeAdapter, ExchangeRouter, NoSourceError
+from mock_exchange import MockAdapter, MockMarket
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def closing(router, coro):
+    try:
+        return await coro
+    finally:
+        await router.close()
+
+
+def test_base_adapter_is_abstract():
+    with pytest.raises(TypeError):
+        ExchangeAdapter("http://example.invalid")
+
+
+def test_slow_primary_is_hedged_to_the_next_venue():
+    slow = MockAdapter("slow", latency=0.5)
+    fast = MockAdapter("fast", latency=0.0, seed=1)
+    router = ExchangeRouter([slow, fast], hedge_delay=0.05)
+    hedged_before = HEDGED.labels("slow").value
+
+    started = time.perf_counter()
+    adapter, quotes = run(closing(router, router.hedged(lambda a: a.tickers(SYMBOLS))))
+
+    assert adapter is fast
+    assert set(quotes) == set(SYMBOLS)
+    assert time.perf_counter() - started < 0.3
+    assert slow.calls == fast.calls == 1
+    assert HEDGED.labels("slow").value == hedged_before + 1
+
+
+def test_failing_primary_fails_over_without_waiting():
+    broken = MockAdapter("broken", latency=0.0, error_rate=1.0)
+    backup = MockAdapter("backup", latency=0.0, seed=1)
+    router = ExchangeRouter([broken, backup], hedge_delay=1.0)
+
+    started = time.perf_counter()
+    rows = run(closing(router, router.klines("BTCUSDT", "1m", 14)))
+
+    assert len(rows) == 14
+    assert time.perf_counter() - started < 0.5
+    assert router.health["broken"].failures == 1
+    assert router.health["backup"].successes == 1
+
+
+def test_every_venue_failing_raises():
+    router = ExchangeRouter([MockAdapter("a", error_rate=1.0), MockAdapter("b", error_rate=1.0, seed=1)],
+                            hedge_delay=0.01)
+    with pytest.raises(NoSourceError):
+        run(closing(router, router.tickers(SYMBOLS)))
+
+
+def test_gathered_waits_one_hedge_delay_for_stragglers():
+    market = MockMarket()
+    quick = MockAdapter("quick", market=market)
+    close_behind = MockAdapter("close_behind", latency=0.02, market=market, seed=1)
+    straggler = MockAdapter("straggler", latency=1.0, market=market, seed=2)
+    router = ExchangeRouter([quick, close_behind, straggler], hedge_delay=0.1)
+
+    started = time.perf_counter()
+    results = run(closing(router, router.gathered(lambda a: a.tickers(SYMBOLS))))
+
+    assert {a.name for a, _ in results} == {"quick", "close_behind"}
+    assert time.perf_counter() - started < 0.5
+
+
+def test_median_drops_an_outlier_venue():
+    market = MockMarket()
+    adapters = [MockAdapter("a", market=market), MockAdapter("b", market=market, seed=1),
+                MockAdapter("skewed", market=market, seed=2, bias=0.10)]
+    router = ExchangeRouter(adapters, aggregation="median", hedge_delay=0.1, max_deviation=0.02)
+    outliers_before = OUTLIERS.labels("skewed").value
+
+    quotes = run(closing(router, router.tickers(SYMBOLS)))
+
+    for symbol in SYMBOLS:
+        assert quotes[symbol].source == "a+b"
+        assert quotes[symbol].price == pytest.approx(market.prices[symbol], rel=0.01)
+    assert OUTLIERS.labels("skewed").value == outliers_before + len(SYMBOLS)
+
+
+def test_median_with_two_venues_keeps_both():
+    market = MockMarket()
+    router = ExchangeRouter([MockAdapter("a", market=market), MockAdapter("b", market=market, seed=1, bias=0.10)],
+                            aggregation="median", hedge_delay=0.1)
+    quotes = run(closing(router, router.tickers(["BTCUSDT"])))
+    # Nothing to outvote with two sources; the median is their midpoint
+    assert quotes["BTCUSDT"].source == "a+b"
+    assert quotes["BTCUSDT"].price == pytest.approx(market.prices["BTCUSDT"] * 1.05, rel=0.01)
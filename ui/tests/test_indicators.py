@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from bot import HyperTradingBot
+from indicators import IndicatorEngine, RingBuffer, RollingIndicators
+
+
+def reference_rsi(closes):
+    return HyperTradingBot.calculate_rsi(None, list(closes))
+
+
+def random_walk(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return 100 + np.cumsum(rng.normal(0, 0.5, n))
+
+
+def test_ring_buffer_evicts_oldest_first():
+    buf = RingBuffer(3)
+    assert [buf.append(v) for v in (1, 2, 3, 4)] == [None, None, None, 1]
+    assert buf.values().tolist() == [2, 3, 4]
+    assert buf[-1] == 4 and buf[-3] == 2
+    with pytest.raises(IndexError):
+        buf[-4]
+
+
+def test_rsi_is_neutral_below_ten_closes():
+    ind = RollingIndicators(rsi_window=14)
+    for close in random_walk(9):
+        ind.push(close)
+        assert ind.rsi == 50 == reference_rsi(ind.closes.values())
+    ind.push(101.0)
+    assert ind.rsi != 50
+
+
+def test_rsi_matches_calculate_rsi_over_a_stream():
+    closes = random_walk(5000)  # crosses RESYNC_EVERY
+    ind = RollingIndicators(rsi_window=14, sma_periods=(3,))
+    for i, close in enumerate(closes, start=1):
+        ind.push(close)
+        window = closes[max(0, i - 14):i]
+        assert ind.rsi == pytest.approx(reference_rsi(window), abs=0.01)
+        assert ind.sma(3) == pytest.approx(closes[max(0, i - 3):i].mean())
+
+
+def test_short_rsi_window_stays_neutral():
+    # Fewer than 10 closes ever fit the window, as calculate_rsi would see it
+    ind = RollingIndicators(rsi_window=8)
+    for close in random_walk(50):
+        ind.push(close)
+        assert ind.rsi == 50 == reference_rsi(ind.closes.values()[-8:])
+
+
+def test_rsi_with_only_gains_is_100():
+    ind = RollingIndicators(rsi_window=14)
+    ind.seed(range(100, 120))
+    assert ind.rsi == 100 == reference_rsi(range(106, 120))
+
+
+def test_update_last_matches_a_fresh_seed():
+    closes = random_walk(200)
+    ind = RollingIndicators(rsi_window=14, change_lookback=5)
+    ind.seed(closes)
+    ind.update_last(closes[-1] * 1.02)
+    revised = np.append(closes[:-1], closes[-1] * 1.02)
+    fresh = RollingIndicators(rsi_window=14, change_lookback=5)
+    fresh.seed(revised)
+    assert ind.rsi == pytest.approx(reference_rsi(revised[-14:]), abs=0.01)
+    assert ind.rsi == pytest.approx(fresh.rsi, abs=0.01)
+    assert ind.wilder_rsi == pytest.approx(fresh.wilder_rsi, abs=0.01)
+    assert ind.change == fresh.change
+
+
+def test_engine_revises_the_open_candle_and_pushes_new_ones():
+    engine = IndicatorEngine(rsi_window=14)
+    engine.seed("BTCUSDT", [100.0, 101.0], last_open_time=60_000)
+    engine.update("BTCUSDT", 60_000, 102.0)
+    engine.update("BTCUSDT", 120_000, 103.0)
+    engine.update("BTCUSDT", 60_000, 999.0)  # late tick for a closed candle
+    assert engine.get("BTCUSDT").closes.values().tolist() == [100.0, 102.0, 103.0]
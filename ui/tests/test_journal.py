@@ -0,0 +1,59 @@
+from bot import HyperTradingBot, TradingAccount
+from journal import TradeJournal
+
+
+def test_events_survive_a_restart(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = TradeJournal(path, flush_interval=0.01)
+    journal.start()
+    for i in range(3):
+        journal.append("balance", {"balance": 100.0 + i})
+    journal.close()
+
+    reopened = TradeJournal(path)
+    state, events = reopened.load()
+    assert state is None
+    assert events == [(1, "balance", {"balance": 100.0}), (2, "balance", {"balance": 101.0}),
+                      (3, "balance", {"balance": 102.0})]
+    assert reopened.last_seq == 3
+
+
+def test_snapshot_compacts_the_events_it_covers(tmp_path):
+    path = str(tmp_path / "journal.db")
+    journal = TradeJournal(path, flush_interval=0.01)
+    journal.start()
+    journal.append("balance", {"balance": 1.0})
+    journal.append("balance", {"balance": 2.0})
+    journal.snapshot({"balance": 2.0})
+    journal.append("balance", {"balance": 3.0})
+    assert journal.events_since_snapshot == 1
+    journal.close()
+
+    reopened = TradeJournal(path)
+    assert reopened.load() == ({"balance": 2.0}, [(3, "balance", {"balance": 3.0})])
+    assert (reopened.last_seq, reopened.last_snapshot_seq) == (3, 2)
+
+
+def test_bot_state_replays_after_a_restart(tmp_path):
+    path = str(tmp_path / "journal.db")
+    bot = HyperTradingBot(["BTC", "ETH"], 10000, "scalping")
+    bot.attach_journal(TradeJournal(path, flush_interval=0.01))
+    bot.primary.process_signal("BTCUSDT", "BUY", {"price": 100.0})
+    bot.primary.process_signal("ETHUSDT", "SELL", {"price": 10.0})
+    bot.primary.check_triggers("BTCUSDT", 101.0)  # take profit
+    bot.snapshot_journal()
+    # Recorded after the snapshot, so the restart replays them from events
+    second = bot.add_account(TradingAccount("swing", ["SOL"], 5000, "swing"))
+    second.process_signal("SOLUSDT", "BUY", {"price": 20.0})
+    bot.primary.process_signal("BTCUSDT", "SELL", {"price": 102.0})
+    expected = bot.to_state()
+    bot.journal.close()
+
+    restarted = HyperTradingBot(["BTC", "ETH"], 10000, "scalping")
+    restarted.attach_journal(TradeJournal(path))
+    restarted.journal.close()
+    assert restarted.to_state() == expected
+    assert set(restarted.accounts) == {"default", "swing"}
+    assert set(restarted.primary.positions) == {"BTCUSDT", "ETHUSDT"}
+    # Restored positions are live again: their triggers still fire
+    assert restarted.accounts["swing"].check_triggers("SOLUSDT", 1.0)
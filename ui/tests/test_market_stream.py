@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import aiohttp
+
+from market_stream import BinanceStreamFeed, INTERVAL_MS
+from mock_exchange import MockConfig, MockExchange
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+
+
+class RestFetcher:
+    """fetch_all() over the mock's REST endpoints, remembering which symbols were requested"""
+    def __init__(self, base_url, interval="1m", limit=14):
+        self.base_url = base_url
+        self.interval = interval
+        self.limit = limit
+        self.calls = []
+
+    async def fetch_all(self, symbols):
+        self.calls.append(list(symbols))
+        out = {}
+        async with aiohttp.ClientSession() as session:
+            for symbol in symbols:
+                async with session.get(f"{self.base_url}/api/v3/ticker/24hr", params={"symbol": symbol}) as r:
+                    ticker = await r.json()
+                async with session.get(f"{self.base_url}/api/v3/klines",
+                                       params={"symbol": symbol, "interval": self.interval,
+                                               "limit": self.limit}) as r:
+                    klines = await r.json()
+                out[symbol] = (ticker, klines)
+        return out
+
+
+async def start_mock():
+    exchange = MockExchange(MockConfig(latency=0.0, jitter=0.0, ws_interval=0.02))
+    runner = await exchange.start(port=0)
+    host, port = runner.addresses[0][:2]
+    return exchange, runner, f"http://{host}:{port}"
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def test_reconnects_and_backfills_after_server_drop():
+    async def scenario():
+        exchange, runner, url = await start_mock()
+        fetcher = RestFetcher(url)
+        feed = BinanceStreamFeed(SYMBOLS, fetcher, ws_url=url.replace("http", "ws"), limit=14)
+        task = asyncio.create_task(feed.run())
+        try:
+            await wait_for(lambda: all(s.ready and s.resets for s in feed.states.values()))
+            assert all(len(s.closes) == 14 for s in feed.states.values())
+            resets = {s: st.resets for s, st in feed.states.items()}
+
+            await exchange.drop_streams()
+            await wait_for(lambda: not feed.connected.is_set())
+            await wait_for(lambda: exchange.stats["ws_connections"] == 2 and
+                           all(st.resets > resets[s] for s, st in feed.states.items()))
+
+            # Every symbol was resubscribed and refilled from REST after the reconnect
+            assert fetcher.calls[-1] == SYMBOLS
+            assert all(len(s.closes) == 14 for s in feed.states.values())
+            messages = exchange.stats["ws_messages"]
+            await wait_for(lambda: exchange.stats["ws_messages"] > messages)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_kline_gap_triggers_backfill_of_missed_candles():
+    async def scenario():
+        exchange, runner, url = await start_mock()
+        fetcher = RestFetcher(url)
+        feed = BinanceStreamFeed(["BTCUSDT"], fetcher, ws_url=url.replace("http", "ws"), limit=14)
+        minute = INTERVAL_MS["1m"]
+        now_open = int(time.time() * 1000) // minute * minute
+
+        def kline(open_time, close):
+            return {"data": {"e": "kline", "s": "BTCUSDT",
+                             "k": {"t": open_time, "o": close, "h": close, "l": close, "c": close,
+                                   "v": "1", "x": False}}}
+        try:
+            feed.handle_message(kline(now_open - 3 * minute, "100"))
+            assert list(feed.states["BTCUSDT"].closes) == [100.0]
+            # Two candles never arrived
+            feed.handle_message(kline(now_open, "101"))
+            state = feed.states["BTCUSDT"]
+            await wait_for(lambda: state.resets == 1)
+
+            assert fetcher.calls == [["BTCUSDT"]]
+            assert len(state.closes) == 14
+            assert state.last_open_time == now_open
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_add_symbols_resubscribes_with_the_new_list():
+    async def scenario():
+        exchange, runner, url = await start_mock()
+        fetcher = RestFetcher(url)
+        feed = BinanceStreamFeed(["BTCUSDT"], fetcher, ws_url=url.replace("http", "ws"))
+        task = asyncio.create_task(feed.run())
+        try:
+            await wait_for(lambda: feed.states["BTCUSDT"].ready)
+            feed.add_symbols(["BTCUSDT", "SOLUSDT"])
+            assert feed.symbols == ["BTCUSDT", "SOLUSDT"]
+
+            await wait_for(lambda: feed.states["SOLUSDT"].ready and feed.states["SOLUSDT"].resets)
+            assert exchange.stats["ws_connections"] == 2
+            assert "solusdt@kline_1m" in feed.stream_url
+            assert ["BTCUSDT", "SOLUSDT"] in fetcher.calls
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await runner.cleanup()
+
+    asyncio.run(scenario())
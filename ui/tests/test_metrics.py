@@ -0,0 +1,33 @@
+import sys
+import threading
+
+from metrics import Counter, Histogram, Registry
+
+
+def hammer(fn, threads=8, per_thread=20_000):
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        workers = [threading.Thread(target=lambda: [fn() for _ in range(per_thread)]) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return threads * per_thread
+
+
+def test_counter_keeps_every_concurrent_increment():
+    counter = Counter("test_concurrent", "test", ["kind"], registry=Registry())
+    child = counter.labels("a")
+    total = hammer(child.inc)
+    assert child.value == total
+
+
+def test_histogram_keeps_every_concurrent_observation():
+    histogram = Histogram("test_concurrent_seconds", "test", buckets=(0.5, 1.0), registry=Registry())
+    total = hammer(lambda: histogram.observe(0.25))
+    lines = histogram.render()
+    assert f"test_concurrent_seconds_count {total}" in lines
+    assert f"test_concurrent_seconds_sum {0.25 * total}" in lines
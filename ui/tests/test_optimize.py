@@ -0,0 +1,49 @@
+import numpy as np
+
+import optimize
+from backtest import Candles, run_backtest, summarize
+
+
+def make_candles(symbol, n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.002, n))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return Candles(symbol=symbol, open_time=np.arange(n, dtype=np.int64) * 60_000, open=open_,
+                   high=np.maximum(open_, close) * 1.001, low=np.minimum(open_, close) * 0.999,
+                   close=close, volume=rng.uniform(10, 1000, n))
+
+
+def test_workers_see_every_candle_column():
+    data = {"AAAUSDT": make_candles("AAAUSDT", 300, 0), "BBBUSDT": make_candles("BBBUSDT", 200, 1)}
+    shm, layout = optimize.share_candles(data)
+    try:
+        optimize._attach(layout)
+        for symbol, original in data.items():
+            shared, _, _ = optimize._views[symbol]
+            for column in ("open_time", "open", "high", "low", "close", "volume"):
+                np.testing.assert_array_equal(getattr(shared, column), getattr(original, column))
+    finally:
+        optimize._views.clear()
+        optimize._block = None
+        optimize._shm.close()
+        optimize._shm = None
+        shm.close()
+        shm.unlink()
+
+
+def test_sweep_runs_across_workers():
+    data = {"AAAUSDT": make_candles("AAAUSDT", 2000, 2)}
+    space = {"tp": [0.004, 0.008], "sl": [0.004], "rsi_buy": [45], "rsi_sell": [55]}
+    results = optimize.sweep(data, {"scalping": space}, workers=2, chunk_size=1, top=5)
+    assert len(results) == 2
+    assert {r["params"]["tp"] for r in results} == {0.004, 0.008}
+
+
+def test_sweep_matches_a_direct_backtest():
+    data = {"AAAUSDT": make_candles("AAAUSDT", 3000, 3), "BBBUSDT": make_candles("BBBUSDT", 1200, 4)}
+    params = {"tp": 0.006, "sl": 0.003, "rsi_buy": 45, "rsi_sell": 55}
+    [swept] = optimize.sweep(data, {"scalping": {k: [v] for k, v in params.items()}}, workers=1, top=1)
+    conf = {**optimize.STRATEGY_CONFIG["scalping"], **params}
+    direct = summarize(run_backtest(data, "scalping", conf), data)
+    assert swept["trades"] == direct["trades"] > 0
+    assert swept["pnl"] == direct["pnl"]
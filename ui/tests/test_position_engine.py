@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+import pytest
+
+from position_engine import PositionEngine, realized_pnl
+
+
+@dataclass
+class Pos:
+    symbol: str
+    side: str
+    entry_price: float
+    quantity: float
+    tp_price: float
+    sl_price: float
+    liq_price: float
+    entry_time: datetime = datetime(2024, 1, 1)
+
+
+def long_at(price):
+    return Pos("BTCUSDT", "LONG", price, 1.0, tp_price=price * 1.01, sl_price=price * 0.99, liq_price=price * 0.96)
+
+
+def short_at(price, symbol="BTCUSDT"):
+    return Pos(symbol, "SHORT", price, 1.0, tp_price=price * 0.99, sl_price=price * 1.01, liq_price=price * 1.04)
+
+
+def test_short_stop_gapped_through_fills_at_the_tick():
+    engine = PositionEngine()
+    position = short_at(100.0)
+    engine.add(position)
+    assert engine.on_price("BTCUSDT", 100.5) == []
+
+    # Jumps from below the stop (101) straight to 103
+    [(closed, reason, fill)] = engine.on_price("BTCUSDT", 103.0)
+    assert closed is position and reason == "SL"
+    assert fill == 103.0
+    assert realized_pnl(position, fill) == pytest.approx(-3.0)
+
+
+def test_long_liquidation_gapped_through_fills_at_the_tick():
+    engine = PositionEngine()
+    engine.add(long_at(100.0))
+    # Below both the stop (99) and liquidation (96); the stop pops first
+    fired = engine.on_price("BTCUSDT", 90.0)
+    assert [(reason, fill) for _, reason, fill in fired] == [("SL", 90.0)]
+    assert len(engine) == 0
+
+
+def test_take_profit_fills_at_its_level():
+    engine = PositionEngine()
+    engine.add(long_at(100.0))
+    engine.add(short_at(200.0, "ETHUSDT"))
+    [(_, reason, fill)] = engine.on_price("BTCUSDT", 105.0)
+    assert reason == "TP" and fill == pytest.approx(101.0)
+    assert len(engine) == 1
+
+
+def test_tick_exactly_at_the_stop_fills_at_the_stop():
+    engine = PositionEngine()
+    position = long_at(100.0)
+    engine.add(position)
+    [(_, reason, fill)] = engine.on_price("BTCUSDT", position.sl_price)
+    assert reason == "SL" and fill == position.sl_price
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from rate_limit import RequestCancelledError, RequestScheduler
+
+
+def test_coalesced_waiters_fail_fast_when_the_call_is_cancelled():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=2)
+        started = asyncio.Event()
+
+        async def call():
+            started.set()
+            await asyncio.sleep(10)
+
+        waiters = [asyncio.ensure_future(scheduler.submit(("/klines",), 2, 1, call)) for _ in range(3)]
+        await started.wait()
+        assert scheduler.queued == 1
+        runs = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_run"]
+        assert len(runs) == 1
+        runs[0].cancel()
+
+        results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1.0)
+        assert all(isinstance(r, RequestCancelledError) for r in results)
+        assert scheduler.queued == scheduler.status()["queued"] == 0
+        assert scheduler.stats["failed"] == 1
+
+        # The slot was released and the key can be requested again
+        async def ok():
+            return "fresh"
+        assert await asyncio.wait_for(scheduler.submit(("/klines",), 2, 1, ok), 1.0) == "fresh"
+        await scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_a_waiter_still_cancels_it():
+    async def scenario():
+        scheduler = RequestScheduler()
+        started = asyncio.Event()
+
+        async def call():
+            started.set()
+            await asyncio.sleep(0.05)
+            return 42
+
+        first = asyncio.ensure_future(scheduler.submit(("/ticker",), 2, 1, call))
+        second = asyncio.ensure_future(scheduler.submit(("/ticker",), 2, 1, call))
+        await started.wait()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == 42
+        await scheduler.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,10 @@
+from types import SimpleNamespace
+
+from risk import RiskBook
+
+
+def test_snapshot_before_any_symbol_is_known():
+    book = RiskBook(leverage=20, maintenance_buffer=0.8)
+    book.add_account(SimpleNamespace(id="default", balance=10000.0, positions={}))
+    snapshot = book.snapshot()
+    assert set(snapshot["accounts"]) == {"default"}
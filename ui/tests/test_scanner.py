@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from scanner import MarketScanner
+
+MINUTE = 60_000
+
+
+def make_scanner(window=5):
+    fetcher = SimpleNamespace(limit=window, interval="1m")
+    scanner = MarketScanner(fetcher, conf={}, strategy="test")
+    scanner.set_universe(["AAAUSDT", "BBBUSDT"])
+    klines = [[i * MINUTE, 0, 0, 0, str(100.0 + i), 0] for i in range(5)]
+    scanner.seed("AAAUSDT", klines)
+    scanner.seed("BBBUSDT", klines[:2])
+    return scanner
+
+
+def ticker(symbol, price):
+    return {"symbol": symbol, "lastPrice": str(price), "priceChangePercent": "0", "quoteVolume": "1"}
+
+
+def test_same_candle_updates_the_last_column():
+    scanner = make_scanner()
+    scanner.apply_tickers([ticker("AAAUSDT", 110)], now_ms=4 * MINUTE + 30_000)
+    assert scanner.closes[0].tolist() == [100, 101, 102, 103, 110]
+    assert scanner.counts[0] == 5
+
+
+def test_one_new_candle_shifts_one_column():
+    scanner = make_scanner()
+    scanner.apply_tickers([ticker("AAAUSDT", 110)], now_ms=5 * MINUTE)
+    assert scanner.closes[0].tolist() == [101, 102, 103, 104, 110]
+    assert scanner.open_times[0] == 5 * MINUTE
+
+
+def test_missed_candles_shift_by_elapsed_intervals_and_forward_fill():
+    scanner = make_scanner()
+    scanner.apply_tickers([ticker("AAAUSDT", 110), ticker("BBBUSDT", 120)], now_ms=7 * MINUTE)
+    # Candles with no ticker carry the previous close forward
+    assert scanner.closes[0].tolist() == [103, 104, 104, 104, 110]
+    assert scanner.closes[1].tolist() == [101, 101, 101, 101, 120]
+    assert scanner.counts.tolist() == [5, 5]
+
+
+def test_gap_longer_than_the_window_keeps_only_the_last_close():
+    scanner = make_scanner()
+    scanner.apply_tickers([ticker("AAAUSDT", 110)], now_ms=40 * MINUTE)
+    assert scanner.closes[0].tolist() == [104, 104, 104, 104, 110]
+    np.testing.assert_array_equal(scanner.closes[1], make_scanner().closes[1])
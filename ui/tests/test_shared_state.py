@@ -0,0 +1,84 @@
+import json
+import multiprocessing
+import os
+import uuid
+
+import pytest
+
+from shared_state import SharedStatePublisher, SharedStateReader
+
+
+@pytest.fixture
+def name():
+    return f"test_state_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+
+def sections(version):
+    # Sizes vary with the version so a torn copy mixes lengths as well as bytes
+    fill = str(version % 10).encode() * (200_000 + version % 7 * 50_000)
+    return {
+        "latest_data": json.dumps({"data": {"BTCUSDT": {"price": version}}}).encode(),
+        "fill": fill,
+    }
+
+
+def test_reader_picks_up_each_publish_once(name):
+    publisher = SharedStatePublisher(name=name, size=1024 * 1024)
+    reader = SharedStateReader(name=name)
+    try:
+        publisher.publish(1, sections(1))
+        assert reader.refresh() is True
+        assert reader.version == 1
+        assert reader.body("fill") == sections(1)["fill"]
+        assert reader.parsed("latest_data") == {"data": {"BTCUSDT": {"price": 1}}}
+        assert reader.refresh() is False
+
+        first = reader.market_rows()["BTCUSDT"]
+        publisher.publish(2, {**sections(1), "fill": b""})
+        assert reader.refresh() is True
+        assert reader.version == 2
+        # Unchanged rows keep their identity across versions
+        assert reader.market_rows()["BTCUSDT"] is first
+        assert reader.body("missing") is None
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_oversized_state_is_rejected(name):
+    publisher = SharedStatePublisher(name=name, size=1024)
+    try:
+        with pytest.raises(ValueError):
+            publisher.publish(1, {"fill": b"x" * 2048})
+    finally:
+        publisher.close()
+
+
+def publish_forever(publisher, versions):
+    for version in range(1, versions + 1):
+        publisher.publish(version, sections(version))
+
+
+def test_reads_are_consistent_under_a_concurrent_writer(name):
+    publisher = SharedStatePublisher(name=name, size=4 * 1024 * 1024)
+    reader = SharedStateReader(name=name, max_spins=1_000_000)
+    versions = 2000
+    writer = multiprocessing.get_context("fork").Process(target=publish_forever, args=(publisher, versions))
+    try:
+        writer.start()
+        seen = reads = 0
+        while writer.is_alive():
+            if reader.refresh():
+                assert reader.version >= seen
+                assert reader.sections == sections(reader.version)
+                seen, reads = reader.version, reads + 1
+        writer.join()
+        assert writer.exitcode == 0
+        reader.refresh()
+        assert reader.version == versions
+        assert reader.sections == sections(versions)
+        assert reads > 1
+    finally:
+        writer.kill()
+        reader.close()
+        publisher.close()
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from signal_queue import QueuedSignal, QueueFullError, SignalQueue
+
+
+async def settle(rounds=20):
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+
+
+def test_full_queue_with_inflight_slot_keeps_workers_alive():
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(signal):
+            handled.append((signal.symbol, signal.side))
+            if signal.symbol == "AAA" and signal.side == "buy":
+                await release.wait()
+
+        q = SignalQueue(handler, maxsize=2, workers=1)
+        runner = asyncio.create_task(q.run())
+        q.submit(QueuedSignal("AAA", "buy", key="1"))
+        await settle()  # AAA is now in flight
+        assert ("AAA", "buy") in handled
+
+        # The newer AAA signal takes one of the two slots of capacity
+        assert q.submit(QueuedSignal("AAA", "sell", key="2")) == "accepted"
+        assert q.submit(QueuedSignal("BBB", "buy", key="3")) == "accepted"
+        with pytest.raises(QueueFullError):
+            q.submit(QueuedSignal("CCC", "buy", key="4"))
+
+        release.set()
+        await settle()
+        assert not runner.done()
+        assert handled == [("AAA", "buy"), ("BBB", "buy"), ("AAA", "sell")]
+
+        # Still accepting and processing afterwards
+        q.submit(QueuedSignal("CCC", "buy", key="5"))
+        await settle()
+        assert handled[-1] == ("CCC", "buy")
+        assert q.stats["processed"] == 4
+        runner.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_duplicates_and_coalescing():
+    async def scenario():
+        handled = []
+
+        async def handler(signal):
+            handled.append(signal.side)
+
+        q = SignalQueue(handler, maxsize=10, workers=1)
+        assert q.submit(QueuedSignal("AAA", "buy", key="k")) == "accepted"
+        assert q.submit(QueuedSignal("AAA", "buy", key="k")) == "duplicate"
+        assert q.submit(QueuedSignal("AAA", "sell", key="k2")) == "coalesced"
+        runner = asyncio.create_task(q.run())
+        await settle()
+        assert handled == ["sell"]
+        runner.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+import gc
+import warnings
+
+import pytest
+
+from bot import TokenCache
+
+
+async def fetch(symbol):
+    await asyncio.sleep(0)
+    return {"symbol": symbol, "price": 1.0}
+
+
+def test_refresh_without_a_running_loop_leaves_nothing_behind():
+    cache = TokenCache()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # "coroutine ... was never awaited" would surface here
+        with pytest.raises(RuntimeError):
+            cache.refresh("BTCUSDT", fetch)
+        gc.collect()
+    assert cache._inflight == {}
+
+    # A later refresh inside a loop starts a real fetch instead of joining a dead task
+    row = asyncio.run(cache.get_or_fetch("BTCUSDT", fetch))
+    assert row["price"] == 1.0
+    assert cache.get("BTCUSDT") == row
+
+
+def test_concurrent_refreshes_share_one_fetch():
+    calls = []
+
+    async def counting_fetch(symbol):
+        calls.append(symbol)
+        await asyncio.sleep(0.01)
+        return {"price": 2.0}
+
+    async def scenario():
+        cache = TokenCache()
+        rows = await asyncio.gather(*(cache.get_or_fetch("ETHUSDT", counting_fetch) for _ in range(5)))
+        assert all(r == {"price": 2.0} for r in rows)
+        assert cache._inflight == {}
+
+    asyncio.run(scenario())
+    assert calls == ["ETHUSDT"]